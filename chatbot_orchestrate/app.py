@@ -1,8 +1,7 @@
 # app.py  ——  Minimal Discovery V2 query script
 import os, sys, json
 from dotenv import load_dotenv
-from ibm_watson import DiscoveryV2
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+from tools.discovery_client import get_client, compact_result
 
 load_dotenv()  # 读取 .env（如有）
 
@@ -14,44 +13,22 @@ COLS_RAW = os.getenv("DISCOVERY_COLLECTION_IDS", "")  # 逗号分隔多个；留
 COL_IDS  = [s.strip() for s in COLS_RAW.split(",") if s.strip()]
 
 
-
-# 初始化客户端
-auth = IAMAuthenticator(API_KEY)
-discovery = DiscoveryV2(version="2023-03-31", authenticator=auth)
-discovery.set_service_url(URL)
+# 共享客户端（tools/discovery_client）：首次查询时才创建，连接池跨调用复用
+def _client():
+    return get_client(URL, API_KEY)
 
 def run_wd_query(query: str, count: int = 5, passages_count: int = 5) -> dict:
     """Query Discovery V2 and return a compact result."""
-    kwargs = dict(
-        project_id=PROJECT,
-        natural_language_query=query,
-        count=count,
-        passages={"enabled": True, "count": passages_count},
-    )
+    body = {
+        "natural_language_query": query,
+        "count": count,
+        "passages": {"enabled": True, "count": passages_count},
+    }
     if COL_IDS:
-        kwargs["collection_ids"] = COL_IDS
-
-    res = discovery.query(**kwargs).get_result()
-
-    # 先用顶层 passages（官方结构），再回退到每条 result 的文本/标题
-    snippets = []
-    for p in res.get("passages", []):
-        if p.get("passage_text"):
-            snippets.append({"text": p["passage_text"], "document_id": p.get("document_id")})
-
-    if not snippets:
-        for r in res.get("results", []):
-            txt = ""
-            # 某些返回会把段落塞到每条 result 的 document_passages
-            dp = r.get("document_passages") or []
-            if dp and isinstance(dp, list):
-                txt = dp[0].get("passage_text", "") or ""
-            if not txt:
-                txt = r.get("text") or r.get("extracted_metadata", {}).get("title", "")
-            if txt:
-                snippets.append({"text": txt, "collection_id": r.get("collection_id")})
-
-    return {"snippets": snippets, "total": res.get("matching_results", 0)}
+        body["collection_ids"] = COL_IDS
+
+    res = _client().query(PROJECT, body, cached=True)
+    return compact_result(res)
 
 if __name__ == "__main__":
     q = " ".join(sys.argv[1:]) or "timetable exam dates"
@@ -18,7 +18,7 @@ app.use((req, res, next) => {
 
 app.use(helmet());
 app.use(cors({ origin: true, credentials: true }));
-app.use(rateLimit({ windowMs: 60 * 1000, max: 60 }));
+app.use(rateLimit({ windowMs: 60 * 1000, max: Number(process.env.RATE_LIMIT_MAX || 60) }));
 
 // —— 健康检查路由 ——
 // 用于 curl /health 快速验证链路
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark tools/faq_api.py: in-process search vs a mockapi-style substring scan,
+then HTTP throughput of the asyncio server with keep-alive clients.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_faq_api.py [--clients 64] [--requests 20000] [--revalidate 0.3] [--scale 1]
+
+--scale N replicates the CSV rows N times (fresh ids) to see how search scales.
+--revalidate is the share of requests sent with the ETag from an earlier
+response (If-None-Match), which the server answers with a body-less 304.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.faq_api import FaqApi, FaqApiServer, FaqCatalog, load_items  # noqa: E402
+from tools.faq_index import tokenize  # noqa: E402
+
+
+def substring_search(items, needle):
+    """What mockapi.io (and benchmarks/stub_servers.StubMockApi) does for ?search=."""
+    needle = needle.lower()
+    return [r for r in items if any(needle in str(v).lower() for v in r.values())]
+
+
+def make_targets(items, n, seed=0):
+    rnd = random.Random(seed)
+    words = [w for it in items[:400] for w in tokenize(it["question"]) if len(w) > 3]
+    out = []
+    for _ in range(n):
+        r = rnd.random()
+        if r < 0.6:
+            q = " ".join(rnd.sample(words, rnd.choice((1, 1, 2))))
+            out.append(f"/api/v1/faqs?search={quote(q)}&limit={rnd.choice((5, 10, 20))}")
+        elif r < 0.8:
+            out.append(f"/api/v1/faqs?intent={quote(rnd.choice(items)['intent'])}")
+        else:
+            out.append(f"/api/v1/faqs/{rnd.randint(1, len(items))}")
+    return out
+
+
+def bench_search(catalog, items, queries):
+    catalog._prefix.cache_clear()      # 冷缓存：每个词都真正走一次倒排表
+    catalog._matches.cache_clear()
+    t0 = time.perf_counter()
+    for q in queries:
+        catalog.find(q, limit=20)
+    idx_us = (time.perf_counter() - t0) / len(queries) * 1e6
+    t0 = time.perf_counter()
+    for q in queries[:200]:
+        substring_search(items, q)
+    scan_us = (time.perf_counter() - t0) / min(200, len(queries)) * 1e6
+    return {"indexed_us_per_query": round(idx_us, 1), "substring_scan_us_per_query": round(scan_us, 1),
+            "speedup": round(scan_us / idx_us, 1)}
+
+
+async def _client(host, port, targets, etags, revalidate, lat, counts, rnd):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for t in targets:
+            hdr = f"GET {t} HTTP/1.1\r\nHost: {host}\r\n"
+            tag = etags.get(t)
+            if tag and rnd.random() < revalidate:
+                hdr += f"If-None-Match: {tag}\r\n"
+            t0 = time.perf_counter()
+            writer.write((hdr + "\r\n").encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            status = int(lines[0].split(" ", 2)[1])
+            hs = {k.lower(): v.strip() for k, _, v in (ln.partition(":") for ln in lines[1:] if ln)}
+            n = int(hs.get("content-length", 0))
+            if n and status != 304:
+                await reader.readexactly(n)
+            lat.append(time.perf_counter() - t0)
+            counts[status] = counts.get(status, 0) + 1
+            if "etag" in hs:
+                etags[t] = hs["etag"]
+    finally:
+        writer.close()
+
+
+async def _load(host, port, targets, clients, revalidate):
+    etags, lat, counts = {}, [], {}
+    per = [targets[i::clients] for i in range(clients)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, p, etags, revalidate, lat, counts, random.Random(i))
+                           for i, p in enumerate(per)))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    q = (lambda p: round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 2))
+    return {"requests": len(lat), "wall_s": round(wall, 2), "throughput_rps": round(len(lat) / wall),
+            "p50_ms": q(0.5), "p95_ms": q(0.95), "p99_ms": q(0.99), "status_counts": counts}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=64)
+    ap.add_argument("--requests", type=int, default=20000)
+    ap.add_argument("--revalidate", type=float, default=0.3)
+    ap.add_argument("--scale", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    base = load_items()
+    items = [dict(it, id=str(i * len(base) + j + 1)) for i in range(args.scale) for j, it in enumerate(base)]
+    catalog = FaqCatalog(items)
+    rnd = random.Random(1)
+    words = [w for it in base for w in tokenize(it["question"]) if len(w) > 3]
+    queries = [rnd.choice(words) for _ in range(2000)]
+    report = {"rows": len(items), "search": bench_search(catalog, items, queries)}
+
+    api = FaqApi(catalog)
+    loop = asyncio.new_event_loop()
+    server = FaqApiServer(api, "127.0.0.1", 0)
+    loop.run_until_complete(server.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    targets = make_targets(items, args.requests)
+    report["http"] = asyncio.run(_load("127.0.0.1", server.port, targets, args.clients, args.revalidate))
+    report["http"]["server_stats"] = dict(api.stats)
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
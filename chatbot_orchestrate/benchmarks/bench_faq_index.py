@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Compare the FaqIndex ranker with the legacy SequenceMatcher scorer of FAQ_AskUs_func.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_faq_index.py [--queries 100] [--top-k 5] [--threshold 0.6]
+
+Reports per-query latency for both scorers and ranking agreement
+(top-1 match rate and mean overlap@k of the returned links+questions), and
+for each scorer how many in-domain queries keep a top-1 result at the
+threshold (recall) and how many off-topic queries still get one (false pass).
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.faq_index import FaqIndex, passages_from_csv  # noqa: E402
+
+
+def legacy_rank(query, passages, top_k=5, threshold=0.0):
+    """Verbatim copy of the pre-index FAQ_AskUs_func scoring loop (baseline)."""
+    def _norm(s):
+        s = (s or "")
+        s = s.replace("\u00A0", " ").replace("\u200B", "")
+        return re.sub(r"\s+", " ", s).strip().lower()
+
+    def _dedup_sentences(text):
+        parts = re.split(r"(?<=[.!?;])\s+|\n+", text or "")
+        seen, out = set(), []
+        for p in parts:
+            t = re.sub(r"\s+", " ", p).strip()
+            key = t.lower()
+            if t and key not in seen:
+                seen.add(key)
+                out.append(t)
+        return " ".join(out) if out else (text or "")
+
+    def _score(q_norm, question, answer):
+        qn, an = _norm(question), _norm(answer)
+        ratio_q = SequenceMatcher(None, q_norm, qn).ratio()
+        q_tokens = set(q_norm.split())
+        cover = len(q_tokens & set((qn + " " + an).split())) / max(1, len(q_tokens))
+        return 0.8 * ratio_q + 0.2 * cover
+
+    q_norm = _norm(query)
+    ranked = []
+    for p in passages:
+        sections = p.get("sections") or {}
+        question = (sections.get("Question") or "").strip()
+        answer = _dedup_sentences((sections.get("Answer") or "").strip())
+        ranked.append({"question": question, "answer": answer, "link": p.get("link") or "",
+                       "filename": p.get("filename") or "",
+                       "score": round(_score(q_norm, question, answer), 4)})
+    ranked.sort(key=lambda x: x["score"], reverse=True)
+    seen, out = set(), []
+    for r in ranked:
+        key = (r["link"], r["question"].lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        if r["score"] >= float(threshold):
+            out.append(r)
+        if len(out) >= max(1, int(top_k)):
+            break
+    return out
+
+
+def make_queries(passages, n, seed=7):
+    """Paraphrase-ish queries: CSV questions with dropped words / lowercased / truncated."""
+    rnd = random.Random(seed)
+    qs = []
+    for p in rnd.sample(passages, min(n, len(passages))):
+        words = p["sections"]["Question"].split()
+        if len(words) > 4 and rnd.random() < 0.5:
+            words.pop(rnd.randrange(len(words)))
+        qs.append(" ".join(words).lower().rstrip("?"))
+    return qs
+
+
+# 与 FAQ 无关的查询：阈值应把它们全部挡掉
+OFF_TOPIC = [
+    "what is the weather in hobart tomorrow", "best pizza near sandy bay", "how to fix my bike chain",
+    "who won the football last night", "recipe for chocolate cake", "how do i reset my router at home",
+    "what time does the supermarket close", "translate hello into french", "stock price of apple today",
+    "how many legs does a spider have", "book a flight to melbourne", "play some music",
+    "what's the capital of peru", "tell me a joke", "is it going to rain", "car insurance quote",
+    "cheap hotels in sydney", "how tall is mount wellington", "netflix password reset", "buy a new phone",
+]
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100.0 * (len(xs) - 1))))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--threshold", type=float, default=0.6)
+    args = ap.parse_args()
+
+    passages = passages_from_csv()
+    queries = make_queries(passages, args.queries)
+
+    t0 = time.perf_counter()
+    index = FaqIndex.from_passages(passages)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    lat_old, lat_new, top1, overlap = [], [], 0, []
+    for q in queries:
+        t0 = time.perf_counter()
+        old = legacy_rank(q, passages, top_k=args.top_k)
+        lat_old.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        new = index.search(q, top_k=args.top_k)
+        lat_new.append((time.perf_counter() - t0) * 1000)
+
+        ko = [(r["link"], r["question"]) for r in old]
+        kn = [(r["link"], r["question"]) for r in new]
+        # 同一问题常以不同 kw 重复出现，top-1 以问题文本比较
+        if old and new and old[0]["question"] == new[0]["question"]:
+            top1 += 1
+        overlap.append(len(set(ko) & set(kn)) / max(1, len(ko)))
+
+    print(f"corpus={len(passages)} queries={len(queries)} top_k={args.top_k} index_build={build_ms:.1f}ms")
+    for name, lat in (("legacy", lat_old), ("index", lat_new)):
+        print(f"{name:>7}: mean={statistics.mean(lat):8.3f}ms p50={_pct(lat, 50):8.3f}ms p95={_pct(lat, 95):8.3f}ms")
+    print(f"speedup(mean)={statistics.mean(lat_old) / max(1e-9, statistics.mean(lat_new)):.1f}x "
+          f"top1_agreement={top1 / len(queries):.2%} overlap@{args.top_k}={statistics.mean(overlap):.2%}")
+
+    for name, rank in (("legacy", lambda q: legacy_rank(q, passages, top_k=1, threshold=args.threshold)),
+                       ("index", lambda q: index.search(q, top_k=1, threshold=args.threshold))):
+        recall = sum(1 for q in queries if rank(q)) / len(queries)
+        false_pass = sum(1 for q in OFF_TOPIC if rank(q)) / len(OFF_TOPIC)
+        print(f"{name:>7}: threshold={args.threshold} recall={recall:.2%} off_topic_pass={false_pass:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Resident memory and load time of the FAQ knowledge base: per-row dicts vs tools/faq_store.py.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_faq_store.py [--workers 4] [--scale 1]
+
+Each approach is loaded by --workers concurrent processes (as a multi-worker
+tool runner would). Once all of them have loaded and touched every field, the
+parent reads /proc/<pid>/smaps_rollup for each worker and reports:
+
+  load_ms    : load time in the worker (best of the workers)
+  private_kib: private memory added by the load, per worker (Private_* delta)
+  pss_kib    : proportional set size added per worker; pages shared through the
+               mmapped store are split between the workers here
+  total_kib  : sum of the workers' PSS deltas (what the machine actually pays)
+
+--scale N replicates the CSV N times with a copy suffix on every field, so the
+text stays distinct and interning only folds the duplication the real data has.
+Linux only (reads /proc). pandas is measured when it is installed.
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.faq_index import DEFAULT_CSV  # noqa: E402
+
+# name -> (extra imports, load statement binding `data`, touch statement)
+APPROACHES = {
+    "csv_passages": ("from tools.faq_index import passages_from_csv",
+                     "data = passages_from_csv(CSV)", "pass"),
+    "csv_api_items": ("from tools.faq_api import load_items",
+                      "data = load_items(CSV)", "pass"),
+    "pandas": ("import pandas as pd",
+               "data = pd.read_csv(CSV, dtype=str, keep_default_na=False)", "pass"),
+    "artifact_index": ("from tools.faq_index import FaqIndex",
+                       "data = FaqIndex.from_artifact(ARTIFACT)", "pass"),
+    "store_mmap": ("from tools.faq_store import FaqStore",
+                   "data = FaqStore.open(STORE)",
+                   "for r in data:\n    for k in r: r[k]"),
+    "store_index": ("from tools.faq_index import FaqIndex\nfrom tools.faq_store import FaqStore",
+                    "data = FaqIndex.from_store(FaqStore.open(STORE))",
+                    "for d in data.docs:\n    for k in d: d[k]"),
+}
+
+_WORKER = """
+import gc, json, sys, time
+sys.path.insert(0, {root!r})
+CSV, ARTIFACT, STORE = {csv!r}, {artifact!r}, {store!r}
+{imports}
+
+def mem():
+    out = {{}}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            k, _, v = line.partition(":")
+            if v.strip().endswith("kB"):
+                out[k] = int(v.split()[0])
+    return out
+
+gc.collect()
+before = mem()
+t0 = time.perf_counter()
+{load}
+load_ms = (time.perf_counter() - t0) * 1000
+{touch}
+gc.collect()
+print(json.dumps({{"load_ms": load_ms, "before": before}}), flush=True)
+sys.stdin.readline()
+"""
+
+
+def _rollup(pid):
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            k, _, v = line.partition(":")
+            if v.strip().endswith("kB"):
+                out[k] = int(v.split()[0])
+    return out
+
+
+def _private(m):
+    return m.get("Private_Clean", 0) + m.get("Private_Dirty", 0)
+
+
+def run(name, workers, paths):
+    imports, load, touch = APPROACHES[name]
+    code = _WORKER.format(root=ROOT, imports=imports, load=load, touch=touch, **paths)
+    procs = [subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+             for _ in range(workers)]
+    try:
+        ready = []
+        for p in procs:
+            line = p.stdout.readline()
+            if not line:
+                err = p.stderr.read().strip().splitlines()
+                return {"error": err[-1] if err else "worker failed"}
+            ready.append(json.loads(line))
+        # 所有 worker 都已加载完毕并驻留，此时 PSS 才反映共享
+        after = [_rollup(p.pid) for p in procs]
+    finally:
+        for p in procs:
+            try:
+                p.stdin.close()
+            except OSError:
+                pass
+            p.wait()
+    pss = [a["Pss"] - r["before"]["Pss"] for a, r in zip(after, ready)]
+    private = [_private(a) - _private(r["before"]) for a, r in zip(after, ready)]
+    return {"load_ms": round(min(r["load_ms"] for r in ready), 1),
+            "private_kib": round(sum(private) / workers), "pss_kib": round(sum(pss) / workers),
+            "total_kib": sum(pss)}
+
+
+def scaled_csv(src, n, out_path):
+    with open(src, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fields, rows = reader.fieldnames, list(reader)
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        for i in range(n):
+            suffix = f" copy{i}" if i else ""
+            for r in rows:
+                w.writerow({k: (v + suffix if v else v) for k, v in r.items()})
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--scale", type=int, default=1)
+    ap.add_argument("--only", nargs="*", choices=list(APPROACHES))
+    args = ap.parse_args(argv)
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("This benchmark reads /proc/<pid>/smaps_rollup (Linux only).")
+        sys.exit(1)
+
+    from tools import faq_artifact, faq_store
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = DEFAULT_CSV
+        if args.scale > 1:
+            csv_path = os.path.join(tmp, "faq.csv")
+            scaled_csv(DEFAULT_CSV, args.scale, csv_path)
+        paths = {"csv": csv_path, "artifact": os.path.join(tmp, "faq_artifact.jsonl.gz"),
+                 "store": os.path.join(tmp, "faq_store.bin")}
+        faq_artifact.build(csv_path, paths["artifact"])
+        faq_store.build(csv_path, paths["store"])
+        report = {"rows": sum(1 for _ in open(csv_path, encoding="utf-8")) - 1, "workers": args.workers,
+                  "csv_kib": round(os.path.getsize(csv_path) / 1024),
+                  "store_kib": round(os.path.getsize(paths["store"]) / 1024), "approaches": {}}
+        for name in args.only or APPROACHES:
+            report["approaches"][name] = run(name, args.workers, paths)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Accuracy / coverage / latency report for the local intent fast path (tools/intent_fastpath.py).
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_intent.py [--threshold 0.85] [--repeat 200]
+
+The held-out set is prompts/intent_eval.jsonl plus the CSV questions excluded
+from training (crc32 split). "Coverage" is the share of messages answered
+locally (confidence >= threshold); only the rest would reach the LLM classifier.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools import intent_fastpath as fp  # noqa: E402
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threshold", type=float, default=fp.DEFAULT_THRESHOLD)
+    ap.add_argument("--repeat", type=int, default=200, help="timing passes over the eval set")
+    ap.add_argument("--show-errors", action="store_true")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    clf = fp.default_classifier()
+    load_ms = (time.perf_counter() - t0) * 1000   # 读取已保存的模型；产物过期时包含训练时间
+    examples = fp.eval_examples()
+
+    total = Counter()
+    correct = Counter()
+    local = Counter()
+    local_correct = Counter()
+    errors = []
+    for text, gold in examples:
+        r = clf.classify(text, args.threshold)
+        ok = r["top_intent"] == gold
+        total[gold] += 1
+        correct[gold] += ok
+        if not r["needs_llm"]:
+            local[gold] += 1
+            local_correct[gold] += ok
+        if not ok:
+            errors.append((gold, r["top_intent"], r["confidence"], text))
+
+    texts = [t for t, _ in examples]
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for t in texts:
+            clf.classify(t)
+    per_call_us = (time.perf_counter() - t0) / (args.repeat * len(texts)) * 1e6
+
+    n = sum(total.values())
+    n_local = sum(local.values())
+    report = {
+        "eval_examples": n,
+        "threshold": args.threshold,
+        "load_ms": round(load_ms, 1),
+        "accuracy_all": round(sum(correct.values()) / n, 4),
+        "coverage_local": round(n_local / n, 4),
+        "accuracy_local": round(sum(local_correct.values()) / n_local, 4) if n_local else None,
+        "latency_us_per_message": round(per_call_us, 1),
+        "per_intent": {
+            k: {"n": total[k], "accuracy": round(correct[k] / total[k], 3),
+                "coverage": round(local[k] / total[k], 3)}
+            for k in fp.INTENTS if total[k]
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.show_errors:
+        for gold, got, conf, text in errors:
+            print(f"  {gold:>14} -> {got:<14} {conf:.2f}  {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Local JWT verification (tools/jwt_verify.py) vs GET /me on the Node auth-service.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_jwt_verify.py [--requests 2000] [--stub]
+
+Starts auth-service/server.js on a free port (node + auth-service/node_modules
+required; --stub or their absence uses benchmarks/stub_servers.StubAuth). Then:
+  1. checks that whoami() agrees with /me on a token from /auth/login and on
+     tampered, expired, wrong-audience, wrong-issuer and alg=none tokens;
+  2. times --requests keep-alive GET /me calls against verify() with no cache
+     and whoami() with the token cache (the repeated whoami/profile check).
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests  # noqa: E402
+
+from check_discovery_client import check  # noqa: E402
+from stub_servers import StubAuth, sign_hs256  # noqa: E402
+from tools import jwt_verify  # noqa: E402
+
+AUTH_DIR = os.path.join(ROOT, "auth-service")
+SECRET = "bench-secret"
+
+
+class NodeAuth:
+    """auth-service/server.js in a subprocess (rate limit lifted for the benchmark)."""
+
+    def __init__(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.proc = None
+
+    def __enter__(self):
+        env = dict(os.environ, PORT=str(self.port), HOST="127.0.0.1", JWT_SECRET=SECRET, RATE_LIMIT_MAX="1000000")
+        self.proc = subprocess.Popen(["node", "server.js"], cwd=AUTH_DIR, env=env,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                if requests.get(f"{self.url}/health", timeout=0.5).ok:
+                    return self
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("auth-service did not start")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        self.proc.wait(5)
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p * len(xs)))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--stub", action="store_true", help="use the Python StubAuth instead of Node")
+    args = ap.parse_args()
+
+    use_node = not args.stub and shutil.which("node") and os.path.isdir(os.path.join(AUTH_DIR, "node_modules"))
+    server = NodeAuth() if use_node else StubAuth(secret=SECRET)
+    os.environ["JWT_SECRET"] = SECRET
+    with server as srv:
+        base = srv.url
+        sess = requests.Session()
+        token = sess.post(f"{base}/auth/login", json={"username": "user", "password": "pass123"},
+                          timeout=10).json()["access_token"]
+
+        def me(t):
+            r = sess.get(f"{base}/me", headers={"Authorization": f"Bearer {t}"}, timeout=10)
+            return r.status_code, r.json()
+
+        status, body = me(token)
+        check(f"whoami() == /me body ({'node' if use_node else 'stub'})", status == 200 and jwt_verify.whoami(token) == body,
+              json.dumps(body))
+
+        claims = json.loads(base64.urlsafe_b64decode(token.split(".")[1] + "=="))
+        now = int(time.time())
+        head, _, sig = token.split(".")
+        none_head = base64.urlsafe_b64encode(b'{"alg":"none","typ":"JWT"}').rstrip(b"=").decode()
+        bad = {
+            "tampered": f"{head}.{token.split('.')[1][:-2]}AA.{sig}",
+            "expired": sign_hs256(dict(claims, iat=now - 1000, exp=now - 10), SECRET),
+            "wrong_aud": sign_hs256(dict(claims, aud="someone-else"), SECRET),
+            "wrong_iss": sign_hs256(dict(claims, iss="evil"), SECRET),
+            "wrong_secret": sign_hs256(claims, "not-the-secret"),
+            "alg_none": f"{none_head}.{token.split('.')[1]}.",
+        }
+        for name, t in bad.items():
+            status, _ = me(t)
+            local = jwt_verify.whoami(t)
+            check(f"{name}: rejected by both", status == 401 and local.get("error") == "invalid token",
+                  f"/me {status}, local {local}")
+
+        lat = []
+        for _ in range(args.requests):
+            t0 = time.perf_counter()
+            me(token)
+            lat.append(time.perf_counter() - t0)
+        n_local = args.requests * 20
+        t0 = time.perf_counter()
+        for _ in range(n_local):
+            jwt_verify.verify(token)
+        verify_us = (time.perf_counter() - t0) / n_local * 1e6
+        jwt_verify.token_cache().clear()
+        t0 = time.perf_counter()
+        for _ in range(n_local):
+            jwt_verify.whoami(token)
+        cached_us = (time.perf_counter() - t0) / n_local * 1e6
+        me_us = sum(lat) / len(lat) * 1e6
+        print(json.dumps({
+            "server": "node auth-service" if use_node else "StubAuth",
+            "me_http_us": {"mean": round(me_us, 1), "p50": round(pct(lat, 0.5) * 1e6, 1),
+                           "p99": round(pct(lat, 0.99) * 1e6, 1)},
+            "local_verify_us": round(verify_us, 2),
+            "local_whoami_cached_us": round(cached_us, 2),
+            "speedup_vs_me": {"verify": round(me_us / verify_us), "cached": round(me_us / cached_us)},
+            "cache": jwt_verify.token_cache().stats(),
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark outlinetool on synthetic multi-unit outline dumps (~1 MB by default).
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_outline.py [--mb 1.0] [--units 0]
+
+Compares the single-pass extract_assessment_items scanner and the memoised
+OutlineDocument section lookups with the previous per-keyword / per-call
+implementations (copied below as the baseline).
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    from tools import outlinetool  # needs ibm_watsonx_orchestrate for the @tool decorator
+except ImportError as e:
+    print(f"outlinetool not importable here: {e}")
+    sys.exit(0)
+
+
+def legacy_assessment_items(text):
+    items = {}
+    for m in re.finditer(r"(?mi)\b(?:Assessment\s*Task|Task)\s*\d+\s*:\s*([^\n%]{3,80})", text):
+        name = re.sub(r"\s+", " ", m.group(1)).strip()
+        if name:
+            items.setdefault(name, {"name": name, "weight": None})
+    for kw in [r"e[- ]?portfolio", r"literature review", r"qualitative methods", r"quantitative methods",
+               r"online test", r"quiz", r"project\s*\d+", r"weekly tutorial tasks?"]:
+        for m in re.finditer(kw, text, flags=re.I):
+            pretty = re.sub(r"\s+", " ", m.group(0)).strip().title()
+            items.setdefault(pretty, {"name": pretty, "weight": None})
+    percents = [(m.group(1), m.start()) for m in re.finditer(r"(?i)(\d{1,3})\s*%", text)]
+    for name in list(items):
+        pos = text.lower().find(name.lower())
+        if pos >= 0 and percents:
+            near = min(percents, key=lambda x: abs(x[1] - pos))
+            items[name]["weight"] = f"{near[0]}%"
+    return list(items.values())
+
+
+def legacy_extract_section(text, target):
+    pat = r"(?mi)^(%s)\s*$" % "|".join([re.escape(t) for t in outlinetool.SECTION_TITLES])
+    boundaries = [m for m in re.finditer(pat, text)]
+    chunk = text
+    for i, m in enumerate(boundaries):
+        if m.group(1).lower() == target.lower():
+            chunk = text[m.end():boundaries[i + 1].start() if i + 1 < len(boundaries) else len(text)]
+            break
+    bullets = []
+    for p in re.split(r"(?<=[\.;])\s+|\n+", chunk):
+        p = re.sub(r"\s+", " ", p).strip()
+        if 6 <= len(p) <= 200:
+            bullets.append(p)
+        if len(bullets) >= 6:
+            break
+    return bullets
+
+
+TASKS = ["Project Proposal", "Prototype Demonstration", "Final Report", "Team Charter", "Sprint Review",
+         "Reflective Essay", "Lab Exercises", "Case Study Analysis", "Group Presentation", "Design Document"]
+FILLER = ("Students will work in teams to design and evaluate software systems. "
+          "Feedback is provided through MyLO within two weeks of submission. ")
+
+
+def synth_outline(target_bytes, seed=3):
+    rnd = random.Random(seed)
+    parts, size, n = [], 0, 0
+    while size < target_bytes:
+        code = f"KIT{100 + n % 900:03d}"
+        n += 1
+        lines = [f"{code} Unit Outline Semester {1 + n % 2}", "Unit Description", FILLER * rnd.randint(2, 6),
+                 "Teaching Arrangements", "One lecture and one tutorial each week.", "Assessment Schedule"]
+        for t in range(1, rnd.randint(3, 5) + 1):
+            lines.append(f"Assessment Task {t}: {rnd.choice(TASKS)} {n} {rnd.choice([10, 15, 20, 25, 30, 40])}%")
+        lines += ["Weekly tutorial tasks 10%", "Online test 15%", "Assessment Details", FILLER * rnd.randint(3, 8),
+                  "Late penalties", "5% per day late.", ""]
+        block = "\n".join(lines)
+        parts.append(block)
+        size += len(block) + 1
+    return "\n".join(parts), n
+
+
+def timed(fn, *a):
+    t0 = time.perf_counter()
+    out = fn(*a)
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=1.0)
+    args = ap.parse_args()
+
+    text, units = synth_outline(int(args.mb * 1024 * 1024))
+    print(f"synthetic outline: {len(text) / 1024 / 1024:.2f} MB, {units} units")
+
+    old, t_old = timed(legacy_assessment_items, text)
+    new, t_new = timed(outlinetool._scan_assessment_items, text)
+    print(f"assessment items  legacy={t_old:9.1f}ms  single-pass={t_new:8.1f}ms  "
+          f"speedup={t_old / max(t_new, 1e-9):6.1f}x  items={len(old)}/{len(new)}")
+
+    by_unit, t_unit = timed(outlinetool.extract_assessment_items_by_unit, text)
+    print(f"by-unit tables    {t_unit:8.1f}ms  units={len(by_unit['units'])}")
+
+    targets = ["Assessment Schedule", "Teaching Arrangements", "Late penalties", "Unit Description"] * 5
+    t0 = time.perf_counter()
+    for t in targets:
+        legacy_extract_section(text, t)
+    t_old = (time.perf_counter() - t0) * 1000
+    outlinetool.OutlineDocument._cache.clear()
+    t0 = time.perf_counter()
+    for t in targets:
+        outlinetool.OutlineDocument.get(text).extract_section(t)
+    t_new = (time.perf_counter() - t0) * 1000
+    print(f"{len(targets)} section lookups legacy={t_old:9.1f}ms  OutlineDocument={t_new:8.1f}ms  "
+          f"speedup={t_old / max(t_new, 1e-9):6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Typo-tolerant query normalisation (tools/query_normalizer.py): recall and latency against the
+legacy SequenceMatcher scorer and the FaqIndex on raw queries.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_query_normalizer.py [--queries 100] [--top-k 5] [--seed 7]
+
+Queries are CSV questions (lower-cased, "?" dropped) in four variants:
+    clean   as is                                    (does normalisation hurt correct queries?)
+    typo    1-2 words of 5+ letters with one random edit each (swap / drop / double / replace;
+            never the first letter, as in real typing)
+    fused   one pair of adjacent words written together ("my timetable" -> "mytimetable")
+    both    typo + fused
+A query counts as recalled when its source question is among the top-k results (by question text:
+the same question is listed under several AskUs links). Scorers:
+    legacy      benchmarks/bench_faq_index.legacy_rank (the fuzzy scorer FAQ_AskUs_func used before the index)
+    index       FaqIndex.search on the raw query
+    index+norm  FaqIndex.search on normalize(query)   (what FAQ_AskUs_func does now)
+Also reports normalisation cost per query (cold / cached) and artifact load vs in-process build.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_faq_index import legacy_rank  # noqa: E402
+from tools import query_normalizer as qn  # noqa: E402
+from tools.faq_index import FaqIndex, passages_from_csv  # noqa: E402
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+VARIANTS = ("clean", "typo", "fused", "both")
+
+
+def typo(word, rnd):
+    i = rnd.randrange(1, len(word) - 1)
+    op = rnd.choice(("swap", "drop", "double", "replace"))
+    if op == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if op == "drop":
+        return word[:i] + word[i + 1:]
+    if op == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i] + rnd.choice(LETTERS.replace(word[i], "")) + word[i + 1:]
+
+
+def add_typos(words, rnd):
+    idx = [i for i, w in enumerate(words) if len(w) >= 5 and w.isalpha()]
+    for i in rnd.sample(idx, min(len(idx), rnd.choice((1, 2)))):
+        words[i] = typo(words[i], rnd)
+    return words
+
+
+def fuse(words, rnd):
+    idx = [i for i in range(len(words) - 1) if words[i].isalpha() and words[i + 1].isalpha()]
+    if idx:
+        i = rnd.choice(idx)
+        words[i:i + 2] = [words[i] + words[i + 1]]
+    return words
+
+
+def make_queries(passages, n, seed):
+    """[(source question, {variant: query})] for n distinct CSV questions."""
+    rnd = random.Random(seed)
+    questions = sorted({p["sections"]["Question"].strip() for p in passages if p["sections"]["Question"].strip()})
+    out = []
+    for q in rnd.sample(questions, min(n, len(questions))):
+        words = q.lower().rstrip("?").replace("?", "").split()
+        out.append((q, {"clean": " ".join(words),
+                        "typo": " ".join(add_typos(list(words), rnd)),
+                        "fused": " ".join(fuse(list(words), rnd)),
+                        "both": " ".join(fuse(add_typos(list(words), rnd), rnd))}))
+    return out
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100.0 * (len(xs) - 1))))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=100, help="CSV questions (legacy costs ~0.6 s per question)")
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    passages = passages_from_csv()
+    index = FaqIndex.from_passages(passages)
+    cases = make_queries(passages, args.queries, args.seed)
+
+    t0 = time.perf_counter()
+    words, prefixes = qn.build_vocabulary()
+    norm = qn.Normalizer(words, unit_prefixes=prefixes)
+    build_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    loaded = qn.Normalizer.load(qn.VOCAB_PATH, qn.source_sha1())
+    load_ms = (time.perf_counter() - t0) * 1000
+    if loaded is not None:
+        norm = loaded
+
+    scorers = {
+        "legacy": lambda q: legacy_rank(q, passages, top_k=args.top_k),
+        "index": lambda q: index.search(q, top_k=args.top_k),
+        "index+norm": lambda q: index.search(norm.normalize(q), top_k=args.top_k),
+    }
+    hits = {(s, v): 0 for s in scorers for v in VARIANTS}
+    lat = {s: [] for s in scorers}
+    for source, variants in cases:
+        want = source.lower()
+        for v in VARIANTS:
+            for s, fn in scorers.items():
+                t0 = time.perf_counter()
+                res = fn(variants[v])
+                lat[s].append((time.perf_counter() - t0) * 1000)
+                hits[s, v] += any(r["question"].strip().lower() == want for r in res)
+
+    # 归一化本身的开销：清空逐词缓存后第一次（冷）/ 再来一次（命中缓存）
+    queries = [variants[v] for _, variants in cases for v in VARIANTS]
+    norm._resolved.clear()
+    cold = []
+    for q in queries:
+        t0 = time.perf_counter()
+        norm.normalize(q)
+        cold.append((time.perf_counter() - t0) * 1000)
+    warm = []
+    for q in queries:
+        t0 = time.perf_counter()
+        norm.normalize(q)
+        warm.append((time.perf_counter() - t0) * 1000)
+    rewritten = [(variants["clean"], norm.explain(variants["clean"])) for _, variants in cases]
+    rewritten = [(q, ch) for q, ch in rewritten if ch]
+
+    n = len(cases)
+    print(f"corpus={len(passages)} questions={n} top_k={args.top_k} vocabulary={len(norm.words)} "
+          f"deletes={len(norm.deletes)}")
+    print(f"vocabulary build={build_ms:.1f}ms  artifact load="
+          + (f"{load_ms:.1f}ms" if loaded is not None else "stale/missing (run tools/query_normalizer.py --build)"))
+    print(f"\nrecall@{args.top_k} of the source question")
+    print(f"{'':>12}" + "".join(f"{v:>9}" for v in VARIANTS))
+    for s in scorers:
+        print(f"{s:>12}" + "".join(f"{hits[s, v] / n:9.1%}" for v in VARIANTS))
+    print("\nlatency per query")
+    for s, xs in lat.items():
+        print(f"{s:>12}: mean={statistics.mean(xs):8.3f}ms p50={_pct(xs, 50):8.3f}ms p95={_pct(xs, 95):8.3f}ms")
+    print(f"{'normalize':>12}: cold mean={statistics.mean(cold):.3f}ms p95={_pct(cold, 95):.3f}ms  "
+          f"cached mean={statistics.mean(warm):.3f}ms")
+    print(f"clean queries with a token rewritten: {len(rewritten)}/{n} "
+          f"(mostly the CSV's own fused words, e.g. {rewritten[0][1] if rewritten else '-'})")
+
+
+if __name__ == "__main__":
+    main()
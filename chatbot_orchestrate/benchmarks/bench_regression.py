@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+CPU-time regression suite for our parsing / ranking code, on replayed HTTP (tools/http_cassette.py).
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_regression.py [--rounds 7] [--queries 100] [--cassettes DIR]
+                                          [--save] [--compare] [--max-regress 0.25] [--json]
+
+1. Cassettes: --cassettes DIR holding discovery.jsonl.gz / mockapi.jsonl.gz recorded against the
+   real services (run the tools once with HTTP_CASSETTE_MODE=record HTTP_CASSETTE_DIR=DIR). Without
+   it, the workloads below are recorded against benchmarks/stub_servers.py into a temporary directory.
+2. Every benchmark runs against replay with zero latency (nothing leaves the process), so the numbers
+   are our own CPU time (time.process_time), not the remote service's:
+     wd_query         discovery_tool.wd_query: client, JSON decode, compact_result + snippet packing
+     compact_result   snippet extraction + packing alone, on the recorded responses
+     djv3_query_one   djv3._query_one: request body, Discovery call, _trim / _format_items  (needs the ADK)
+     djv3_format      djv3._format_items alone                                             (needs the ADK)
+     faq_search       FaqIndex.search scoring
+     faq_askus        FAQ_AskUs_func's pipeline: 2*top_k candidates, near-duplicate collapse, top_k
+     seeder           seed_mockapi_from_csv.seed: CSV streaming, payloads, one worker
+   One warm-up, then --rounds rounds each; min / median / stdev of CPU ms per round, median wall ms.
+3. --save appends the run, tagged with the git commit, to benchmarks/.regression/history.jsonl.
+   --compare checks each median against the latest saved run of another commit and exits 1 when
+   one is slower by more than --max-regress (and by more than --noise-ms).
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import FAQ_CSV, StubDiscovery, StubMockApi  # noqa: E402
+from tools import discovery_client, http_cassette  # noqa: E402
+from tools import seed_mockapi_from_csv as seeder  # noqa: E402
+from tools.faq_index import FaqIndex  # noqa: E402
+from tools.snippet_pack import pack  # noqa: E402
+
+HISTORY = os.path.join(ROOT, "benchmarks", ".regression", "history.jsonl")
+REPLAY_URL = "http://discovery.cassette.invalid"     # 回放时从不解析
+MOCKAPI_URL = "http://mockapi.cassette.invalid/api/v1"
+PROJECT = "p1"
+DJV3_CFG = {"DISCOVERY_URL": REPLAY_URL, "DISCOVERY_APIKEY": "k", "DISCOVERY_VERSION": "2023-03-31",
+            "DISCOVERY_PROJECT_ID_JSON": PROJECT, "DISCOVERY_COLLECTION_ID_JSON": "c1"}
+
+
+def load_djv3():
+    sys.path.insert(0, os.path.join(ROOT, "tools", "tools_clean"))
+    try:
+        import djv3  # needs ibm_watsonx_orchestrate
+    except ImportError as e:
+        print(f"SKIP djv3 benchmarks ({e})", file=sys.stderr)
+        return None
+    return djv3
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+class Workloads:
+    """The HTTP-driven workloads, pointed at one Discovery / MockAPI base URL."""
+
+    def __init__(self, discovery_url, mockapi_url, queries, djv3):
+        self.discovery_url = discovery_url
+        self.mockapi_url = mockapi_url
+        self.queries = queries
+        self.djv3 = djv3
+        os.environ.update({"DISCOVERY_URL": discovery_url, "DISCOVERY_API_KEY": "k", "DISCOVERY_PROJECT_ID": PROJECT})
+        from tools import discovery_tool
+        discovery_tool._PROJECT = PROJECT
+        self.discovery_tool = discovery_tool
+        self.cfg = dict(DJV3_CFG, DISCOVERY_URL=discovery_url)
+
+    def wd_query(self):
+        discovery_client.response_cache().invalidate()   # 每轮都走 HTTP（回放）路径，不是只测缓存
+        return [self.discovery_tool.wd_query(q, count=5) for q in self.queries]
+
+    def raw_responses(self):
+        cli = discovery_client.get_client(self.discovery_url, "k")
+        return [cli.query(PROJECT, {"natural_language_query": q, "count": 5,
+                                    "passages": {"enabled": True, "count": 5}}) for q in self.queries]
+
+    def djv3_query_one(self):
+        discovery_client.response_cache().invalidate()
+        return [self.djv3._query_one(self.cfg, q, "", "", 3, 400) for q in self.queries]
+
+    def seed(self):
+        return quiet(seeder.seed, FAQ_CSV, base_url=self.mockapi_url, rate=1e6, max_rate=1e6, workers=1,
+                     checkpoint=None)
+
+
+def record(directory, queries, djv3):
+    """Run each workload once against the stubs with HTTP_CASSETTE_MODE=record."""
+    os.environ.update({"HTTP_CASSETTE_MODE": "record", "HTTP_CASSETTE_DIR": directory})
+    with StubDiscovery() as d, StubMockApi() as api:
+        w = Workloads(d.url, api.base_url, queries, djv3)
+        w.wd_query()
+        w.raw_responses()
+        if djv3:
+            w.djv3_query_one()
+        counts = w.seed()
+    http_cassette.close_all()
+    return counts
+
+
+def measure(fn, rounds):
+    fn()
+    cpu, wall = [], []
+    for _ in range(rounds):
+        c0, w0 = time.process_time(), time.perf_counter()
+        fn()
+        cpu.append((time.process_time() - c0) * 1000)
+        wall.append((time.perf_counter() - w0) * 1000)
+    return {"rounds": rounds, "cpu_ms_min": round(min(cpu), 3), "cpu_ms_median": round(statistics.median(cpu), 3),
+            "cpu_ms_stdev": round(statistics.stdev(cpu), 3) if len(cpu) > 1 else 0.0,
+            "wall_ms_median": round(statistics.median(wall), 3)}
+
+
+def git_commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                             text=True, timeout=30).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, timeout=60).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        return None, False
+    return sha or None, dirty
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(results, baseline, max_regress, noise_ms):
+    rows, failed = [], False
+    for name, cur in results.items():
+        base = baseline["results"].get(name)
+        if not base:
+            rows.append((name, None, cur["cpu_ms_median"], None, "new"))
+            continue
+        b, c = base["cpu_ms_median"], cur["cpu_ms_median"]
+        change = (c - b) / b if b else 0.0
+        bad = change > max_regress and c - b > noise_ms
+        failed |= bad
+        rows.append((name, b, c, change, "REGRESSION" if bad else "ok"))
+    print(f"\nvs {baseline.get('commit')}{'+dirty' if baseline.get('dirty') else ''} "
+          f"(median CPU ms per round; fail above +{max_regress:.0%})", file=sys.stderr)
+    for name, b, c, change, verdict in rows:
+        bs = f"{b:10.2f}" if b is not None else " " * 10
+        cs = f"{change:+7.1%}" if change is not None else " " * 7
+        print(f"  {name:16s} {bs} -> {c:10.2f}  {cs}  {verdict}", file=sys.stderr)
+    return failed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=7)
+    ap.add_argument("--queries", type=int, default=100, help="distinct CSV questions used as queries")
+    ap.add_argument("--cassettes", help="directory with recorded cassettes (default: record against the stubs)")
+    ap.add_argument("--save", action="store_true", help=f"append this run to {os.path.relpath(HISTORY, ROOT)}")
+    ap.add_argument("--compare", action="store_true", help="compare with the latest saved run of another commit")
+    ap.add_argument("--history", default=HISTORY)
+    ap.add_argument("--max-regress", type=float, default=0.25)
+    ap.add_argument("--noise-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    with open(FAQ_CSV, newline="", encoding="utf-8") as f:
+        queries = list(dict.fromkeys(r["question"] for r in csv.DictReader(f)))[:args.queries]
+    djv3 = load_djv3()
+    index = FaqIndex.from_csv()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.cassettes
+        if not directory:
+            directory = tmp
+            record(directory, queries, djv3)
+        os.environ.update({"HTTP_CASSETTE_MODE": "replay", "HTTP_CASSETTE_DIR": directory,
+                           "HTTP_CASSETTE_LATENCY": "0"})
+        w = Workloads(REPLAY_URL, MOCKAPI_URL, queries, djv3)
+        responses = w.raw_responses()
+        benches = {
+            "wd_query": w.wd_query,
+            "compact_result": lambda: [discovery_client.compact_result(r) for r in responses],
+            "faq_search": lambda: [index.search(q, top_k=5) for q in queries],
+            "faq_askus": lambda: [pack(index.search(q, top_k=10), key="answer", limit=5) for q in queries],
+            "seeder": w.seed,
+        }
+        if djv3:
+            results_json = [dict(r, **r.get("extracted_metadata", {})) for resp in responses
+                            for r in resp.get("results", [])]
+            passages = [r.get("text", "") for r in results_json]
+            benches["djv3_query_one"] = w.djv3_query_one
+            benches["djv3_format"] = lambda: [djv3._format_items(results_json[i:i + 3], passages[i:i + 3], 400)
+                                              for i in range(0, len(results_json), 3)]
+        results = {name: measure(fn, args.rounds) for name, fn in benches.items()}
+        played = {name: c.played for (name, _, _), c in http_cassette._CASSETTES.items()}
+        http_cassette.close_all()
+
+    commit, dirty = git_commit()
+    run = {"commit": commit, "dirty": dirty, "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "python": sys.version.split()[0], "queries": len(queries),
+           "cassettes": args.cassettes or "stubs", "results": results}
+    if args.json:
+        print(json.dumps(run, indent=2))
+    else:
+        print(f"commit {commit}{'+dirty' if dirty else ''}, {len(queries)} queries, replayed {played}")
+        for name, r in results.items():
+            print(f"  {name:16s} cpu min {r['cpu_ms_min']:9.2f} ms  median {r['cpu_ms_median']:9.2f} ms"
+                  f"  ±{r['cpu_ms_stdev']:.2f}   wall {r['wall_ms_median']:9.2f} ms")
+
+    failed = False
+    if args.compare:
+        others = [h for h in load_history(args.history) if h.get("commit") != commit or dirty != h.get("dirty")]
+        if others:
+            failed = compare(results, others[-1], args.max_regress, args.noise_ms)
+        else:
+            print("\nno saved run of another commit to compare with (use --save)", file=sys.stderr)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run, separators=(",", ":")) + "\n")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
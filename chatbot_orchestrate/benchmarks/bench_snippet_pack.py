@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Payload size before/after tools/snippet_pack.py on the FAQ CSV corpus.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/bench_snippet_pack.py [--top-k 5] [--budget 2000]
+
+  corpus   : answers in the CSV vs answers left after near-duplicate collapsing
+  responses: for every distinct CSV question used as a query, the FAQ_AskUs_func
+             payload (answer characters, ~tokens) with the old ranking (plain top_k) vs
+               deduped  : plain top_k with near-duplicates dropped (fewer answers, no refill)
+               collapsed: top_k distinct answers taken from 2*top_k candidates (what the tool returns)
+               packed   : collapsed, packed into --budget characters
+  scaling  : collapse() time for growing inputs, against a pairwise O(n^2) scan
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.faq_index import DEFAULT_CSV, FaqIndex  # noqa: E402
+from tools.snippet_pack import _feature_bits, collapse, estimate_tokens, hamming, pack, payload_size, simhash  # noqa: E402
+
+
+def pairwise(items, max_distance=5):
+    kept = []
+    for it in items:
+        s = simhash(it)
+        if all(hamming(s, simhash(k)) > max_distance for k in kept):
+            kept.append(it)
+    return kept
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--budget", type=int, default=2000, help="character budget for the packed variant")
+    args = ap.parse_args()
+
+    with open(DEFAULT_CSV, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    answers = [r["answer"] for r in rows]
+    kept = collapse(answers)
+    report = {"corpus": {"answers": len(answers), "after_collapse": len(kept),
+                         "chars": payload_size(answers), "chars_after": payload_size(kept),
+                         "reduction": round(1 - payload_size(kept) / payload_size(answers), 3)}}
+
+    index = FaqIndex.from_csv()
+    queries = list(dict.fromkeys(r["question"] for r in rows))
+    k = args.top_k
+    tot = {"plain": 0, "deduped": 0, "collapsed": 0, "packed": 0}
+    distinct = 0.0
+    for q in queries:
+        plain = index.search(q, top_k=k)
+        cands = index.search(q, top_k=2 * k)
+        coll = pack(cands, key="answer", limit=k)
+        packed = pack(cands, key="answer", limit=k, budget_chars=args.budget)
+        tot["plain"] += payload_size(plain, "answer")
+        tot["deduped"] += payload_size(collapse(plain, "answer"), "answer")
+        tot["collapsed"] += payload_size(coll, "answer")
+        tot["packed"] += payload_size(packed, "answer")
+        distinct += len(collapse(plain, "answer")) / max(1, len(plain))
+    n = len(queries)
+    report["responses"] = {
+        "queries": n, "top_k": k, "budget_chars": args.budget,
+        "mean_chars": {name: round(v / n) for name, v in tot.items()},
+        "mean_tokens_est": {name: estimate_tokens("x" * round(v / n)) for name, v in tot.items()},
+        "reduction_vs_plain": {name: round(1 - tot[name] / tot["plain"], 3) for name in ("deduped", "collapsed", "packed")},
+        "distinct_share_plain": round(distinct / n, 3),   # 旧输出里非重复答案的占比
+    }
+
+    # 规模：每份拷贝改一个词，仍是近重复；线性分桶 vs 两两比较
+    scaling = []
+    for copies in (1, 4, 16):
+        items = [a.replace(".", f" v{c}.", 1) if c else a for c in range(copies) for a in answers]
+        simhash.cache_clear()
+        _feature_bits.cache_clear()
+        for it in items:
+            simhash(it)            # 签名单独计时，两种做法共用
+        t0 = time.perf_counter()
+        out = collapse(items)
+        lsh_ms = (time.perf_counter() - t0) * 1000
+        entry = {"items": len(items), "kept": len(out), "collapse_ms": round(lsh_ms, 1)}
+        if len(items) <= 2100:
+            t0 = time.perf_counter()
+            entry["pairwise_kept"] = len(pairwise(items))
+            entry["pairwise_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        scaling.append(entry)
+    report["scaling"] = scaling
+    t0 = time.perf_counter()
+    simhash.cache_clear()
+    _feature_bits.cache_clear()
+    for a in answers:
+        simhash(a)
+    report["simhash_us_per_answer"] = round((time.perf_counter() - t0) / len(answers) * 1e6, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Offline checks for request deadlines (tools/deadline.py) and hedged requests
+in tools/discovery_client.py, against the delayed Discovery stub.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/check_deadline.py [--queries 200]
+
+Covers: nested deadlines and propagation into worker threads, TOOL_DEADLINE_MS
+and per-call deadline_ms on instrumented tools, HTTP timeouts / retry backoff / single-flight waits cut
+at the deadline instead of the fixed 30 s, cache-only degrade when the deadline
+is closer than a typical request, wd_query_batch and djv3 under a deadline, and
+hedging: tail latency (p99) with and without it on a stub whose slow_rate of
+requests stall, plus the extra upstream requests it costs.
+Exits non-zero on the first failed check.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_discovery_client import BODY, check  # noqa: E402
+from stub_servers import StubDiscovery  # noqa: E402
+from tools import deadline as dl  # noqa: E402
+from tools import discovery_client  # noqa: E402
+from tools.discovery_client import DiscoveryClient  # noqa: E402
+from tools.instrumentation import instrument  # noqa: E402
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    try:
+        out = fn(*args, **kwargs)
+    except Exception as e:   # noqa: BLE001  (检查里要看的是异常类型)
+        out = e
+    return out, time.perf_counter() - t0
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p * len(xs)))]
+
+
+def check_context():
+    with dl.deadline(1.0):
+        with dl.deadline(5.0):
+            check("nested deadline only tightens", dl.remaining() <= 1.0)
+        with dl.deadline(0.2):
+            check("inner deadline applies", dl.remaining() <= 0.2 and dl.clamp(30.0) <= 0.2)
+        seen = {}
+        t = threading.Thread(target=dl.propagate(lambda: seen.update(left=dl.remaining())))
+        t.start()
+        t.join()
+        check("propagate() carries the deadline into another thread", seen["left"] is not None and seen["left"] <= 1.0)
+    check("no deadline outside", dl.remaining() is None and dl.clamp(30.0) == 30.0)
+
+    os.environ["TOOL_DEADLINE_MS"] = "300"
+    probe = instrument("deadline_probe")(lambda: dl.remaining())
+    left = probe()
+    check("TOOL_DEADLINE_MS bounds an instrumented tool call", left is not None and 0.2 < left <= 0.3, f"{left}")
+    with dl.deadline(0.05):
+        check("an earlier outer deadline wins over TOOL_DEADLINE_MS", probe() <= 0.05)
+    tool = instrument("deadline_param_probe")(lambda query="", deadline_ms=None: dl.remaining())
+    left = tool(deadline_ms=100)
+    check("a tool's deadline_ms argument overrides TOOL_DEADLINE_MS", 0.05 < left <= 0.1, f"{left}")
+    left = tool("q", 100)
+    check("deadline_ms passed positionally", 0.05 < left <= 0.1, f"{left}")
+    left = tool("q")
+    check("no deadline_ms = TOOL_DEADLINE_MS", 0.2 < left <= 0.3, f"{left}")
+    del os.environ["TOOL_DEADLINE_MS"]
+    check("no TOOL_DEADLINE_MS = unbounded", probe() is None)
+
+
+def check_cutoffs():
+    with StubDiscovery(latency=1.0) as d:
+        c = DiscoveryClient(d.url, "k", retries=3)
+        with dl.deadline(0.2):
+            out, dt = timed(c.query, "p1", BODY)
+        check("slow upstream: request cut at the deadline, not the 30 s timeout",
+              isinstance(out, dl.DeadlineExceeded) and dt < 0.4, f"{type(out).__name__} after {dt:.2f}s")
+
+    with StubDiscovery(latency=1.0) as d:
+        c = DiscoveryClient(d.url, "k", retries=0)
+        with dl.deadline(0.2):
+            out, dt = timed(c.query, "p1", BODY)
+        check("no retries left: a timeout at the deadline is still DeadlineExceeded",
+              isinstance(out, dl.DeadlineExceeded) and dt < 0.4, f"{type(out).__name__} after {dt:.2f}s")
+
+    with StubDiscovery(fail_first=1000) as d:
+        c = DiscoveryClient(d.url, "k", retries=10, backoff=0.2)
+        with dl.deadline(0.3):
+            out, dt = timed(c.query, "p1", BODY)
+        check("retry backoff stops at the deadline", isinstance(out, dl.DeadlineExceeded) and dt < 0.45,
+              f"{type(out).__name__} after {dt:.2f}s, {d.requests} requests")
+
+    with StubDiscovery(latency=0.5) as d:
+        discovery_client.response_cache().invalidate()
+        c = DiscoveryClient(d.url, "k")
+        body = dict(BODY, natural_language_query="single flight deadline")
+        leader = threading.Thread(target=c.query, args=("p1", body), kwargs={"cached": True})
+        leader.start()
+        time.sleep(0.05)
+        with dl.deadline(0.1):
+            out, dt = timed(c.query, "p1", body, cached=True)
+        leader.join()
+        check("waiting on an identical in-flight request stops at the deadline",
+              isinstance(out, dl.DeadlineExceeded) and dt < 0.3, f"{type(out).__name__} after {dt:.2f}s")
+
+
+def check_degrade():
+    with StubDiscovery(latency=0.1) as d:
+        discovery_client.response_cache().invalidate()
+        c = DiscoveryClient(d.url, "k")
+        for i in range(5):
+            c.query("p1", dict(BODY, natural_language_query=f"warm {i}"))
+        warm = dict(BODY, natural_language_query="exam timetable")
+        cold = dict(BODY, natural_language_query="parking permits")
+        c.query("p1", warm, cached=True)
+        before = d.requests
+        with dl.deadline(0.06):   # 少于观测到的 p50（约 0.1 s）
+            hit, dt_hit = timed(c.query, "p1", warm, cached=True)
+            miss, dt_miss = timed(c.query, "p1", cold, cached=True)
+        check("close to the deadline: cached answer still served", isinstance(hit, dict) and hit["results"])
+        check("close to the deadline: uncached query degrades without an upstream call",
+              isinstance(miss, dl.DeadlineExceeded) and d.requests == before and dt_miss < 0.01,
+              f"{type(miss).__name__}, {d.requests - before} requests")
+        check("degrade counted", c.stats()["degraded"] == 1, str(c.stats()))
+        with dl.deadline(2.0):
+            out = c.query("p1", cold, cached=True)
+        check("with time left the same query goes upstream", out["results"] and d.requests == before + 1)
+
+    with StubDiscovery(latency=0.5) as d:
+        os.environ.update({"DISCOVERY_URL": d.url, "DISCOVERY_API_KEY": "k", "DISCOVERY_PROJECT_ID": "p1"})
+        from tools import discovery_tool
+        discovery_tool._PROJECT = "p1"
+        discovery_client.response_cache().invalidate()
+        with dl.deadline(0.15):
+            batch, dt = timed(discovery_tool.wd_query_batch, ["exams", "fees", "timetable", "census date"], count=2)
+        check("wd_query_batch workers inherit the deadline",
+              len(batch) == 4 and all("deadline" in b.get("error", "") for b in batch) and dt < 0.35,
+              f"{dt:.2f}s {[b.get('error', '')[:40] for b in batch]}")
+        out, dt = timed(discovery_tool.wd_query, "library hours", count=2, deadline_ms=150)
+        check("wd_query(deadline_ms=...) is cut at the caller's budget",
+              isinstance(out, dl.DeadlineExceeded) and dt < 0.35, f"{type(out).__name__} after {dt:.2f}s")
+
+        os.environ.update({"DISCOVERY_APIKEY": "k", "DISCOVERY_VERSION": "2023-03-31",
+                           "DISCOVERY_PROJECT_ID_JSON": "p1", "DISCOVERY_COLLECTION_ID_JSON": "c1"})
+        sys.path.insert(0, os.path.join(ROOT, "tools", "tools_clean"))
+        try:
+            import djv3  # needs ibm_watsonx_orchestrate
+        except ImportError as e:
+            print(f"SKIP djv3 under TOOL_DEADLINE_MS ({e})")
+            return
+        os.environ["TOOL_DEADLINE_MS"] = "150"
+        out, dt = timed(djv3.discovery_json_v3_clean, "KIT999 assessment semester 1")
+        del os.environ["TOOL_DEADLINE_MS"]
+        check("djv3 answers within TOOL_DEADLINE_MS", "out of time" in out["answer"] and dt < 0.35,
+              f"{dt:.2f}s {out['answer'][-80:]!r}")
+        out, dt = timed(djv3.discovery_json_v3_clean, "KIT998 assessment semester 2", deadline_ms=150)
+        check("djv3 answers within its deadline_ms", "out of time" in out["answer"] and dt < 0.35,
+              f"{dt:.2f}s {out['answer'][-80:]!r}")
+
+
+def check_hedging(n):
+    report = {}
+    results = {}
+    for hedge in (False, True):
+        with StubDiscovery(latency=0.005, slow_rate=0.02, slow_latency=0.3, seed=7) as d:
+            c = DiscoveryClient(d.url, "k", hedge=hedge, max_per_host=4)
+            for i in range(30):    # 先攒够延迟样本（HEDGE_MIN_SAMPLES），两种模式一样
+                c.query("p1", dict(BODY, natural_language_query=f"warm {i}"))
+            start = d.requests
+            lat, res = [], []
+            for i in range(n):
+                t0 = time.perf_counter()
+                r = c.query("p1", dict(BODY, natural_language_query=f"exam {i % 40}"))
+                lat.append(time.perf_counter() - t0)
+                res.append(r["matching_results"])
+            time.sleep(0.35)   # 等落后的对冲请求跑完再数请求数
+            st = c.stats()
+            report[hedge] = {"p50_ms": round(pct(lat, 0.5) * 1000, 1), "p99_ms": round(pct(lat, 0.99) * 1000, 1),
+                             "max_ms": round(max(lat) * 1000, 1), "upstream": d.requests - start,
+                             "hedged": st["hedged"], "hedge_wins": st["hedge_wins"]}
+            results[hedge] = res
+            c.close()
+    plain, hedged = report[False], report[True]
+    print(f"     plain : {plain}")
+    print(f"     hedged: {hedged}")
+    check("hedged results identical", results[False] == results[True])
+    if plain["max_ms"] < 250:
+        print(f"SKIP hedging cuts p99 (no slow request among {n} queries; raise --queries)")
+    else:
+        check("hedging cuts p99", hedged["max_ms"] < plain["max_ms"] / 3 and hedged["p99_ms"] <= plain["p99_ms"],
+              f"p99 {plain['p99_ms']} -> {hedged['p99_ms']} ms, max {plain['max_ms']} -> {hedged['max_ms']} ms")
+    check("hedging costs few extra requests", hedged["upstream"] <= n * 1.15,
+          f"{hedged['upstream']} upstream for {n} queries")
+    os.environ.pop("DISCOVERY_HEDGE", None)
+    check("hedging is opt-in", not DiscoveryClient("http://127.0.0.1:9", "k").hedge)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args()
+    check_context()
+    check_cutoffs()
+    check_degrade()
+    check_hedging(args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Offline checks for tools/discovery_client.py against the local Discovery stub.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/check_discovery_client.py
+
+Covers: keep-alive reuse, retry with backoff on 503, non-retryable errors,
+per-host concurrency limit for the asyncio API, and wd_query / run_wd_query
+going through the shared client. Exits non-zero on the first failed check.
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubDiscovery  # noqa: E402
+from tools.discovery_client import DiscoveryClient, DiscoveryError  # noqa: E402
+
+BODY = {"natural_language_query": "when are my exams", "count": 3, "passages": {"enabled": True, "count": 3}}
+
+
+def check(name, cond, detail=""):
+    print(f"{'OK ' if cond else 'FAIL'} {name}{(' — ' + detail) if detail else ''}")
+    if not cond:
+        sys.exit(1)
+
+
+def main():
+    with StubDiscovery() as d:
+        c = DiscoveryClient(d.url, "k", max_per_host=4)
+        for _ in range(20):
+            res = c.query("p1", BODY)
+        check("query returns results", res["matching_results"] > 0 and res["results"])
+        check("keep-alive reuses one connection", len(d.connections) == 1, f"{len(d.connections)} connections")
+
+    with StubDiscovery(fail_first=2) as d:
+        c = DiscoveryClient(d.url, "k", retries=3, backoff=0.01)
+        res = c.query("p1", BODY)
+        check("retries through transient 503s", d.requests == 3 and res["results"], f"{d.requests} requests")
+
+    with StubDiscovery(fail_first=10, error_status=400) as d:
+        c = DiscoveryClient(d.url, "k", retries=3, backoff=0.01)
+        try:
+            c.query("p1", BODY)
+            ok = False
+        except DiscoveryError as e:
+            ok = e.status == 400
+        check("4xx is not retried", ok and d.requests == 1, f"{d.requests} requests")
+
+    with StubDiscovery(latency=0.05) as d:
+        c = DiscoveryClient(d.url, "k", max_per_host=3)
+        t0 = time.perf_counter()
+        out = asyncio.run(c.aquery_many("p1", [dict(BODY, natural_language_query=f"exam {i}") for i in range(12)]))
+        dt = time.perf_counter() - t0
+        check("aquery_many keeps input order", all(isinstance(r, dict) for r in out) and len(out) == 12)
+        check("per-host concurrency limit", d.max_in_flight <= 3, f"peak in-flight={d.max_in_flight}")
+        check("requests overlap", dt < 12 * 0.05, f"{dt:.2f}s")
+        for i in range(5):   # 每次 asyncio.run 一个新循环：信号量不能串用，也不能越积越多
+            asyncio.run(c.aquery("p1", dict(BODY, natural_language_query=f"loop {i}")))
+        gc.collect()
+        check("per-loop semaphores are dropped with their loops", len(c._async_sems) <= 1,
+              f"{len(c._async_sems)} left")
+
+    with StubDiscovery() as d:
+        os.environ.update({"DISCOVERY_URL": d.url, "DISCOVERY_API_KEY": "k", "DISCOVERY_PROJECT_ID": "p1"})
+        from tools import discovery_tool
+        discovery_tool._PROJECT = "p1"
+        out = discovery_tool.wd_query("timetable", count=3)
+        check("discovery_tool.wd_query via shared client", out["snippets"] and out["total"] > 0)
+        batch = discovery_tool.wd_query_batch(["exams", "fees", "timetable"], count=2)
+        check("wd_query_batch order/schema", len(batch) == 3 and all("snippets" in b for b in batch))
+        try:
+            import app  # needs python-dotenv
+        except ImportError as e:
+            print(f"SKIP app.run_wd_query ({e})")
+        else:
+            out = app.run_wd_query("exam", count=2)
+            check("app.run_wd_query via shared client", out["snippets"])
+
+        os.environ.update({"DISCOVERY_APIKEY": "k", "DISCOVERY_VERSION": "2023-03-31",
+                           "DISCOVERY_PROJECT_ID_JSON": "p1", "DISCOVERY_COLLECTION_ID_JSON": "c1"})
+        sys.path.insert(0, os.path.join(ROOT, "tools", "tools_clean"))
+        try:
+            import djv3  # needs ibm_watsonx_orchestrate
+        except ImportError as e:
+            print(f"SKIP djv3.discovery_json_v3_clean ({e})")
+        else:
+            out = djv3.discovery_json_v3_clean("KIT700 assessment semester 1")
+            check("djv3 via shared client", "Assessment Task" in out["answer"], out["answer"][:120])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Offline checks for tools/discovery_export.py against the local Discovery stub.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/check_discovery_export.py [--docs 3000] [--latency 0.02]
+
+Covers: every document exported exactly once, in document_id order, with its
+passages and unit/semester/section fields; a failure part-way followed by
+--resume (no duplicates, no gaps); per-filter partitions; prefetch overlapping
+the next request with page processing; and peak Python memory that does not
+grow with the size of the collection.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_discovery_client import check  # noqa: E402
+from stub_servers import StubDiscovery, _tokens  # noqa: E402
+from tools.discovery_client import DiscoveryClient, DiscoveryError  # noqa: E402
+from tools.discovery_export import export  # noqa: E402
+from tools.outline_index import OutlineIndex  # noqa: E402
+
+SECTIONS = ["Unit Description", "Teaching Arrangements", "Assessment Schedule", "Late penalties"]
+
+
+def corpus(n):
+    docs = []
+    for i in range(n):
+        unit = f"KIT{100 + i // 8:03d}"
+        text = f"{unit} {SECTIONS[i % 4]} passage {i}. " + "Students meet weekly for tutorials. " * 8
+        docs.append({"document_id": f"doc-{i:06d}", "unit": unit, "semester": f"Semester {1 + i // 4 % 2}",
+                     "section": SECTIONS[i % 4], "subsection": "", "text": text, "_tokens": _tokens(text)})
+    # 乱序放进 stub，验证导出按 document_id 排序分页
+    return docs[::2] + docs[1::2]
+
+
+def read_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["document_id"] for line in f]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=3000)
+    ap.add_argument("--latency", type=float, default=0.02)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, StubDiscovery(corpus(args.docs)) as d:
+        cli = DiscoveryClient(d.url, "k", retries=1, backoff=0.01)
+        out = os.path.join(tmp, "export.jsonl")
+        rep = export(cli, "p1", out, page_size=100)
+        ids = read_ids(out)
+        check("every document exported once, sorted", ids == sorted({f"doc-{i:06d}" for i in range(args.docs)}),
+              f"{len(ids)} lines, {rep['pages']} pages")
+        with open(out, encoding="utf-8") as f:
+            first = json.loads(f.readline())
+        check("passages and outline fields kept", first["document_passages"] and first["unit"] == "KIT100"
+              and first["semester"] == "Semester 1" and first["section"] == "Unit Description")
+
+        # 第 7 页之后服务端持续报 503：导出中断，检查点停在已写完的页
+        def fail_later(state):
+            if state["offset"] >= 700:
+                d.error_rate = 1.0
+
+        try:
+            export(cli, "p1", out, page_size=100, progress=fail_later)
+            failed = False
+        except DiscoveryError:
+            failed = True
+        with open(out + ".checkpoint", encoding="utf-8") as f:
+            state = json.load(f)
+        with open(out, "ab") as f:
+            f.write(b'{"document_id": "half-written')       # 模拟写了一半就崩溃
+        check("failure part-way leaves a checkpoint", failed and state["offset"] in (700, 800) and not state["done"],
+              str(state))
+        d.error_rate = 0.0
+        before = d.requests
+        rep = export(cli, "p1", out, page_size=100, resume=True)
+        ids = read_ids(out)
+        check("resume: no duplicates, no gaps, no half-written line",
+              rep["resumed"] and ids == sorted(f"doc-{i:06d}" for i in range(args.docs)),
+              f"{len(ids)} lines")
+        check("resume only fetches the remaining pages",
+              d.requests - before == -(-(args.docs - state["offset"]) // 100), f"{d.requests - before} requests")
+        check("finished export + resume is a no-op", export(cli, "p1", out, page_size=100, resume=True)["pages"] == 0)
+
+        units = ["KIT100", "KIT101", "KIT102"]
+        rep = export(cli, "p1", out, filters=[f'unit:"{u}"' for u in units], page_size=5)
+        idx = OutlineIndex.from_export(out)
+        check("per-filter partitions -> outline index", rep["written"] == 24 and idx.units() == units,
+              str(idx.units()))
+
+        # 预取：下游处理每页 latency 秒，请求也要 latency 秒，重叠后总时长接近一半
+        d.latency = args.latency
+        slow = (lambda s: time.sleep(args.latency))
+        n_pages = 20
+        cli = DiscoveryClient(d.url, "k")
+        timing = {}
+        for prefetch in (False, True):
+            t0 = time.perf_counter()
+            export(cli, "p1", out, page_size=-(-args.docs // n_pages), prefetch=prefetch, progress=slow)
+            timing[prefetch] = time.perf_counter() - t0
+        check("prefetch overlaps fetching and processing", timing[True] < 0.8 * timing[False],
+              f"sequential {timing[False]:.2f}s vs prefetch {timing[True]:.2f}s")
+        d.latency = 0.0
+
+        # 内存：峰值只与页大小有关，与文档总数无关
+        peaks = []
+        for n in (args.docs // 4, args.docs):
+            d.corpus = corpus(n)
+            tracemalloc.start()
+            export(cli, "p1", out, page_size=100)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        check("constant memory in collection size", peaks[1] < 1.5 * peaks[0],
+              f"peak {peaks[0] / 1024:.0f} KiB for {args.docs // 4} docs vs {peaks[1] / 1024:.0f} KiB for {args.docs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Offline checks for tools/faq_ingest.py (incremental knowledge-base rebuild).
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/check_faq_ingest.py [--scale 20]
+
+Works on a temp copy of the CSV: edits a few rows, checks the detected delta,
+that the incrementally updated FaqIndex scores exactly like a full rebuild,
+that concurrent searches never fail during the swap, and that MockAPI and the
+local FAQ API catalog only receive the changed rows. A delete+insert ingest is
+followed by a semantic (faq_vectors) query in the ingesting process and in a
+fresh one, on a temp copy of tools/ + knowledgebase/; the vector file built
+offline before the edit must be ignored (not rewritten) until it is rebuilt. Then times a full rebuild
+against a delta on a --scale times larger CSV.
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_faq_store import scaled_csv  # noqa: E402
+from check_discovery_client import check  # noqa: E402
+from stub_servers import FAQ_CSV, StubMockApi  # noqa: E402
+from tools import faq_artifact, faq_index, faq_store  # noqa: E402
+from tools import seed_mockapi_from_csv as seeder  # noqa: E402
+from tools.faq_api import FaqCatalog  # noqa: E402
+from tools.faq_index import FaqIndex, artifact_is_fresh, link_from_intent  # noqa: E402
+from tools.faq_ingest import Ingestor  # noqa: E402
+from tools.faq_store import FaqStore, store_is_fresh  # noqa: E402
+
+QUERIES = ["how do I see my timetable", "special consideration", "library opening hours",
+           "enrol in a unit", "reset my password", "graduation ceremony", "EDITED marker text"]
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        r = csv.DictReader(f)
+        return r.fieldnames, list(r)
+
+
+def write_rows(path, fields, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+
+
+def edit(path, n_update=3, n_delete=2, n_insert=2, tag="EDITED"):
+    """Update, delete and insert a few rows in place; returns the touched intents."""
+    fields, rows = read_rows(path)
+    updated = [r["intent"] for r in rows[10:10 + n_update]]
+    for r in rows[10:10 + n_update]:
+        r["answer"] = f"{tag} marker text. " + r["answer"]
+    deleted = [r["intent"] for r in rows[40:40 + n_delete]]
+    del rows[40:40 + n_delete]
+    inserted = []
+    for i in range(n_insert):
+        intent = f"app_answers_detail_a_id_{990000 + i}_kw_{tag.lower()}"
+        rows.insert(5, {"intent": intent, "question": f"How do I test {tag} ingest number {i}?",
+                        "answer": f"This is {tag} row {i}. It was inserted.", "filename": f"{intent}.html"})
+        inserted.append(intent)
+    write_rows(path, fields, rows)
+    return updated, deleted, inserted
+
+
+def score_map(index, query):
+    return {(index.docs[d]["link"], index.docs[d]["question"]): round(s, 9) for d, s in index.scores(query).items()}
+
+
+def setup(tmp, src):
+    paths = {"csv": os.path.join(tmp, "faq.csv"), "store": os.path.join(tmp, "faq_store.bin"),
+             "artifact": os.path.join(tmp, "faq_artifact.jsonl.gz")}
+    shutil.copy(src, paths["csv"])
+    faq_store.build(paths["csv"], paths["store"])
+    faq_artifact.build(paths["csv"], paths["artifact"])
+    return paths
+
+
+ZEBRA_Q = "How do I adopt a zebra on campus?"
+# 子进程：在临时的 tools/ + knowledgebase/ 副本里跑，默认路径都指向副本
+INGEST_AND_QUERY = """
+import shutil
+from tools import faq_index, faq_vectors, query_normalizer
+from tools.faq_ingest import Ingestor
+faq_index.default_index()
+faq_vectors.default_vector_index()         # ingest 前已加载：之后按 ingest 后的状态重建
+query_normalizer.normalize("adopt a zebra")   # 旧词表的归一化器 + 结果缓存
+ing = Ingestor()
+ing.ingest(force=True)                     # 建立 intent -> 槽位映射（常驻 watcher 的状态）
+shutil.copy("edited.csv", faq_index.DEFAULT_CSV)
+ing.ingest()                               # 删除 + 插入：进程内索引有空洞 / 复用的槽位
+print(faq_vectors.default_vector_index().search("adopt a zebra on campus", top_k=1)[0]["question"])
+print("zebra" in query_normalizer.default_normalizer().words)
+"""
+QUERY = """
+from tools import faq_vectors, query_normalizer as qn
+v = faq_vectors.default_vector_index()
+fresh_vocab = qn.Normalizer.load(qn.VOCAB_PATH, qn.source_sha1())
+print(v.search("adopt a zebra on campus", top_k=1)[0]["question"], len(v.docs), v.matrix.shape[0],
+      type(v.matrix).__name__, fresh_vocab is not None and "zebra" in fresh_vocab.words, sep="\\t")
+"""
+
+
+def check_vectors_cross_process():
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copytree(os.path.join(ROOT, "tools"), os.path.join(tmp, "tools"),
+                        ignore=shutil.ignore_patterns("__pycache__"))
+        kb = os.path.join(tmp, "knowledgebase")
+        os.makedirs(kb)
+        csv_path = os.path.join(kb, os.path.basename(faq_index.DEFAULT_CSV))
+        shutil.copy(FAQ_CSV, csv_path)
+        faq_store.build(csv_path, os.path.join(kb, "faq_store.bin"))
+        faq_artifact.build(csv_path, os.path.join(kb, os.path.basename(faq_index.DEFAULT_ARTIFACT)))
+
+        env = {k: v for k, v in os.environ.items() if k not in ("FAQ_STORE_PATH", "FAQ_VECTORS_PATH")}
+        env["PYTHONPATH"] = tmp
+
+        def run(code, *args):
+            r = subprocess.run([sys.executable, *(args or ("-c", code))], cwd=tmp, env=env, capture_output=True,
+                               text=True, timeout=300)
+            if r.returncode:
+                print(r.stderr, file=sys.stderr)
+            return r.stdout.strip()
+
+        npy = os.path.join(kb, "faq_vectors.npy")
+        run(None, os.path.join("tools", "faq_vectors.py"), "build")   # 离线按原 CSV 建好向量
+        built = os.stat(npy).st_mtime_ns
+        check("the prebuilt vector file is mmapped", run(QUERY).split("\t")[3] == "memmap")
+        fields, rows = read_rows(csv_path)
+        del rows[40:43]
+        rows.insert(5, {"intent": "app_answers_detail_a_id_990100_kw_zebra", "question": ZEBRA_Q,
+                        "answer": "Zebras cannot be adopted on campus.", "filename": "zebra.html"})
+        write_rows(os.path.join(tmp, "edited.csv"), fields, rows)
+
+        live = run(INGEST_AND_QUERY).splitlines()
+        check("semantic search after a delete+insert ingest (same process)", live[0] == ZEBRA_Q, repr(live))
+        check("the ingesting process normalises with the new vocabulary", live[1] == "True", repr(live))
+        fresh = run(QUERY).split("\t")
+        check("semantic search after a delete+insert ingest (fresh process): vectors aligned with the store",
+              fresh[0] == ZEBRA_Q and fresh[1] == fresh[2] == str(len(rows)), repr(fresh))
+        check("a stale vector file is not used, and queries never rewrite it",
+              fresh[3] == "ndarray" and os.stat(npy).st_mtime_ns == built, repr(fresh))
+        check("ingest rebuilt the query vocabulary artifact: a fresh process loads it", fresh[4] == "True",
+              repr(fresh))
+        run(None, os.path.join("tools", "faq_vectors.py"), "build")
+        fresh = run(QUERY).split("\t")
+        check("after an offline rebuild the vector file is aligned and mmapped again",
+              fresh[0] == ZEBRA_Q and fresh[1] == fresh[2] == str(len(rows)) and fresh[3] == "memmap", repr(fresh))
+
+
+def check_duplicate_intents():
+    """A repeated intent keeps its first row and a blank intent is skipped, in the store build and in ingest."""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "source.csv")
+        fields, rows = read_rows(FAQ_CSV)
+        first = rows[10]
+        rows.append(dict(first, question="DUPLICATE intent: which row wins?", answer="The later DUPLICATE row."))
+        rows.append(dict(rows[20], intent="", question="Row without an intent BLANK"))
+        write_rows(csv_path, fields, rows)
+        p = setup(tmp, csv_path)
+        store = FaqStore.open(p["store"])
+        intents = list(store.column("intent"))
+        check("store build: first row of a repeated intent kept, blank intent skipped",
+              len(intents) == len(set(intents)) == len(rows) - 2 and "" not in intents
+              and store.view({"question": "question"})[intents.index(first["intent"])]["question"]
+              == first["question"].strip(), f"{len(intents)} rows")
+
+        faq_index._DEFAULT_INDEX = FaqIndex.from_store(store)
+        ing = Ingestor(p["csv"], p["store"], p["artifact"])
+        delta = ing.ingest(force=True)
+        check("ingest agrees with the build (nothing to apply, both extra rows skipped)",
+              not delta and delta.skipped == 2, str(delta.summary()))
+
+        first["answer"] = "EDITED marker text. " + first["answer"]
+        write_rows(p["csv"], fields, rows)
+        delta = ing.ingest()
+        full = FaqIndex.from_store(FaqStore.from_csv(p["csv"]))
+        check("editing a repeated intent updates its first row; index == full rebuild",
+              [r["intent"] for r in delta.updates] == [first["intent"]]
+              and all(score_map(faq_index._DEFAULT_INDEX, q) == score_map(full, q)
+                      for q in QUERIES + ["DUPLICATE intent", "BLANK"]), str(delta.summary()))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", type=int, default=20)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        p = setup(tmp, FAQ_CSV)
+        faq_index._DEFAULT_INDEX = FaqIndex.from_store(FaqStore.open(p["store"]))
+        ing = Ingestor(p["csv"], p["store"], p["artifact"])
+        check("unchanged CSV -> empty delta", not ing.ingest())
+
+        updated, deleted, inserted = edit(p["csv"])
+        seen = []
+        ing.subscribe(seen.append)
+        stop, errors = threading.Event(), []
+
+        def reader():
+            while not stop.is_set():
+                try:
+                    faq_index._DEFAULT_INDEX.search("timetable", top_k=5)
+                except Exception as e:   # noqa: BLE001
+                    errors.append(e)
+
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for t in readers:
+            t.start()
+        delta = ing.ingest()
+        stop.set()
+        for t in readers:
+            t.join()
+        check("delta has exactly the edited rows",
+              sorted(r["intent"] for r in delta.updates) == sorted(updated)
+              and sorted(delta.deletes) == sorted(deleted)
+              and sorted(r["intent"] for r in delta.inserts) == sorted(inserted),
+              str(delta.summary()))
+        check("subscribers notified once", len(seen) == 1)
+        check("no reader errors during swap", not errors, repr(errors[:1]))
+        check("store and artifact fresh after ingest",
+              store_is_fresh(p["csv"], p["store"]) and artifact_is_fresh(p["csv"], p["artifact"]))
+
+        full = FaqIndex.from_csv(p["csv"])
+        live = faq_index._DEFAULT_INDEX
+        check("incremental index scores == full rebuild",
+              all(score_map(live, q) == score_map(full, q) for q in QUERIES))
+        gone = {link_from_intent(i) for i in deleted}
+        check("deleted rows are gone, edits are searchable",
+              not any(d is not None and d["link"] in gone for d in live.docs)
+              and any(r["answer"].startswith("EDITED marker") for r in live.search("EDITED marker text", 10)))
+
+        # 第二轮：再改一次，验证槽位复用与映射维护
+        edit(p["csv"], 1, 1, 3, tag="AGAIN")
+        ing.ingest()
+        full = FaqIndex.from_csv(p["csv"])
+        check("second delta still matches a full rebuild",
+              all(score_map(faq_index._DEFAULT_INDEX, q) == score_map(full, q) for q in QUERIES + ["AGAIN"]))
+
+        os.utime(p["csv"])
+        ing.poll()
+        check("poll: mtime change with identical content is a no-op", not ing.poll() and not ing.ingest())
+
+    check_vectors_cross_process()
+    check_duplicate_intents()
+
+    # MockAPI 只收到变化的行
+    with tempfile.TemporaryDirectory() as tmp, StubMockApi() as api:
+        p = setup(tmp, FAQ_CSV)
+        for _, payload in seeder.iter_rows(p["csv"]):
+            api.create(payload)
+        catalog = FaqCatalog.from_csv(p["csv"])
+        updated, deleted, inserted = edit(p["csv"])
+        ing = Ingestor(p["csv"], p["store"], p["artifact"], mockapi_url=api.base_url, update_default_index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            delta = ing.ingest()
+        by_intent = {it["intent"]: it for it in api.items}
+        check("MockAPI synced with PUT/POST/DELETE only",
+              delta.mockapi == {"created": len(inserted), "updated": len(updated), "deleted": len(deleted),
+                                "failed": 0}
+              and len(api.items) == 504 - len(deleted) + len(inserted)
+              and all(by_intent[i]["answer"].startswith("EDITED") for i in updated)
+              and not any(i in by_intent for i in deleted), str(delta.mockapi))
+
+        patched = catalog.apply_delta(delta.inserts + delta.updates, delta.deletes, delta.source_sha1[:12])
+        full = FaqCatalog.from_csv(p["csv"])
+        check("local FAQ API catalog delta == full reload (ids of unchanged rows kept)",
+              patched.version == full.version
+              and {it["intent"]: it["answer"] for it in patched.items} == {it["intent"]: it["answer"] for it in full.items}
+              and all(patched.get(it["id"])["intent"] == it["intent"] for it in catalog.items
+                      if it["intent"] not in deleted)
+              and all({r["intent"] for r in patched.find(q, limit=100)[0]} == {r["intent"] for r in full.find(q, limit=100)[0]}
+                      for q in QUERIES))
+
+    # 全量 vs 增量耗时
+    with tempfile.TemporaryDirectory() as tmp:
+        big = os.path.join(tmp, "big.csv")
+        scaled_csv(FAQ_CSV, args.scale, big)
+        p = setup(tmp, big)
+        faq_index.prepare.cache_clear()
+        t0 = time.perf_counter()
+        faq_store.build(p["csv"], p["store"])
+        faq_artifact.build(p["csv"], p["artifact"])
+        index = FaqIndex.from_store(FaqStore.open(p["store"]))
+        full_ms = (time.perf_counter() - t0) * 1000
+        faq_index._DEFAULT_INDEX = index
+        ing = Ingestor(p["csv"], p["store"], p["artifact"])
+        ing.ingest(force=True)    # 建立 intent -> 槽位映射
+        edit(p["csv"], tag="BIG")
+        t0 = time.perf_counter()
+        delta = ing.ingest()
+        delta_ms = (time.perf_counter() - t0) * 1000
+        check(f"delta on {delta.unchanged + len(delta.inserts) + len(delta.updates)} rows is cheaper than a full rebuild",
+              delta_ms < full_ms, f"full {full_ms:.0f} ms vs delta {delta_ms:.0f} ms {delta.summary()['timings_ms']}")
+        faq_index._DEFAULT_INDEX = None
+
+
+if __name__ == "__main__":
+    main()
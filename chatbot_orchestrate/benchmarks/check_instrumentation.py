@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Offline checks for tools/instrumentation.py.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/check_instrumentation.py
+
+Covers: wrapped tools keep their signature/docstring, per-thread shards merge
+correctly (exited threads' shards folded away, reset() by generation), upstream time/bytes and cache hits are attributed to the calling
+tool, the Prometheus text is well-formed, and the slow-call profiler keeps
+profiles only for slow calls.
+"""
+
+import inspect
+import os
+import re
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_discovery_client import BODY, check  # noqa: E402
+from stub_servers import StubDiscovery  # noqa: E402
+from tools import instrumentation as ins  # noqa: E402
+from tools.discovery_client import DiscoveryClient  # noqa: E402
+
+
+def sample_tool(query: str, top_k: int = 5, threshold: float = 0.6) -> list:
+    """Docstring the ADK parses for the tool schema."""
+    return [query] * top_k
+
+
+def check_reset():
+    tool = ins.instrument("reset_probe")(sample_tool)
+    # reset() 只改代数；存活线程下一次写时清空自己的分片
+    wrote, go, done = threading.Event(), threading.Event(), threading.Event()
+
+    def worker():
+        for _ in range(5):
+            tool("q")
+        wrote.set()
+        go.wait()
+        for _ in range(3):
+            tool("q")
+        done.set()
+
+    t = threading.Thread(target=worker)
+    t.start()
+    wrote.wait()
+    ins.reset()
+    check("reset() drops live and exited shards' data", "reset_probe" not in ins.snapshot()["tools"])
+    go.set()
+    done.wait()
+    check("a live thread's writes after reset() count from zero", ins.snapshot()["tools"]["reset_probe"]["calls"] == 3)
+    t.join()
+    check("and survive its exit", ins.snapshot()["tools"]["reset_probe"]["calls"] == 3 and len(ins._SHARDS) <= 1)
+
+
+def main():
+    wrapped = ins.instrument("sample")(sample_tool)
+    check("signature and docstring preserved",
+          inspect.signature(wrapped) == inspect.signature(sample_tool) and wrapped.__doc__ == sample_tool.__doc__)
+
+    ins.reset()
+    threads = [threading.Thread(target=lambda: [wrapped("q", top_k=2) for _ in range(250)]) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    snap = ins.snapshot()["tools"]["sample"]
+    check("shards merge across threads", snap["calls"] == 2000 and snap["wall"]["count"] == 2000, str(snap["calls"]))
+    check("result counts recorded", snap["results"]["p50_le"] == 2)
+    check("exited threads' shards folded into the base shard",
+          all(t.is_alive() for t in (s.thread() for s in ins._SHARDS) if t is not None) and len(ins._SHARDS) <= 1
+          and ins.snapshot()["tools"]["sample"]["calls"] == 2000, f"{len(ins._SHARDS)} shards")
+
+    boom = ins.instrument("boom")(lambda: 1 / 0)
+    try:
+        boom()
+    except ZeroDivisionError:
+        pass
+    check("errors counted and re-raised", ins.snapshot()["tools"]["boom"]["errors"] == 1)
+
+    with StubDiscovery(latency=0.02) as d:
+        cli = DiscoveryClient(d.url, "k")
+
+        @ins.instrument("disc")
+        def disc(q):
+            return cli.query("p1", dict(BODY, natural_language_query=q), cached=True)
+
+        for _ in range(3):
+            disc("instrumented exam timetable")
+        s = ins.snapshot()["tools"]["disc"]
+        check("upstream time/bytes attributed to the tool",
+              s["upstream_requests"] == 1 and s["bytes_in"] > 0 and s["bytes_out"] > 0
+              and s["upstream"]["sum"] >= 0.02, str(s))
+        check("cache hits/misses attributed", s["cache_hits"] == 2 and s["cache_misses"] == 1)
+        cli.query("p1", BODY)   # 工具调用之外的请求不计入
+        check("calls outside a tool are not attributed", ins.snapshot()["tools"]["disc"]["upstream_requests"] == 1)
+
+    text = ins.prometheus_text()
+    line_re = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? [0-9.e+-]+$')
+    bad = [ln for ln in text.splitlines() if ln and not ln.startswith("#") and not line_re.match(ln)]
+    check("prometheus text well-formed", not bad and 'tool_duration_seconds_bucket{tool="sample",le="+Inf"} 2000' in text,
+          bad[0] if bad else "")
+
+    ins.set_slow_call_profiler(slow_ms=30, sample=1.0)
+    fast = ins.instrument("fast")(lambda: None)
+    slow = ins.instrument("slow")(lambda: time.sleep(0.05))
+    fast()
+    slow()
+    profs = ins.slow_profiles()
+    check("profiler keeps only slow calls", [p["tool"] for p in profs] == ["slow"] and "sleep" in profs[0]["profile"])
+    ins.set_slow_call_profiler(None)
+
+    t0 = time.perf_counter()
+    n = 20000
+    for _ in range(n):
+        fast()
+    per = (time.perf_counter() - t0) / n * 1e6
+    print(f"     wrapper overhead ≈ {per:.1f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
+    check_reset()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Offline checks for tools/query_cache.py and the cached Discovery path.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/check_query_cache.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_discovery_client import BODY, check  # noqa: E402
+from stub_servers import StubDiscovery  # noqa: E402
+from tools import discovery_client  # noqa: E402
+from tools.deadline import DeadlineExceeded  # noqa: E402
+from tools.query_cache import QueryCache, make_key  # noqa: E402
+
+
+def timed_out(cache, key, compute):
+    try:
+        return cache.get_or_compute(key, compute)
+    except Exception as e:   # noqa: BLE001  (检查里要看的是异常类型)
+        return e
+
+
+def main():
+    check("key normalises query and collection order",
+          make_key("  Exam   Timetable ", ["b", "a"], 'unit:"KIT700"', 5)
+          == make_key("exam timetable", ["a", "b"], 'unit:"KIT700"', 5))
+
+    now = [0.0]
+    c = QueryCache(max_items=2, ttl=10, clock=lambda: now[0])
+    c.set("a", 1); c.set("b", 2); c.get("a"); c.set("c", 3)
+    check("LRU evicts least recently used", c.get("b") == (False, None) and c.get("a") == (True, 1))
+    now[0] = 11
+    check("TTL expiry", c.get("a") == (False, None) and c.stats()["expirations"] >= 1)
+
+    calls = []
+    c = QueryCache()
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"v": 1}
+
+    threads = [threading.Thread(target=c.get_or_compute, args=("k", slow)) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    s = c.stats()
+    check("single-flight: one upstream call for 20 concurrent misses", len(calls) == 1, str(s))
+
+    # 领头者因自己的截止时间失败：没有截止时间的等待者自己重算，真正的上游错误照常传给等待者
+    c = QueryCache()
+    started = threading.Event()
+
+    def leader_times_out():
+        started.set()
+        time.sleep(0.1)
+        raise DeadlineExceeded("leader's own deadline")
+
+    out = {}
+    lead = threading.Thread(target=lambda: out.setdefault("leader", timed_out(c, "k", leader_times_out)))
+    lead.start()
+    started.wait()
+    out["waiter"] = c.get_or_compute("k", lambda: {"v": 2})
+    lead.join()
+    check("waiter without a deadline recomputes after the leader's DeadlineExceeded",
+          out["waiter"] == {"v": 2} and isinstance(out["leader"], DeadlineExceeded), str(out))
+
+    c = QueryCache()
+    started.clear()
+
+    def upstream_fails():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("upstream 500")
+
+    lead = threading.Thread(target=timed_out, args=(c, "k", upstream_fails))
+    lead.start()
+    started.wait()
+    err = timed_out(c, "k", lambda: {"v": 3})
+    lead.join()
+    check("upstream errors still reach coalesced waiters", isinstance(err, RuntimeError), repr(err))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "cache.sqlite")
+        c1 = QueryCache(db_path=db)
+        c1.get_or_compute("k", lambda: {"snippets": ["x"]})
+        c1.disk.close()
+        c2 = QueryCache(db_path=db)
+        check("disk tier survives restart", c2.get_or_compute("k", lambda: None) == {"snippets": ["x"]}
+              and c2.stats()["disk_hits"] == 1)
+        c2.disk.close()
+
+    with StubDiscovery(latency=0.02) as d:
+        cli = discovery_client.DiscoveryClient(d.url, "k")
+        for q in ("When are my exams", "when are  my EXAMS", "when are my exams"):
+            cli.query("p1", dict(BODY, natural_language_query=q), cached=True)
+        check("cached Discovery query hits upstream once", d.requests == 1, str(discovery_client.cache_stats()))
+
+
+if __name__ == "__main__":
+    main()
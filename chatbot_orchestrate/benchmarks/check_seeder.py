@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Offline checks for tools/seed_mockapi_from_csv.py against the local MockAPI stub.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/check_seeder.py [--latency 0.02] [--workers 8]
+
+Seeds the knowledge-base CSV with injected 429s, re-runs to confirm the
+checkpoint resumes, and runs UPSERT mode against the already-seeded server.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from check_discovery_client import check  # noqa: E402
+from stub_servers import FAQ_CSV, StubMockApi  # noqa: E402
+from tools import seed_mockapi_from_csv as seeder  # noqa: E402
+
+
+def run(**kw):
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        counts = seeder.seed(FAQ_CSV, **kw)
+    return counts, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.02, help="stub latency per request (s)")
+    ap.add_argument("--workers", type=int, default=8)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubMockApi(latency=args.latency, fail_first=5, error_status=429) as api:
+        ckpt = os.path.join(tmp, "seed.ckpt")
+        counts, dt = run(base_url=api.base_url, rate=200, max_rate=400, workers=args.workers, checkpoint=ckpt)
+        check("all rows created despite injected 429s", counts["created"] == 504 and len(api.items) == 504,
+              f"{counts} in {dt:.2f}s ({counts['created'] / dt:.0f} rows/s)")
+
+        counts, _ = run(base_url=api.base_url, rate=200, max_rate=400, workers=args.workers, checkpoint=ckpt)
+        check("re-run resumes from checkpoint", counts["resumed"] == 504 and counts["created"] == 0, str(counts))
+
+        counts, _ = run(base_url=api.base_url, rate=200, max_rate=400, workers=args.workers,
+                        checkpoint=os.path.join(tmp, "fresh.ckpt"), upsert=True)
+        check("upsert skips intents already on the server", counts["existing"] == 504 and len(api.items) == 504,
+              str(counts))
+
+
+if __name__ == "__main__":
+    main()
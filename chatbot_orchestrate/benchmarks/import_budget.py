@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Cold-start import budget for the tools package, measured with `python -X importtime`.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/import_budget.py [--runs 5] [--scale 1.0] [--json]
+
+Each module is imported in a fresh interpreter (best of --runs). The ADK SDK
+(ibm_watsonx_orchestrate) is imported first when available, so the figure is
+the module's own cost on top of what every tool runner already pays. A module
+fails if its cumulative import time exceeds its budget or if importing it
+drags in a module listed in DEFERRED; those must only be imported on first
+use. Exits 1 on any failure.
+
+Budgets are 2x the slowest of several measurements on the reference machine.
+On a slower machine they are scaled by how much longer a fixed set of stdlib
+imports (CALIBRATION), timed between the module's own runs, takes there
+than on the reference machine. They are
+only ever loosened, never tightened; --no-calibrate turns this off. --scale
+multiplies on top, for CI machines that are noisy as well as slow.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> budget in milliseconds (cumulative, SDK excluded). 实测值（多轮里最慢的一次）的 2 倍，给机器抖动留余量；
+# 真正卡住回归的是 DEFERRED 检查（改动前 discovery_tool ≈ 100 ms，intent_fastpath_func ≈ 420 ms）
+BUDGET_MS = {
+    "tools.discovery_client": 12,
+    "tools.discovery_tool": 12,
+    "tools.discovery_export": 20,
+    "tools.query_cache": 10,
+    "tools.deadline": 5,
+    "tools.http_cassette": 18,
+    "tools.instrumentation": 5,
+    "tools.faq_index": 20,
+    "tools.faq_store": 22,
+    "tools.faq_ingest": 30,
+    "tools.FAQ_AskUs_func": 25,
+    "tools.intent_fastpath": 28,
+    "tools.intent_fastpath_func": 30,
+    "tools.outlinetool": 20,
+    "tools.outline_index": 25,
+    "tools.outline_ingest": 28,
+    "tools.query_normalizer": 25,
+    "tools.jwt_verify": 16,
+    "tools.snippet_pack": 10,
+    "tools.whoami_func": 20,
+    "app": 35,
+}
+
+# 机器校准：这组标准库的冷导入在定预算的机器上约 CALIBRATION_REF_MS；更慢的机器按比例放宽预算（只放宽不收紧）
+CALIBRATION = "json, email.message, decimal, dataclasses, logging, tempfile"
+CALIBRATION_REF_MS = 60.0
+
+# 这些依赖只能在首次使用时导入
+DEFERRED = ("requests", "urllib3", "asyncio", "sqlite3", "numpy", "pandas", "cProfile", "ibm_watson",
+            "concurrent")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")   # 缩进 = 嵌套深度
+_SDK = "ibm_watsonx_orchestrate.agent_builder.tools"
+
+
+def _sdk_available() -> bool:
+    r = subprocess.run([sys.executable, "-c", f"import {_SDK}"], cwd=ROOT, capture_output=True)
+    return r.returncode == 0
+
+
+def _importtime(code: str):
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                       capture_output=True, text=True)
+    return r, [m for m in map(_LINE_RE.match, r.stderr.splitlines()) if m]
+
+
+def calibrate() -> float:
+    """Cumulative ms of one fresh-interpreter import of the CALIBRATION modules (top-level ones summed)."""
+    return sum(int(m.group(2)) for m in _importtime(f"import {CALIBRATION}")[1] if not m.group(3)) / 1000.0
+
+
+def measure(module: str, preload_sdk: bool) -> dict:
+    """One fresh-interpreter import: cumulative µs of `module` and the top-level modules it loaded."""
+    pre = f"import {_SDK}; " if preload_sdk else ""
+    code = f"{pre}import sys; before = set(sys.modules); import {module}; " \
+           f"print('\\n'.join(sorted(set(sys.modules) - before)))"
+    r, lines = _importtime(code)
+    if r.returncode != 0:
+        return {"error": (r.stderr.strip().splitlines() or ["import failed"])[-1]}
+    cumulative = None
+    for m in lines:
+        if m.group(4) == module and not m.group(3):
+            cumulative = int(m.group(2))
+    if cumulative is None:   # 已被预加载（例如被 SDK 间接导入）
+        return {"error": f"{module} was not imported in this interpreter"}
+    return {"us": cumulative, "loaded": r.stdout.split()}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--scale", type=float, default=float(os.getenv("IMPORT_BUDGET_SCALE", "1.0")))
+    ap.add_argument("--no-calibrate", action="store_true",
+                    help="use the budgets as written instead of scaling them to this machine")
+    ap.add_argument("--json", action="store_true")
+    ap.add_argument("modules", nargs="*", help="subset of the budgeted modules")
+    args = ap.parse_args(argv)
+
+    preload = _sdk_available()
+    rows, failed = [], False
+    for module in args.modules or list(BUDGET_MS):
+        # 校准和测量交替进行，校准反映的是测这个模块时的机器负载
+        runs, cal = [], []
+        for _ in range(max(1, args.runs)):
+            runs.append(measure(module, preload))
+            if not args.no_calibrate:
+                cal.append(calibrate())
+        factor = max(1.0, min(cal) / CALIBRATION_REF_MS) if cal else 1.0
+        budget = BUDGET_MS[module] * args.scale * factor
+        err = next((r["error"] for r in runs if "error" in r), None)
+        if err:
+            rows.append({"module": module, "status": "SKIP", "detail": err})
+            continue
+        best_ms = min(r["us"] for r in runs) / 1000.0
+        leaked = sorted({m.split(".")[0] for m in runs[0]["loaded"]} & set(DEFERRED))
+        ok = best_ms <= budget and not leaked
+        failed |= not ok
+        rows.append({"module": module, "status": "OK" if ok else "FAIL", "ms": round(best_ms, 2),
+                     "budget_ms": round(budget, 1), "factor": round(factor, 2), "deferred_imported": leaked})
+
+    if args.json:
+        print(json.dumps({"sdk_preloaded": preload, "results": rows}, indent=2))
+    else:
+        print(f"SDK preloaded: {preload}")
+        for r in rows:
+            if r["status"] == "SKIP":
+                print(f"SKIP {r['module']:<28} {r['detail']}")
+            else:
+                extra = f"  imports {', '.join(r['deferred_imported'])} eagerly" if r["deferred_imported"] else ""
+                print(f"{r['status']:<4} {r['module']:<28} {r['ms']:>7.2f} ms / {r['budget_ms']:>5} ms"
+                      f"  (x{r['factor']:.2f}){extra}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test of the tool layer against local stand-ins.
+
+Usage (from chatbot_orchestrate/):
+    python benchmarks/loadtest.py [--concurrency 16] [--requests 400] [--latency 0.03]
+                                  [--jitter 0.02] [--error-rate 0.0] [--tools wd_query,faq_askus]
+                                  [--no-cache] [--out results.json]
+
+Starts StubDiscovery, StubMockApi and StubAuth (benchmarks/stub_servers.py),
+points the tools at them through the usual environment variables, and drives
+each tool with a query mix drawn from knowledgebase/utas_faq_agent_QA.csv and
+prompts/fewshot_intent.jsonl (Zipf-like popularity, so caches see realistic
+repeats). Prints one JSON document: per-tool throughput, p50/p95/p99/max
+latency and error rate, plus the run parameters, so runs can be diffed.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import StubAuth, StubDiscovery, StubMockApi  # noqa: E402
+from tools import instrumentation  # noqa: E402
+
+FAQ_CSV = os.path.join(ROOT, "knowledgebase", "utas_faq_agent_QA.csv")
+FEWSHOT = os.path.join(ROOT, "prompts", "fewshot_intent.jsonl")
+UNITS = ["KIT700", "KIT501", "KIT502", "KIT514"]
+
+ALL_TOOLS = ("wd_query", "djv3", "faq_askus", "intent_fast", "mockapi_search", "mockapi_get",
+             "auth_login", "auth_me", "whoami_local")
+
+
+# ---------------- query mix ----------------
+def load_queries(seed: int = 0) -> List[str]:
+    qs: List[str] = []
+    with open(FAQ_CSV, newline="", encoding="utf-8") as f:
+        qs += [r["question"] for r in csv.DictReader(f) if r.get("question")]
+    with open(FEWSHOT, encoding="utf-8") as f:
+        qs += [json.loads(line)["user"] for line in f if line.strip()]
+    qs = list(dict.fromkeys(qs))
+    random.Random(seed).shuffle(qs)
+    return qs
+
+
+class QueryMix:
+    """Zipf(s=1.1)-weighted sampler over the pool; thread-safe, reproducible per seed."""
+
+    def __init__(self, pool: List[str], seed: int = 0, s: float = 1.1):
+        self.pool = pool
+        self.weights = [1.0 / (i + 1) ** s for i in range(len(pool))]
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self, n: int) -> List[str]:
+        with self.lock:
+            return self.rnd.choices(self.pool, weights=self.weights, k=n)
+
+
+# ---------------- stats ----------------
+def percentile(sorted_xs: List[float], p: float) -> float:
+    if not sorted_xs:
+        return 0.0
+    k = max(0, min(len(sorted_xs) - 1, math.ceil(p / 100.0 * len(sorted_xs)) - 1))   # nearest-rank
+    return sorted_xs[k]
+
+
+def summarize(latencies: List[float], errors: int, wall: float) -> Dict[str, Any]:
+    xs = sorted(latencies)
+    n = len(xs)
+    return {
+        "requests": n,
+        "errors": errors,
+        "error_rate": round(errors / n, 4) if n else 0.0,
+        "throughput_rps": round(n / wall, 1) if wall > 0 else 0.0,
+        "p50_ms": round(percentile(xs, 50) * 1000, 2),
+        "p95_ms": round(percentile(xs, 95) * 1000, 2),
+        "p99_ms": round(percentile(xs, 99) * 1000, 2),
+        "mean_ms": round(sum(xs) / n * 1000, 2) if n else 0.0,
+        "max_ms": round(xs[-1] * 1000, 2) if n else 0.0,
+        "wall_s": round(wall, 3),
+    }
+
+
+def drive(op: Callable[[str], bool], queries: List[str], concurrency: int) -> Dict[str, Any]:
+    """Run op over queries on `concurrency` threads; op returns True on success (raising counts as error)."""
+    lat: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def one(q: str) -> None:
+        t0 = time.perf_counter()
+        try:
+            ok = op(q)
+        except Exception:
+            ok = False
+        dt = time.perf_counter() - t0
+        with lock:
+            lat.append(dt)
+            if not ok:
+                errors[0] += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+        list(ex.map(one, queries))
+    return summarize(lat, errors[0], time.perf_counter() - t0)
+
+
+# ---------------- tool adapters ----------------
+def build_ops(tools: List[str], disc: StubDiscovery, mock: StubMockApi, auth: StubAuth) -> Dict[str, Callable]:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    os.environ.update({
+        "DISCOVERY_URL": disc.url, "DISCOVERY_API_KEY": "loadtest", "DISCOVERY_APIKEY": "loadtest",
+        "DISCOVERY_PROJECT_ID": "p-loadtest", "DISCOVERY_VERSION": "2023-03-31",
+        "DISCOVERY_PROJECT_ID_JSON": "p-loadtest", "DISCOVERY_COLLECTION_ID_JSON": "c-loadtest",
+    })
+    ops: Dict[str, Callable[[str], bool]] = {}
+    skipped: Dict[str, str] = {}
+
+    if "wd_query" in tools:
+        from tools import discovery_tool
+        discovery_tool._PROJECT = "p-loadtest"
+        ops["wd_query"] = lambda q: "error" not in discovery_tool.wd_query(q, count=3)
+
+    if "djv3" in tools:
+        sys.path.insert(0, os.path.join(ROOT, "tools", "tools_clean"))
+        try:
+            import djv3  # needs ibm_watsonx_orchestrate
+        except ImportError as e:
+            skipped["djv3"] = str(e)
+        else:
+            cfg, err = djv3._load_cfg()
+            rnd = random.Random(1)
+
+            def _djv3(q: str) -> bool:
+                unit = rnd.choice(UNITS + [""])
+                ans = djv3._query_one(cfg, q, unit, rnd.choice(["", "1", "2"]), 2, 400)["answer"]
+                return "request failed" not in ans and "Configuration error" not in ans
+            ops["djv3"] = _djv3 if not err else (lambda q: False)
+
+    if "faq_askus" in tools:
+        try:
+            from tools import FAQ_AskUs_func as faq  # needs ibm_watsonx_orchestrate
+            ops["faq_askus"] = lambda q: isinstance(faq.FAQ_AskUs_func(q, top_k=5, threshold=0.3), list)
+        except ImportError as e:
+            skipped["faq_askus"] = str(e)
+
+    if "intent_fast" in tools:
+        from tools.intent_fastpath import default_classifier
+        clf = default_classifier()
+        ops["intent_fast"] = lambda q: bool(clf.classify(q)["top_intent"])
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=64)
+    session.mount("http://", adapter)
+
+    if "mockapi_search" in tools:
+        def _search(q: str) -> bool:
+            term = max(q.split(), key=len)
+            r = session.get(f"{mock.base_url}/faqs", params={"search": term, "page": 1, "limit": 10}, timeout=10)
+            return r.status_code == 200
+        ops["mockapi_search"] = _search
+
+    if "mockapi_get" in tools:
+        n = max(1, len(mock.items))
+        ops["mockapi_get"] = lambda q: session.get(f"{mock.base_url}/faqs/{zlib.crc32(q.encode()) % n + 1}",
+                                                   timeout=10).status_code == 200
+
+    if "auth_login" in tools:
+        ops["auth_login"] = lambda q: session.post(f"{auth.url}/auth/login",
+                                                   json={"username": "user", "password": "pass123"},
+                                                   timeout=10).status_code == 200
+
+    if "auth_me" in tools:
+        token = auth.issue("user")
+        ops["auth_me"] = lambda q: session.get(f"{auth.url}/me", headers={"Authorization": f"Bearer {token}"},
+                                               timeout=10).status_code == 200
+
+    if "whoami_local" in tools:
+        from tools.jwt_verify import whoami
+        os.environ["JWT_SECRET"] = auth.secret
+        token = auth.issue("user")
+        ops["whoami_local"] = lambda q: "user" in whoami(token)
+
+    for name, why in skipped.items():
+        print(f"SKIP {name}: {why}", file=sys.stderr)
+    return ops
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=400, help="requests per tool")
+    ap.add_argument("--latency", type=float, default=0.03, help="stub base latency (s)")
+    ap.add_argument("--jitter", type=float, default=0.02, help="extra uniform latency (s)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="injected 503 rate on every stub")
+    ap.add_argument("--login-cost", type=float, default=0.05, help="simulated bcrypt time per login (s)")
+    ap.add_argument("--tools", default=",".join(ALL_TOOLS))
+    ap.add_argument("--no-cache", action="store_true", help="disable the Discovery response cache")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args(argv)
+
+    if args.no_cache:
+        os.environ["DISCOVERY_CACHE_TTL"] = "0"
+    tools = [t.strip() for t in args.tools.split(",") if t.strip()]
+    unknown = set(tools) - set(ALL_TOOLS)
+    if unknown:
+        ap.error(f"unknown tools: {', '.join(sorted(unknown))}")
+
+    stub_kw = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    mix = QueryMix(load_queries(args.seed), seed=args.seed)
+    with open(FAQ_CSV, newline="", encoding="utf-8") as f:
+        faq_items = [{k: r.get(k) for k in ("intent", "question", "answer", "link")} for r in csv.DictReader(f)]
+
+    with StubDiscovery(**stub_kw) as disc, StubMockApi(items=faq_items, **stub_kw) as mock, \
+            StubAuth(login_cost=args.login_cost, **stub_kw) as auth:
+        ops = build_ops(tools, disc, mock, auth)
+        results: Dict[str, Any] = {}
+        for name in tools:
+            if name in ops:
+                results[name] = drive(ops[name], mix.sample(args.requests), args.concurrency)
+                print(f"{name:>15}: {results[name]['throughput_rps']:>8} rps  p95 {results[name]['p95_ms']} ms  "
+                      f"errors {results[name]['error_rate']:.2%}", file=sys.stderr)
+        upstream = {"discovery": disc.requests, "discovery_peak_in_flight": disc.max_in_flight,
+                    "mockapi": mock.requests, "auth": auth.requests}
+
+    cache = None
+    if "wd_query" in ops or "djv3" in ops:
+        from tools.discovery_client import cache_stats
+        cache = cache_stats()
+
+    report = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "git": _git_rev(),
+                 "python": sys.version.split()[0], "concurrency": args.concurrency,
+                 "requests_per_tool": args.requests, "latency_s": args.latency, "jitter_s": args.jitter,
+                 "error_rate": args.error_rate, "login_cost_s": args.login_cost,
+                 "discovery_cache": not args.no_cache, "seed": args.seed, "query_pool": len(mix.pool)},
+        "tools": results,
+        "upstream_requests": upstream,
+        "discovery_cache": cache,
+        "instrumentation": instrumentation.snapshot()["tools"],
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
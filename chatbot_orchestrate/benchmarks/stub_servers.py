@@ -0,0 +1,408 @@
+"""
+Local stand-ins for the external services the tools call, for offline checks and benchmarks.
+
+StubDiscovery mimics POST /v2/projects/{project_id}/query of Watson Discovery V2
+over a small in-memory corpus (the FAQ CSV plus a few KIT700 outline passages).
+StubMockApi serves the MockAPI /faqs resource and StubAuth the auth-service
+(/auth/login issues HS256 JWTs, /me verifies them, same iss/aud as server.js).
+Latency (with an optional slow tail: slow_rate of requests take slow_latency)
+and error injection are configurable; the server also records request count,
+distinct client connections and peak in-flight requests.
+
+    with StubDiscovery(latency=0.05, error_rate=0.1) as d:
+        os.environ["DISCOVERY_URL"] = d.url
+"""
+
+import base64
+import csv
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAQ_CSV = os.path.join(ROOT, "knowledgebase", "utas_faq_agent_QA.csv")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_FILTER_RE = re.compile(r'(\w+):"([^"]*)"')
+
+OUTLINE_DOCS = [
+    {"unit": "KIT700", "semester": "Semester 1", "section": "Assessment Schedule", "subsection": "",
+     "text": "Assessment Task 1: Project Proposal 20%. Assessment Task 2: Prototype 40%. "
+             "Assessment Task 3: Final Report and Presentation 40%."},
+    {"unit": "KIT700", "semester": "Semester 1", "section": "Unit Description", "subsection": "",
+     "text": "KIT700 ICT Professional Practice introduces students to industry-based team projects."},
+    {"unit": "KIT700", "semester": "Semester 2", "section": "Assessment Schedule", "subsection": "",
+     "text": "Assessment Task 1: Team Charter 10%. Assessment Task 2: Sprint Reviews 50%. "
+             "Assessment Task 3: Portfolio 40%."},
+    {"unit": "KIT501", "semester": "Semester 1", "section": "Teaching Arrangements", "subsection": "",
+     "text": "One two-hour lecture and one two-hour tutorial each week."},
+]
+
+
+def _tokens(s: str) -> set:
+    return set(_TOKEN_RE.findall((s or "").lower()))
+
+
+def default_corpus(limit: int = 200) -> List[Dict[str, Any]]:
+    docs: List[Dict[str, Any]] = []
+    for i, d in enumerate(OUTLINE_DOCS):
+        docs.append({"document_id": f"outline-{i}", **d})
+    try:
+        with open(FAQ_CSV, newline="", encoding="utf-8") as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                if i >= limit:
+                    break
+                docs.append({"document_id": row["intent"], "title": row["question"],
+                             "text": f'{row["question"]} {row["answer"]}'})
+    except OSError:
+        pass
+    for d in docs:
+        d["_tokens"] = _tokens(d.get("title", "") + " " + d["text"])
+    return docs
+
+
+class _StubServer:
+    """ThreadingHTTPServer on 127.0.0.1:<ephemeral> run in a daemon thread."""
+
+    handler_cls: type = BaseHTTPRequestHandler
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, fail_first: int = 0, seed: int = 0,
+                 slow_rate: float = 0.0, slow_latency: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_first = fail_first
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = set()
+        self.httpd: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(self.handler_cls):
+            protocol_version = "HTTP/1.1"   # keep-alive，便于观察连接复用
+            server_stub = stub
+
+            def log_message(self, *a):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---- helpers used by handlers ----
+    def enter(self, client_address) -> Optional[int]:
+        """Account for a request, sleep the injected latency; return an error status to inject, if any."""
+        with self.lock:
+            self.requests += 1
+            n = self.requests
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.connections.add(client_address)
+            fail = n <= self.fail_first or (self.error_rate and self.rnd.random() < self.error_rate)
+            delay = self.latency + (self.rnd.uniform(0, self.jitter) if self.jitter else 0.0)
+            if self.slow_rate and self.rnd.random() < self.slow_rate:
+                delay = self.slow_latency
+        if delay:
+            time.sleep(delay)
+        return self.error_status if fail else None
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    server_stub: "_StubServer"
+
+    def _send(self, status: int, obj: Any, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else b""
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+
+    def _guarded(self, fn):
+        stub = self.server_stub
+        try:
+            err = stub.enter(self.client_address)
+            if err:
+                self._send(err, {"error": "injected failure", "code": err})
+                return
+            fn()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True   # 客户端已超时/到截止时间断开
+        finally:
+            stub.leave()
+
+
+class _DiscoveryHandler(_JsonHandler):
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        m = re.fullmatch(r"/v2/projects/([^/]+)/query", parts.path)
+        if not m:
+            self._send(404, {"error": "not found"})
+            return
+        if "version" not in parse_qs(parts.query):
+            self._send(400, {"error": "version is required"})
+            return
+        body = self._body()
+        self._guarded(lambda: self._send(200, self.server_stub.search(body)))
+
+
+class StubDiscovery(_StubServer):
+    handler_cls = _DiscoveryHandler
+
+    def __init__(self, corpus: Optional[List[Dict[str, Any]]] = None, **kw):
+        super().__init__(**kw)
+        self.corpus = corpus if corpus is not None else default_corpus()
+
+    def search(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        q = _tokens(body.get("natural_language_query", ""))
+        filters = dict(_FILTER_RE.findall(body.get("filter") or ""))
+        hits = []
+        for d in self.corpus:
+            if any(str(d.get(k, "")) != v for k, v in filters.items()):
+                continue
+            score = len(q & d["_tokens"])
+            if score or not q:
+                hits.append((score, d))
+        hits.sort(key=lambda x: -x[0])
+        sort = body.get("sort")
+        if sort:   # 只支持单字段升序/降序（"-field"），与导出用的 sort=document_id 对应
+            hits.sort(key=lambda x: str(x[1].get(sort.lstrip("-"), "")), reverse=sort.startswith("-"))
+        offset = int(body.get("offset") or 0)
+        count = int(body.get("count") or 10)
+        chars = int((body.get("passages") or {}).get("characters") or 400)
+        results, passages = [], []
+        for _, d in hits[offset:offset + count]:
+            ptxt = d["text"][:chars]
+            r = {k: v for k, v in d.items() if not k.startswith("_") and k != "title"}
+            r["collection_id"] = "stub-collection"
+            r["extracted_metadata"] = {"title": d.get("title", "")}
+            r["document_passages"] = [{"passage_text": ptxt, "field": "text"}]
+            results.append(r)
+            passages.append({"passage_text": ptxt, "document_id": d["document_id"]})
+        return {"matching_results": len(hits), "results": results, "passages": passages}
+
+
+class _MockApiHandler(_JsonHandler):
+    """mockapi.io-style /faqs resource: GET list (search/intent/page/limit), GET by id, POST, PUT, DELETE."""
+
+    def _resource(self):
+        parts = urlsplit(self.path)
+        m = re.fullmatch(r"/api/v1/faqs(?:/([^/]+))?", parts.path)
+        return m, {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+    def do_GET(self):
+        m, qs = self._resource()
+        if not m:
+            self._send(404, "Not found")
+            return
+        self._guarded(lambda: self._send(*self.server_stub.get(m.group(1), qs)))
+
+    def do_POST(self):
+        m, _ = self._resource()
+        if not m or m.group(1):
+            self._send(404, "Not found")
+            return
+        body = self._body()
+        self._guarded(lambda: self._send(201, self.server_stub.create(body)))
+
+    def do_PUT(self):
+        m, _ = self._resource()
+        if not m or not m.group(1):
+            self._send(404, "Not found")
+            return
+        body = self._body()
+        self._guarded(lambda: self._send(*self.server_stub.update(m.group(1), body)))
+
+    def do_DELETE(self):
+        m, _ = self._resource()
+        if not m or not m.group(1):
+            self._send(404, "Not found")
+            return
+        self._guarded(lambda: self._send(*self.server_stub.delete(m.group(1))))
+
+
+class StubMockApi(_StubServer):
+    """In-memory stand-in for the MockAPI FAQ project (tools/utas-faqs-mockapi-readonly.yaml).
+    url + "/api/v1" is the BASE_URL the seeder and the OpenAPI tool expect."""
+
+    handler_cls = _MockApiHandler
+
+    def __init__(self, items: Optional[List[Dict[str, Any]]] = None, **kw):
+        super().__init__(**kw)
+        self.items: List[Dict[str, Any]] = []
+        self._next_id = 1
+        for it in items or []:
+            self.create(it)
+
+    @property
+    def base_url(self) -> str:
+        return self.url + "/api/v1"
+
+    def create(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        with self.lock:
+            rec = dict(item, id=str(self._next_id), createdAt="2025-09-04T00:00:00.000Z")
+            self._next_id += 1
+            self.items.append(rec)
+        return rec
+
+    def update(self, id_: str, item: Dict[str, Any]):
+        with self.lock:
+            for i, it in enumerate(self.items):
+                if it["id"] == id_:
+                    self.items[i] = dict(it, **item, id=id_)
+                    return 200, self.items[i]
+        return 404, "Not found"
+
+    def delete(self, id_: str):
+        with self.lock:
+            for i, it in enumerate(self.items):
+                if it["id"] == id_:
+                    return 200, self.items.pop(i)
+        return 404, "Not found"
+
+    def get(self, id_: Optional[str], qs: Dict[str, str]):
+        if id_ is not None:
+            for it in self.items:
+                if it["id"] == id_:
+                    return 200, it
+            return 404, "Not found"
+        rows = self.items
+        if qs.get("intent"):
+            rows = [r for r in rows if qs["intent"] in (r.get("intent") or "")]
+        if qs.get("search"):
+            needle = qs["search"].lower()
+            rows = [r for r in rows if any(needle in str(v).lower() for v in r.values())]
+        page, limit = int(qs.get("page") or 1), int(qs.get("limit") or 100)
+        if "page" in qs or "limit" in qs:
+            rows = rows[(page - 1) * limit: page * limit]
+        return 200, rows
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def sign_hs256(payload: Dict[str, Any], secret: str) -> str:
+    head = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+    body = _b64url(json.dumps(payload, separators=(",", ":")).encode())
+    sig = hmac.new(secret.encode(), f"{head}.{body}".encode(), hashlib.sha256).digest()
+    return f"{head}.{body}.{_b64url(sig)}"
+
+
+class _AuthHandler(_JsonHandler):
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._send(200, {"ok": True, "t": int(time.time() * 1000)})
+        elif path == "/me":
+            authz = self.headers.get("Authorization") or ""
+            token = authz[7:] if authz.startswith("Bearer ") else None
+            self._guarded(lambda: self._send(*self.server_stub.me(token)))
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/auth/login":
+            self._send(404, {"error": "not found"})
+            return
+        body = self._body()
+        self._guarded(lambda: self._send(*self.server_stub.login(body)))
+
+
+class StubAuth(_StubServer):
+    """Stand-in for auth-service/server.js: POST /auth/login -> HS256 JWT, GET /me with Bearer token.
+    login_cost (seconds) models the bcrypt compare on top of the injected latency."""
+
+    handler_cls = _AuthHandler
+    ISSUER = "auth-service"
+    AUDIENCE = "utas-coursemate"
+
+    def __init__(self, secret: str = "dev-secret", expires_in: int = 900, login_cost: float = 0.0,
+                 users: Optional[Dict[str, str]] = None, **kw):
+        super().__init__(**kw)
+        self.secret = secret
+        self.expires_in = expires_in
+        self.login_cost = login_cost
+        self.users = users or {"user": "pass123"}
+
+    def issue(self, username: str, now: Optional[float] = None) -> str:
+        now = int(now if now is not None else time.time())
+        return sign_hs256({"sub": f"u{sorted(self.users).index(username) + 1}", "username": username,
+                           "roles": ["student"], "iat": now, "exp": now + self.expires_in,
+                           "aud": self.AUDIENCE, "iss": self.ISSUER}, self.secret)
+
+    def login(self, body: Dict[str, Any]):
+        username, password = body.get("username"), body.get("password")
+        if not username or not password:
+            return 400, {"error": "username/password required"}
+        if self.login_cost:
+            time.sleep(self.login_cost)
+        if self.users.get(username) != password:
+            return 401, {"error": "invalid credentials"}
+        return 200, {"access_token": self.issue(username), "token_type": "Bearer", "expires_in": self.expires_in}
+
+    def me(self, token: Optional[str]):
+        if not token:
+            return 401, {"error": "missing token"}
+        try:
+            head, body, sig = token.split(".")
+            want = hmac.new(self.secret.encode(), f"{head}.{body}".encode(), hashlib.sha256).digest()
+            claims = json.loads(_b64url_decode(body))
+            if not hmac.compare_digest(_b64url_decode(sig), want) or claims.get("exp", 0) <= time.time() \
+                    or claims.get("aud") != self.AUDIENCE or claims.get("iss") != self.ISSUER:
+                raise ValueError("invalid")
+        except ValueError:
+            return 401, {"error": "invalid token"}
+        return 200, {"user": {"id": claims["sub"], "username": claims["username"], "roles": claims["roles"]}}
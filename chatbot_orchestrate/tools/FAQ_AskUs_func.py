@@ -1,11 +1,31 @@
-from ibm_watsonx_orchestrate.agent_builder.tools import tool, ToolPermission
+import os
 
-@tool(
+from ibm_watsonx_orchestrate.agent_builder.tools import ToolPermission
+
+try:
+    from tools.faq_index import default_index, passages_index
+    from tools.instrumentation import instrumented_tool
+    from tools.snippet_pack import pack
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import default_index, passages_index
+    from instrumentation import instrumented_tool
+    from snippet_pack import pack
+
+# 预建产物（python tools/faq_artifact.py 生成）在首次调用时由 default_index() 加载并常驻，
+# 导入本模块不做任何 I/O，冷启动只付 import 的代价
+
+@instrumented_tool(
   name="FAQ_AskUs_func",
   description=(
     "Search AskUs/FAQ Milvus entries and return the most relevant Q&A items for a user query. "
     "Each entry may include {filename, link, course_code, course_name, sections:{Question, Answer}}. "
-    "Inputs: {query: string, top_k: int=5, threshold: float=0.6}. "
+    "Inputs: {query: string, top_k: int=5, threshold: float=0.6, mode: 'lexical'|'semantic'='lexical'}. "
+    "The lexical score is 0.8 * TF-IDF cosine between the query and the FAQ question "
+    "+ 0.2 * the share of query words found in the question or answer, in [0, 1]; "
+    "1.0 is an exact question match, right answers usually score 0.65 or more and unrelated ones 0.6 or less. "
+    "mode='semantic' ranks by char-n-gram embedding cosine (offline vector index); its scores run lower, "
+    "so pass a lower threshold (e.g. 0.3). "
+    "Optional deadline_ms: the time left for this turn in ms; the call never runs past it. "
     "Output: ranked list with fields {question, answer, link, score}. "
     "Use sections.Question for intent matching and sections.Answer for the final answer span."
   ), 
@@ -14,12 +34,14 @@ from ibm_watsonx_orchestrate.agent_builder.tools import tool, ToolPermission
 
 def FAQ_AskUs_func(
     query: str,
-    passages: list,         # 必须是严格结构的列表（见下方示例）
+    passages: list = None,  # 严格结构的列表（见下方示例）；None = 使用内置知识库
     top_k: int = 5,
-    threshold: float = 0.6
+    threshold: float = 0.6,  # 词法分数下限；python benchmarks/bench_faq_index.py 给出各阈值的召回/误放行
+    mode: str = "lexical",  # "lexical" = 倒排索引；"semantic" = 本地向量索引
+    deadline_ms: int = None  # 本轮剩余预算（毫秒），由 instrumented_tool 套上 deadline()；None = TOOL_DEADLINE_MS
 ) -> list:
     """
-    仅基于给定 passages 重排，返回若干 {question, answer, link, score, filename}。
+    基于给定 passages（或内置知识库）的倒排索引排序，返回若干 {question, answer, link, score, filename}。
     期望的 passage 结构示例：
       {
         "filename": "app_answers_detail_a_id_2481_kw_timetable.html",
@@ -31,74 +53,74 @@ def FAQ_AskUs_func(
         }
       }
     """
-    import re
-    from difflib import SequenceMatcher
-
-    def _norm(s: str) -> str:
-        # 统一空白、去特殊空格/零宽字符、转小写
-        s = (s or "")
-        s = s.replace("\u00A0", " ").replace("\u200B", "")
-        s = re.sub(r"\s+", " ", s).strip().lower()
-        return s
-
-    def _dedup_sentences(text: str) -> str:
-        # 句级去重，避免 Answer 里重复段落（保持原顺序）
-        parts = re.split(r"(?<=[.!?;])\s+|\n+", text or "")
-        seen, out = set(), []
-        for p in parts:
-            t = re.sub(r"\s+", " ", p).strip()
-            key = t.lower()
-            if t and key not in seen:
-                seen.add(key)
-                out.append(t)
-        return " ".join(out) if out else (text or "")
-
-    def _score_question_answer(q_norm: str, question: str, answer: str) -> float:
-        # 主要看 Question 的相似度，加一点 Answer 的覆盖率
-        qn = _norm(question)
-        an = _norm(answer)
-        ratio_q = SequenceMatcher(None, q_norm, qn).ratio()
-        q_tokens = set(q_norm.split())
-        cover = len(q_tokens & set((qn + " " + an).split())) / max(1, len(q_tokens))
-        return 0.8 * ratio_q + 0.2 * cover
-
-    if not isinstance(passages, list) or not passages:
+    index = _select_index(passages, mode)
+    if index is None:
         return []
+    return _collapse(index.search(_query(query, passages), top_k=_candidates(top_k), threshold=threshold), top_k)
+
+
+def FAQ_AskUs_batch(
+    queries: list,
+    passages: list = None,
+    top_k: int = 5,
+    threshold: float = 0.6,
+    mode: str = "lexical"
+) -> list:
+    """
+    批量版（评测/回放用，不注册为 tool）：所有查询一次性对语料打分，
+    返回与 queries 同序的列表，每项与 FAQ_AskUs_func 的输出结构相同。
+    """
+    queries = list(queries or [])
+    index = _select_index(passages, mode)
+    if index is None:
+        return [[] for _ in queries]
+    queries = [_query(q, passages) for q in queries]
+    return [_collapse(r, top_k) for r in index.search_batch(queries, top_k=_candidates(top_k), threshold=threshold)]
+
+
+def _query(query: str, passages) -> str:
+    # 拼写纠错 / 拆粘连词的词表取自内置知识库，只对内置知识库的查询做（QUERY_NORMALIZE=0 关闭）
+    if passages is not None:
+        return query
+    try:
+        from tools.query_normalizer import normalize
+    except ImportError:
+        from query_normalizer import normalize
+    return normalize(query)
+
+
+def _candidates(top_k) -> int:
+    # AskUs 导出里同一答案挂在多个问题下；多取一倍候选，折叠近重复答案后仍能凑满 top_k
+    return max(1, int(top_k)) * 2
+
+
+def _collapse(results: list, top_k) -> list:
+    """Near-duplicate answers collapsed (best score kept), then top_k and the SNIPPET_BUDGET_* budget."""
+    return pack(results, key="answer", limit=max(1, int(top_k)))
+
+
+def _select_index(passages, mode: str):
+    if passages is not None and not (isinstance(passages, list) and passages):
+        return None
 
-    q_norm = _norm(query)
-    ranked = []
-
-    for p in passages:
-        # 严格取字段（缺就当空）
-        filename = (p.get("filename") if isinstance(p, dict) else "") or ""
-        link = (p.get("link") if isinstance(p, dict) else "") or ""
-        sections = (p.get("sections") if isinstance(p, dict) else {}) or {}
-        question = (sections.get("Question") or "").strip()
-        raw_answer = (sections.get("Answer") or "").strip()
-
-        # 清理重复句
-        answer = _dedup_sentences(raw_answer)
-
-        sc = _score_question_answer(q_norm, question, answer)
-        ranked.append({
-            "question": question,
-            "answer": answer,
-            "link": link,
-            "filename": filename,
-            "score": round(sc, 4)
-        })
-
-    # 排序、去重（按 link+question），阈值&截断
-    ranked.sort(key=lambda x: x["score"], reverse=True)
-    seen, out = set(), []
-    for r in ranked:
-        key = (r["link"], r["question"].lower())
-        if key in seen:
-            continue
-        seen.add(key)
-        if r["score"] >= float(threshold):
-            out.append(r)
-        if len(out) >= max(1, int(top_k)):
-            break
-
-    return out
+    if (mode or "").lower() == "semantic":
+        # numpy 只在语义模式下才需要
+        try:
+            from tools.faq_vectors import default_vector_index, passages_vector_index
+        except ImportError:
+            from faq_vectors import default_vector_index, passages_vector_index
+        if passages is None:
+            return default_vector_index()
+        return passages_vector_index(passages)
+    if passages is None:
+        # 未传 passages 时使用内置知识库（knowledgebase/utas_faq_agent_QA.csv）的预建索引；
+        # 设置 FAQ_INGEST_WATCH=<秒> 时后台轮询 CSV，变更以增量方式换入索引
+        if os.getenv("FAQ_INGEST_WATCH"):
+            try:
+                from tools.faq_ingest import ensure_watcher
+            except ImportError:
+                from faq_ingest import ensure_watcher
+            ensure_watcher()
+        return default_index()
+    # 运行时传入的 passages 按内容哈希缓存索引
+    return passages_index(passages)
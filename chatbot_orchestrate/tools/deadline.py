@@ -0,0 +1,105 @@
+# tools/deadline.py
+# Request deadlines that travel with the call (contextvar), for every upstream HTTP request below a tool.
+#
+#   with deadline(2.5):                  # 本轮对话剩 2.5 秒；嵌套时只会收紧，不会放宽
+#       djv3.discovery_json_v3_clean(...)
+#   timeout = clamp(30.0)                # HTTP 超时 = min(默认值, 剩余时间)；已到期抛 DeadlineExceeded
+#
+# - 截止时间用 time.monotonic() 的绝对值存放，跨函数/线程传递时不会因为排队而“续命”
+# - asyncio.to_thread 会复制 context，自动继承；ThreadPoolExecutor 不会，提交前用 propagate(fn) 包一层
+# - instrumentation.instrument() 在每次工具调用时套上截止时间：工具的 deadline_ms 参数（路由把本轮剩余预算传下来），
+#   未传则用 TOOL_DEADLINE_MS（未设置 = 不限）；外层更紧的截止时间优先
+# - 不设置任何截止时间时 remaining() 为 None，clamp() 原样返回默认超时，行为与以前相同
+
+import contextvars
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+MIN_TIMEOUT = 0.001   # requests 不接受 0 超时
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request deadline passed (or is too close to start another upstream call)."""
+
+
+def current() -> Optional[float]:
+    """The deadline in time.monotonic() seconds, or None when unbounded."""
+    return _DEADLINE.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline (may be negative), or None when unbounded."""
+    d = _DEADLINE.get()
+    return None if d is None else d - time.monotonic()
+
+
+def expired() -> bool:
+    r = remaining()
+    return r is not None and r <= 0
+
+
+def check(what: str = "request") -> None:
+    """Raise DeadlineExceeded if the deadline has already passed."""
+    if expired():
+        raise DeadlineExceeded(f"deadline exceeded before {what}")
+
+
+def clamp(timeout: Optional[float], what: str = "request") -> Optional[float]:
+    """timeout shortened to the time left; raises DeadlineExceeded when nothing is left."""
+    r = remaining()
+    if r is None:
+        return timeout
+    if r <= 0:
+        raise DeadlineExceeded(f"deadline exceeded before {what}")
+    return max(MIN_TIMEOUT, r if timeout is None else min(timeout, r))
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """Bound everything inside to `seconds` from now (None = keep the outer deadline, if any).
+    An outer deadline that is earlier wins. Yields the effective absolute deadline."""
+    outer = _DEADLINE.get()
+    d = outer
+    if seconds is not None:
+        mine = time.monotonic() + float(seconds)
+        d = mine if outer is None else min(outer, mine)
+    token = _DEADLINE.set(d)
+    try:
+        yield d
+    finally:
+        _DEADLINE.reset(token)
+
+
+def propagate(fn: Callable) -> Callable:
+    """fn bound to the caller's current deadline, for work handed to a ThreadPoolExecutor."""
+    d = _DEADLINE.get()
+    if d is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        token = _DEADLINE.set(d)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _DEADLINE.reset(token)
+    return run
+
+
+def tool_budget(deadline_ms: Optional[float] = None) -> Optional[float]:
+    """Per-tool-call deadline in seconds: the caller's deadline_ms (the turn's remaining budget) when
+    given and > 0, else TOOL_DEADLINE_MS (unset or 0 = unbounded)."""
+    v = float(deadline_ms) if deadline_ms and float(deadline_ms) > 0 \
+        else float(os.getenv("TOOL_DEADLINE_MS", "").strip() or 0)
+    return v / 1000.0 if v > 0 else None
+
+
+if __name__ == "__main__":
+    with deadline(1.0):
+        with deadline(5.0):
+            print(f"remaining={remaining():.3f}s clamp(30)={clamp(30.0):.3f}s")
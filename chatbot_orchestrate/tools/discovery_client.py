@@ -0,0 +1,372 @@
+# tools/discovery_client.py
+# Shared Watson Discovery V2 client used by discovery_tool / djv3 / app.py.
+#
+# - 一个 requests.Session（keep-alive 连接池），按 (url, apikey, version) 复用
+# - 每个 host 的并发上限（线程信号量 + asyncio 信号量）
+# - 超时、对 429/5xx/连接错误做带抖动的指数退避重试
+# - asyncio 接口：aquery / aquery_many（在线程池里跑阻塞请求，不引入 httpx/aiohttp 依赖）
+# - query(..., cached=True) 走 tools/query_cache（TTL+LRU，可选 SQLite 层，single-flight）
+# - 每次 HTTP 请求的耗时/字节经 tools/instrumentation.record_upstream 计入当前工具调用
+# - requests / asyncio 在首次用到时才导入（冷启动只付 import 本模块的代价）
+# - 截止时间（tools/deadline.py）：每次请求的超时、排队等连接槽、重试退避都以剩余时间为上限；
+#   cached=True 的查询在剩余时间不够一次典型请求（观测到的 p50）时只查缓存，未命中抛 DeadlineExceeded
+# - 对冲请求（hedge=True 或 DISCOVERY_HEDGE=1，默认关）：首个请求超过观测到的 p95 仍未返回时
+#   再发一个相同的请求，取先成功的那个；慢的那个不能取消，跑完后只用来更新延迟统计
+
+import contextvars
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+try:
+    from tools.deadline import DeadlineExceeded, clamp, expired, remaining
+    from tools.instrumentation import record_cache, record_upstream
+    from tools.query_cache import QueryCache, make_key
+except ImportError:  # 以 tools/ 为包根导入时
+    from deadline import DeadlineExceeded, clamp, expired, remaining
+    from instrumentation import record_cache, record_upstream
+    from query_cache import QueryCache, make_key
+
+if TYPE_CHECKING:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+DEFAULT_VERSION = "2023-03-31"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+LATENCY_WINDOW = 256      # 最近多少次成功请求的耗时用于估计 p50 / p95
+HEDGE_MIN_SAMPLES = 20    # 样本不够时不对冲（p95 还不可信）
+
+
+class DiscoveryError(Exception):
+    """Discovery returned a non-retryable error, or retries were exhausted."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class DiscoveryClient:
+    def __init__(self, url: str, apikey: str, version: str = DEFAULT_VERSION, *,
+                 timeout: float = 30.0, max_per_host: int = 8, retries: int = 3,
+                 backoff: float = 0.25, max_backoff: float = 4.0, hedge: Optional[bool] = None,
+                 hedge_min_delay: float = 0.02, deadline_reserve: float = 0.05):
+        self.url = (url or "").rstrip("/")
+        self.version = version or DEFAULT_VERSION
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_per_host = max(1, int(max_per_host))
+        self.host = urlsplit(self.url).netloc
+        self.hedge = os.getenv("DISCOVERY_HEDGE", "0") not in ("", "0") if hedge is None else bool(hedge)
+        self.hedge_min_delay = hedge_min_delay
+        self.deadline_reserve = deadline_reserve
+        self._latencies: "deque[float]" = deque(maxlen=LATENCY_WINDOW)
+        self._stats_lock = threading.Lock()
+        self._hedge_pool: Optional["ThreadPoolExecutor"] = None
+        self.counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "degraded": 0}
+
+        import requests
+        from requests.auth import HTTPBasicAuth
+        try:
+            from tools.http_cassette import http_adapter
+        except ImportError:
+            from http_cassette import http_adapter
+
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth("apikey", apikey)
+        self.session.headers.update({"Content-Type": "application/json"})
+        # HTTP_CASSETTE_MODE=record/replay 时换成录制/回放的 adapter（tools/http_cassette.py）
+        adapter = http_adapter("discovery", pool_connections=1, pool_maxsize=self.max_per_host)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._sem = _host_semaphore(self.host, self.max_per_host)
+        # 按事件循环对象（弱引用）存放：循环被回收后条目自动消失，也不会因 id 复用拿到旧循环的信号量
+        self._async_sems: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self._async_sems_lock = threading.Lock()
+
+    # ---------- sync ----------
+    def query(self, project_id: str, body: Dict[str, Any], timeout: Optional[float] = None,
+              cached: bool = False) -> Dict[str, Any]:
+        """POST /v2/projects/{project_id}/query and return the JSON result.
+        cached=True serves repeats from the shared response cache (see response_cache()); when the
+        request deadline is too close for an upstream call it only consults the cache and raises
+        DeadlineExceeded on a miss."""
+        url = f"{self.url}/v2/projects/{project_id}/query"
+        if not cached:
+            return self._post(url, body, timeout or self.timeout)
+        key = self._cache_key(project_id, body)
+        if self.too_close():
+            ok, value = response_cache().get(key)
+            record_cache(ok)
+            if ok:
+                return value
+            self._count("degraded")
+            raise DeadlineExceeded("deadline too close for a Discovery request and the query is not cached")
+        return response_cache().get_or_compute(key, lambda: self._post(url, body, timeout or self.timeout))
+
+    def _cache_key(self, project_id: str, body: Dict[str, Any]) -> str:
+        rest = {k: v for k, v in body.items()
+                if k not in ("natural_language_query", "collection_ids", "filter", "count")}
+        return make_key(body.get("natural_language_query", ""), body.get("collection_ids"),
+                        body.get("filter", ""), body.get("count"),
+                        url=self.url, project=project_id, body=rest)
+
+    def _post(self, url: str, body: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        import requests   # 构造函数里已导入，这里只是取 sys.modules 中的模块
+
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                r = self._send_hedged(url, body, timeout) if self.hedge else self._send(url, body, timeout)
+                if r.status_code < 400:
+                    return r.json()
+                if r.status_code not in RETRY_STATUS:
+                    raise DiscoveryError(f"{r.status_code} {r.text[:300]}", r.status_code)
+                err: Exception = DiscoveryError(f"{r.status_code} {r.text[:300]}", r.status_code)
+                retry_after = _retry_after(r)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = e
+            if attempt >= self.retries:
+                if isinstance(err, DiscoveryError):
+                    raise err
+                if expired():   # 超时是截止时间造成的
+                    raise DeadlineExceeded(f"deadline reached after {attempt + 1} attempts: {err}") from err
+                raise DiscoveryError(f"request failed after {attempt + 1} attempts: {err}") from err
+            delay = self._delay(attempt, retry_after)
+            left = remaining()
+            if left is not None and delay >= left:
+                raise DeadlineExceeded(f"deadline reached after {attempt + 1} attempts: {err}") from err
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, url: str, body: Dict[str, Any], timeout: float) -> "requests.Response":
+        """One HTTP attempt; waiting for a connection slot and the request itself are bounded by the deadline."""
+        if not self._sem.acquire(timeout=clamp(None, "Discovery request")):   # 无截止时间 = 一直等
+            raise DeadlineExceeded("deadline reached waiting for a connection slot")
+        try:
+            t = clamp(timeout, "Discovery request")
+            t0 = time.perf_counter()
+            r = self.session.post(url, params={"version": self.version}, json=body, timeout=t)
+        finally:
+            self._sem.release()
+        dt = time.perf_counter() - t0
+        record_upstream(dt, len(r.request.body or b""), len(r.content))
+        with self._stats_lock:
+            self.counters["requests"] += 1
+            if r.status_code < 400:
+                self._latencies.append(dt)
+        return r
+
+    def _send_hedged(self, url: str, body: Dict[str, Any], timeout: float) -> "requests.Response":
+        """_send(), plus an identical second request once the first outlives the observed p95;
+        the first good response wins (a retryable status or error from one waits for the other)."""
+        delay = self.hedge_delay()
+        left = remaining()
+        if delay is None or (left is not None and delay >= left):
+            return self._send(url, body, timeout)
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        # 每个子任务各自复制 context：上游耗时计入当前工具调用，截止时间照样生效
+        first = self._pool().submit(contextvars.copy_context().run, self._send, url, body, timeout)
+        if not wait([first], timeout=delay).done:
+            second = self._pool().submit(contextvars.copy_context().run, self._send, url, body, timeout)
+            self._count("hedged")
+            pending = {first, second}
+        else:
+            pending = {first}
+        last_exc: Optional[BaseException] = None
+        last_resp = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is not None:
+                    last_exc = f.exception()
+                    continue
+                r = f.result()
+                if r.status_code not in RETRY_STATUS:
+                    if f is not first:
+                        self._count("hedge_wins")
+                    return r
+                last_resp = r
+        if last_resp is not None:
+            return last_resp
+        raise last_exc
+
+    def _pool(self) -> "ThreadPoolExecutor":
+        if self._hedge_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with self._stats_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=2 * self.max_per_host,
+                                                          thread_name_prefix="discovery-hedge")
+        return self._hedge_pool
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.counters[name] += 1
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        """q-quantile of recent successful request latencies (seconds); None before any."""
+        with self._stats_lock:
+            lat = sorted(self._latencies)
+        return lat[min(len(lat) - 1, int(q * len(lat)))] if lat else None
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long the first request may run before it is hedged: the observed p95
+        (at least hedge_min_delay); None until HEDGE_MIN_SAMPLES requests have succeeded."""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.hedge_min_delay, self.latency_quantile(0.95))
+
+    def too_close(self) -> bool:
+        """True when the time left before the deadline is below a typical request (observed p50)."""
+        left = remaining()
+        if left is None:
+            return False
+        return left < max(self.deadline_reserve, self.latency_quantile(0.5) or 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Request / hedging / degrade counters and the latency estimates behind them."""
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self.counters)
+        p50, p95 = self.latency_quantile(0.5), self.latency_quantile(0.95)
+        out.update(p50_ms=round(p50 * 1000, 2) if p50 is not None else None,
+                   p95_ms=round(p95 * 1000, 2) if p95 is not None else None, hedge=self.hedge)
+        return out
+
+    def _delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        # full jitter: U(0, min(cap, base * 2^n))；服务端给了 Retry-After 就以它为下限
+        d = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        return max(d, retry_after or 0.0)
+
+    # ---------- async ----------
+    async def aquery(self, project_id: str, body: Dict[str, Any], timeout: Optional[float] = None,
+                     cached: bool = False) -> Dict[str, Any]:
+        import asyncio
+
+        async with self._async_sem():
+            return await asyncio.to_thread(self.query, project_id, body, timeout, cached)
+
+    async def aquery_many(self, project_id: str, bodies: List[Dict[str, Any]],
+                          timeout: Optional[float] = None, return_exceptions: bool = True,
+                          cached: bool = False) -> List[Any]:
+        """Concurrent queries (bounded by max_per_host); results keep input order."""
+        import asyncio
+
+        return await asyncio.gather(*(self.aquery(project_id, b, timeout, cached) for b in bodies),
+                                    return_exceptions=return_exceptions)
+
+    def _async_sem(self) -> "asyncio.Semaphore":
+        import asyncio
+
+        # asyncio.Semaphore 绑定事件循环，按 loop 分别创建
+        loop = asyncio.get_running_loop()
+        sem = self._async_sems.get(loop)
+        if sem is None:
+            with self._async_sems_lock:
+                # 等待过的信号量强引用着自己的 loop（sem._loop），弱键永远不会失效；已关闭的循环在这里清掉
+                for old in [lp for lp in self._async_sems.keys() if lp.is_closed()]:
+                    del self._async_sems[old]
+                sem = self._async_sems.setdefault(loop, asyncio.Semaphore(self.max_per_host))
+        return sem
+
+    def close(self) -> None:
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+
+def _retry_after(r: "requests.Response") -> Optional[float]:
+    try:
+        return min(float(r.headers.get("Retry-After", "")), 30.0)
+    except ValueError:
+        return None
+
+
+_CACHE: Optional[QueryCache] = None
+_HOST_SEMS: Dict[str, threading.BoundedSemaphore] = {}
+_CLIENTS: Dict[tuple, DiscoveryClient] = {}
+_LOCK = threading.Lock()
+
+
+def _host_semaphore(host: str, limit: int) -> threading.BoundedSemaphore:
+    with _LOCK:
+        sem = _HOST_SEMS.get(host)
+        if sem is None:
+            sem = _HOST_SEMS[host] = threading.BoundedSemaphore(limit)
+        return sem
+
+
+def response_cache() -> QueryCache:
+    """Process-wide Discovery response cache, configured from the environment on first use:
+    DISCOVERY_CACHE_SIZE (items, default 1024), DISCOVERY_CACHE_TTL (seconds, default 300),
+    DISCOVERY_CACHE_DB (SQLite path for the restart-surviving tier; unset = memory only)."""
+    global _CACHE
+    if _CACHE is None:
+        with _LOCK:
+            if _CACHE is None:
+                _CACHE = QueryCache(max_items=int(os.getenv("DISCOVERY_CACHE_SIZE", "1024")),
+                                    ttl=float(os.getenv("DISCOVERY_CACHE_TTL", "300")),
+                                    db_path=os.getenv("DISCOVERY_CACHE_DB") or None)
+    return _CACHE
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters of the shared response cache (for sizing it)."""
+    return response_cache().stats()
+
+
+def get_client(url: str, apikey: str, version: str = DEFAULT_VERSION, **kwargs) -> DiscoveryClient:
+    """Process-wide client per (url, apikey, version) so every tool shares one connection pool."""
+    key = ((url or "").rstrip("/"), apikey, version or DEFAULT_VERSION)
+    with _LOCK:
+        c = _CLIENTS.get(key)
+    if c is None:
+        c = DiscoveryClient(url, apikey, version, **kwargs)
+        with _LOCK:
+            c = _CLIENTS.setdefault(key, c)
+    return c
+
+
+def client_from_env() -> DiscoveryClient:
+    """Client from DISCOVERY_URL + DISCOVERY_API_KEY (or DISCOVERY_APIKEY) [+ DISCOVERY_VERSION]."""
+    url = os.getenv("DISCOVERY_URL")
+    api = os.getenv("DISCOVERY_API_KEY") or os.getenv("DISCOVERY_APIKEY")
+    if not (url and api):
+        raise ValueError("Missing DISCOVERY_API_KEY / DISCOVERY_URL")
+    return get_client(url, api, os.getenv("DISCOVERY_VERSION") or DEFAULT_VERSION)
+
+
+def compact_result(res: Dict[str, Any]) -> Dict[str, Any]:
+    """{snippets, total}: top-level passages first, else per-result passage/text/title.
+    Near-duplicate snippets are collapsed (first in rank order kept) and the rest packed into
+    the SNIPPET_BUDGET_* budget, see tools/snippet_pack.py; total is Discovery's match count."""
+    try:
+        from tools.snippet_pack import pack
+    except ImportError:
+        from snippet_pack import pack
+    snippets: List[Dict[str, Any]] = []
+    for p in res.get("passages", []):
+        t = p.get("passage_text")
+        if t:
+            snippets.append({"text": t, "document_id": p.get("document_id")})
+    if not snippets:
+        for r in res.get("results", []):
+            t = (r.get("document_passages") or [{}])[0].get("passage_text") \
+                or r.get("text") \
+                or r.get("extracted_metadata", {}).get("title", "")
+            if t:
+                snippets.append({"text": t, "collection_id": r.get("collection_id")})
+    return {"snippets": pack(snippets, key="text"), "total": res.get("matching_results", 0)}
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Stream every document of a Discovery project/collection to JSONL, page by page.
+
+wd_query / run_wd_query only return the top `count` hits; this pages through the
+whole result set of a (filtered) query with offset pagination, sorted by
+document_id so pages stay stable while paging. While one page is being written,
+the next one is already being fetched on a background thread (one page ahead, so
+memory stays at two pages whatever the collection size).
+
+Each output line is one Discovery result: document_id, the unit / semester /
+section / subsection fields, text and document_passages — the export format
+tools/outline_index.py reads (--outline-index builds that index right away).
+
+After every page the output is flushed and a checkpoint is written next to it
+(<out>.checkpoint: query fingerprint, filter number, offset, bytes written). A
+run that fails part-way resumes from there with --resume. The output is first
+truncated to the checkpointed size, so a half-written page is not duplicated.
+
+Discovery caps offset + count (MAX_WINDOW). A larger export should be split
+with several --filter values (e.g. one per unit or collection); they are
+exported one after another into the same file.
+
+Usage (from chatbot_orchestrate/):
+    python tools/discovery_export.py --out export.jsonl [--filter 'unit:"KIT700"' ...]
+                                     [--collection ID] [--page-size 100] [--resume]
+                                     [--outline-index knowledgebase/outline_index.jsonl.gz]
+Connection settings come from DISCOVERY_URL / DISCOVERY_API_KEY / DISCOVERY_VERSION and
+DISCOVERY_PROJECT_ID (or DISCOVERY_PROJECT_ID_JSON).
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    from tools.discovery_client import DiscoveryClient, client_from_env
+except ImportError:  # 以 tools/ 为包根导入时
+    from discovery_client import DiscoveryClient, client_from_env
+
+PAGE_SIZE = 100
+MAX_WINDOW = 10000          # Discovery V2: offset + count 不能超过这个值
+PASSAGES_PER_DOC = 3
+PASSAGE_CHARS = 400
+RETURN_FIELDS = ["document_id", "unit", "semester", "section", "subsection", "text", "extracted_metadata"]
+
+
+def export_body(collection_ids: Optional[List[str]] = None, filter_: str = "",
+                page_size: int = PAGE_SIZE) -> Dict[str, Any]:
+    """Query body shared by every page (offset is added per page)."""
+    body: Dict[str, Any] = {
+        "count": int(page_size),
+        "sort": "document_id",
+        "return": RETURN_FIELDS,
+        "passages": {"enabled": True, "per_document": True, "max_per_document": PASSAGES_PER_DOC,
+                     "characters": PASSAGE_CHARS},
+        "spelling_suggestions": False,
+        "table_results": {"enabled": False, "count": 0},
+    }
+    if collection_ids:
+        body["collection_ids"] = list(collection_ids)
+    if filter_:
+        body["filter"] = filter_
+    return body
+
+
+def iter_pages(client: DiscoveryClient, project_id: str, body: Dict[str, Any], offset: int = 0,
+               prefetch: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Yield {"offset", "results", "matching_results"} pages from offset on. With prefetch the
+    request for the next page is in flight while the caller handles the current one.
+    Stops at the last page, at an empty page, or at the MAX_WINDOW offset limit.
+    """
+    count = int(body.get("count") or PAGE_SIZE)
+
+    def fetch(off: int) -> Dict[str, Any]:
+        n = min(count, MAX_WINDOW - off)
+        res = client.query(project_id, dict(body, offset=off, count=n))
+        return {"offset": off, "results": res.get("results") or [],
+                "matching_results": int(res.get("matching_results") or 0)}
+
+    def more(page: Dict[str, Any]) -> bool:
+        end = page["offset"] + len(page["results"])
+        return bool(page["results"]) and end < min(page["matching_results"], MAX_WINDOW)
+
+    if offset >= MAX_WINDOW:
+        return
+    if not prefetch:
+        while True:
+            page = fetch(offset)
+            if page["results"]:
+                yield page
+            if not more(page):
+                return
+            offset += len(page["results"])
+
+    from concurrent.futures import ThreadPoolExecutor   # 只有预取用到，不在导入时加载
+
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        fut = ex.submit(fetch, offset)
+        while fut is not None:
+            page = fut.result()
+            # 先发出下一页请求，再把当前页交给调用方处理
+            fut = ex.submit(fetch, page["offset"] + len(page["results"])) if more(page) else None
+            if page["results"]:
+                try:
+                    yield page
+                except GeneratorExit:
+                    if fut is not None:
+                        fut.cancel()
+                    raise
+
+
+def iter_documents(client: DiscoveryClient, project_id: str, body: Dict[str, Any], offset: int = 0,
+                   prefetch: bool = True) -> Iterator[Dict[str, Any]]:
+    """One Discovery result at a time, across all pages."""
+    for page in iter_pages(client, project_id, body, offset, prefetch):
+        yield from page["results"]
+
+
+class Checkpoint:
+    """<out>.checkpoint: where the export stopped, written atomically after each page."""
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.state = {"fingerprint": fingerprint, "filter_index": 0, "offset": 0, "bytes": 0, "written": 0,
+                      "done": False}
+
+    def load(self) -> bool:
+        """Pick up a previous run of the same export; False if there is none (or it was for another query)."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("fingerprint") != self.fingerprint:
+            return False
+        self.state.update(state)
+        return True
+
+    def save(self, **kw) -> None:
+        self.state.update(kw)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+
+def export(client: DiscoveryClient, project_id: str, out_path: str,
+           filters: Optional[List[str]] = None, collection_ids: Optional[List[str]] = None,
+           page_size: int = PAGE_SIZE, resume: bool = False, prefetch: bool = True,
+           progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Write every document matching each filter (or the whole project) to out_path as JSONL.
+    resume=True continues from <out_path>.checkpoint when it belongs to the same export;
+    otherwise out_path is overwritten. progress(state) is called after each checkpointed page.
+    Returns {"written", "pages", "seconds", "truncated": [filters that hit MAX_WINDOW], "resumed"}.
+    """
+    filters = list(filters or [""])
+    fingerprint = hashlib.sha1(json.dumps([project_id, collection_ids, filters, page_size],
+                                          sort_keys=True).encode("utf-8")).hexdigest()
+    ckpt = Checkpoint(out_path + ".checkpoint", fingerprint)
+    resumed = resume and ckpt.load()
+    if resumed and ckpt.state["done"]:
+        return {"written": ckpt.state["written"], "pages": 0, "seconds": 0.0, "truncated": [], "resumed": True}
+    if not resumed:
+        ckpt.save()
+    t0 = time.perf_counter()
+    pages, truncated = 0, []
+    with open(out_path, "ab" if resumed else "wb") as f:
+        f.truncate(ckpt.state["bytes"])      # 丢掉上次最后一个检查点之后写了一半的页
+        f.seek(ckpt.state["bytes"])
+        for fi in range(ckpt.state["filter_index"], len(filters)):
+            offset = ckpt.state["offset"] if fi == ckpt.state["filter_index"] else 0
+            body = export_body(collection_ids, filters[fi], page_size)
+            for page in iter_pages(client, project_id, body, offset, prefetch):
+                for res in page["results"]:
+                    f.write(json.dumps(res, ensure_ascii=False).encode("utf-8") + b"\n")
+                f.flush()
+                pages += 1
+                ckpt.save(filter_index=fi, offset=page["offset"] + len(page["results"]), bytes=f.tell(),
+                          written=ckpt.state["written"] + len(page["results"]))
+                if page["matching_results"] > MAX_WINDOW and filters[fi] not in truncated:
+                    truncated.append(filters[fi])
+                if progress:
+                    progress(dict(ckpt.state, matching_results=page["matching_results"]))
+            ckpt.save(filter_index=fi + 1, offset=0)
+        os.fsync(f.fileno())
+    ckpt.save(done=True)
+    return {"written": ckpt.state["written"], "pages": pages, "seconds": round(time.perf_counter() - t0, 3),
+            "truncated": truncated, "resumed": resumed}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", required=True, help="JSONL output (one Discovery result per line)")
+    ap.add_argument("--project", default=os.getenv("DISCOVERY_PROJECT_ID") or os.getenv("DISCOVERY_PROJECT_ID_JSON"))
+    ap.add_argument("--collection", action="append", help="collection id (repeatable; default: whole project)")
+    ap.add_argument("--filter", action="append", help="Discovery filter per partition (repeatable)")
+    ap.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    ap.add_argument("--resume", action="store_true", help="continue from <out>.checkpoint")
+    ap.add_argument("--no-prefetch", action="store_true")
+    ap.add_argument("--outline-index", default="", help="also build tools/outline_index from the export")
+    args = ap.parse_args()
+    if not args.project:
+        raise SystemExit("Missing --project / DISCOVERY_PROJECT_ID")
+
+    report = export(client_from_env(), args.project, args.out, args.filter, args.collection, args.page_size,
+                    args.resume, not args.no_prefetch,
+                    progress=lambda s: print(f"\r{s['written']}/{s['matching_results']} documents", end="", flush=True))
+    print()
+    if report["truncated"]:
+        print(f"warning: more than {MAX_WINDOW} matches for {report['truncated']}; split them with --filter")
+    if args.outline_index:
+        try:
+            from tools.outline_index import OutlineIndex
+        except ImportError:
+            from outline_index import OutlineIndex
+        idx = OutlineIndex.from_export(args.out)
+        report["outline_index"] = {"passages": idx.write(args.outline_index), "units": len(idx.shards)}
+    print(json.dumps(report, indent=2))
@@ -1,54 +1,60 @@
 # tools/discovery_tool.py
 import os
 from typing import List, Optional, Dict, Any
-from ibm_watson import DiscoveryV2
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 
-# —— 不在导入时抛错；延迟初始化 —— #
-_CLIENT = None
+try:
+    from tools.deadline import deadline, propagate, tool_budget
+    from tools.discovery_client import DiscoveryClient, client_from_env, compact_result
+except ImportError:  # 以 tools/ 为包根导入时
+    from deadline import deadline, propagate, tool_budget
+    from discovery_client import DiscoveryClient, client_from_env, compact_result
+
+# —— 不在导入时抛错；延迟初始化（共享 tools/discovery_client 的连接池）—— #
 _PROJECT = os.getenv("DISCOVERY_PROJECT_ID")
 
-def _get_client() -> DiscoveryV2:
-    global _CLIENT
-    if _CLIENT is None:
-        api = os.getenv("DISCOVERY_API_KEY")
-        url = os.getenv("DISCOVERY_URL")  # 只用 https://api.<region>.discovery.watson.cloud.ibm.com
-        if not (api and url and _PROJECT):
-            # 在被调用时再报错，避免导入阶段失败
-            raise ValueError("Missing DISCOVERY_API_KEY / DISCOVERY_URL / DISCOVERY_PROJECT_ID")
-        c = DiscoveryV2(version="2023-03-31", authenticator=IAMAuthenticator(api))
-        c.set_service_url(url)
-        _CLIENT = c
-    return _CLIENT
-
-def wd_query(query: str, count: int = 5, collections: Optional[List[str]] = None) -> Dict[str, Any]:
-    """Query IBM Watson Discovery and return plain JSON."""
+def _get_client() -> DiscoveryClient:
+    # 只用 https://api.<region>.discovery.watson.cloud.ibm.com
+    if not _PROJECT:
+        # 在被调用时再报错，避免导入阶段失败
+        raise ValueError("Missing DISCOVERY_API_KEY / DISCOVERY_URL / DISCOVERY_PROJECT_ID")
+    return client_from_env()
+
+def wd_query(query: str, count: int = 5, collections: Optional[List[str]] = None,
+             deadline_ms: Optional[int] = None) -> Dict[str, Any]:
+    """Query IBM Watson Discovery and return plain JSON.
+    Bounded by deadline_ms (the turn's remaining budget; default TOOL_DEADLINE_MS) and any outer
+    deadline (tools/deadline.py): close to it only cached answers are returned, otherwise
+    DeadlineExceeded is raised."""
     cli = _get_client()
-    kwargs = {
-        "project_id": _PROJECT,
+    body: Dict[str, Any] = {
         "natural_language_query": query,
         "count": count,
         "passages": {"enabled": True, "count": count},
     }
     if collections:
-        kwargs["collection_ids"] = collections
-
-    res = cli.query(**kwargs).get_result()
-
-    snippets: List[Dict[str, Any]] = []
-    for p in res.get("passages", []):
-        t = p.get("passage_text")
-        if t:
-            snippets.append({"text": t, "document_id": p.get("document_id")})
-    if not snippets:
-        for r in res.get("results", []):
-            t = (r.get("document_passages") or [{}])[0].get("passage_text") \
-                or r.get("text") \
-                or r.get("extracted_metadata", {}).get("title", "")
-            if t:
-                snippets.append({"text": t, "collection_id": r.get("collection_id")})
-
-    return {"snippets": snippets, "total": res.get("matching_results", 0)}
+        body["collection_ids"] = collections
+
+    with deadline(tool_budget(deadline_ms)):
+        return compact_result(cli.query(_PROJECT, body, cached=True))
+
+def wd_query_batch(queries: List[str], count: int = 5, collections: Optional[List[str]] = None,
+                   max_workers: int = 8) -> List[Dict[str, Any]]:
+    """wd_query for many queries, at most max_workers in flight; results keep input order.
+    A failed query yields {"snippets": [], "total": 0, "error": "..."} instead of aborting the batch."""
+    def _one(q: str) -> Dict[str, Any]:
+        try:
+            return wd_query(q, count=count, collections=collections)
+        except Exception as e:
+            return {"snippets": [], "total": 0, "error": str(e)}
+
+    queries = list(queries or [])
+    if not queries:
+        return []
+    _get_client()  # 在线程外初始化客户端，避免并发重复创建
+    from concurrent.futures import ThreadPoolExecutor   # 只有批量接口用到，不在导入时加载
+
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(queries)))) as ex:
+        return list(ex.map(propagate(_one), queries))   # 工作线程沿用调用方的截止时间
 
 # 可选：本地调试入口，不影响作为 tool 导入
 if __name__ == "__main__":
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Self-hosted, read-only implementation of tools/utas-faqs-mockapi-readonly.yaml.
+
+Serves GET /api/v1/faqs (searchFaqs) and GET /api/v1/faqs/{id} (getFaqById)
+from knowledgebase/utas_faq_agent_QA.csv, as a drop-in for the mockapi.io
+BASE_URL (the un-prefixed /faqs paths work too).
+
+  search  : in-memory inverted index; every query word must match the start of
+            a word in question/answer/intent/topic/course fields (mockapi does a
+            plain substring scan of every row)
+  intent  : exact match through a hash index; {id} likewise
+  paging  : page/limit as in the spec, or cursor-style: each page carries
+            X-Next-Cursor and a Link rel="next" header; pass ?cursor=... back
+  caching : strong ETag + Cache-Control on every 200, If-None-Match -> 304;
+            serialised responses are memoised (the data is read-only)
+
+Serving is a small asyncio HTTP/1.1 server with keep-alive, no third-party deps.
+
+Usage (from chatbot_orchestrate/):
+    python tools/faq_api.py [--host 127.0.0.1] [--port 8080] [--csv PATH] [--max-age 300] [--watch 2]
+"""
+
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import os
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+try:
+    from tools.faq_index import DEFAULT_CSV, file_sha1, link_from_intent, norm, tokenize
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import DEFAULT_CSV, file_sha1, link_from_intent, norm, tokenize
+
+FIELDS = ("intent", "question", "answer", "filename", "link", "topic", "course_code", "course_name")
+SEARCH_FIELDS = ("question", "answer", "intent", "topic", "course_code", "course_name")
+API_PREFIX = "/api/v1"
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+RESPONSE_CACHE_SIZE = 4096
+
+
+def _clean(x: Optional[str]) -> Optional[str]:
+    s = (x or "").strip()
+    return s or None
+
+
+def load_items(csv_path: str = DEFAULT_CSV) -> List[Dict[str, Any]]:
+    """CSV rows as FAQItem dicts; ids are 1-based row numbers, as seeding MockAPI in CSV order yields."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [item_from_row(row, str(i + 1)) for i, row in enumerate(csv.DictReader(f))]
+
+
+def item_from_row(row: Dict[str, Any], id_: str) -> Dict[str, Any]:
+    """One FAQItem from a CSV row (or an ingest record, which has the same field names)."""
+    item = {k: _clean(row.get(k)) for k in FIELDS}
+    intent = item["intent"] or ""
+    if not item["link"] and intent:
+        item["link"] = link_from_intent(intent)
+    if not item["topic"] and "_kw_" in intent:
+        item["topic"] = intent.split("_kw_", 1)[1]
+    return {"id": id_, **item, "createdAt": None}
+
+
+class FaqCatalog:
+    """Read-only FAQ rows with an id/intent hash index and a word-prefix inverted index."""
+
+    def __init__(self, items: List[Dict[str, Any]], version: str = "",
+                 words: Optional[List[Optional[frozenset]]] = None):
+        self.items = items
+        self.version = version or hashlib.sha1(json.dumps(items, sort_keys=True).encode()).hexdigest()[:12]
+        self.by_id: Dict[str, int] = {}
+        self.by_intent: Dict[str, List[int]] = {}
+        self.words: List[frozenset] = []       # 每行的检索词集合，apply_delta 对未变的行直接复用
+        postings: Dict[str, List[int]] = {}
+        for pos, it in enumerate(items):
+            self.by_id[str(it.get("id"))] = pos
+            if it.get("intent"):
+                self.by_intent.setdefault(it["intent"], []).append(pos)
+            w = words[pos] if words is not None and words[pos] is not None else None
+            if w is None:
+                w = frozenset(t for k in SEARCH_FIELDS for t in tokenize(it.get(k) or ""))
+            self.words.append(w)
+            for t in w:
+                postings.setdefault(t, []).append(pos)     # pos 递增 => 倒排表天然有序
+        self.vocab = sorted(postings)
+        self.postings = postings
+        self._prefix = lru_cache(maxsize=4096)(self._prefix_positions)
+        self._matches = lru_cache(maxsize=1024)(self._match_positions)
+
+    @classmethod
+    def from_csv(cls, csv_path: str = DEFAULT_CSV) -> "FaqCatalog":
+        return cls(load_items(csv_path), file_sha1(csv_path)[:12])
+
+    def apply_delta(self, upserts: List[Dict[str, Any]], deletes: List[str], version: str) -> "FaqCatalog":
+        """
+        New catalog with an ingest delta applied (tools/faq_ingest.py); self is left untouched.
+        Updated intents keep their id, deleted ones disappear, new ones get the next free id,
+        and only the changed rows are re-tokenised.
+        """
+        changed = {r["intent"]: r for r in upserts}
+        gone = set(deletes)
+        items: List[Dict[str, Any]] = []
+        words: List[Optional[frozenset]] = []
+        for it, w in zip(self.items, self.words):
+            intent = it.get("intent")
+            if intent in gone:
+                continue
+            if intent in changed:
+                it, w = item_from_row(changed.pop(intent), it["id"]), None
+            items.append(it)
+            words.append(w)
+        next_id = max((int(i) for i in self.by_id if i.isdigit()), default=0) + 1
+        for rec in changed.values():
+            items.append(item_from_row(rec, str(next_id)))
+            words.append(None)
+            next_id += 1
+        return FaqCatalog(items, version, words)
+
+    def get(self, id_: str) -> Optional[Dict[str, Any]]:
+        pos = self.by_id.get(id_)
+        return None if pos is None else self.items[pos]
+
+    def _prefix_positions(self, prefix: str) -> Tuple[int, ...]:
+        """Sorted positions of rows containing a word that starts with prefix."""
+        i = bisect_left(self.vocab, prefix)
+        hit = set()
+        while i < len(self.vocab) and self.vocab[i].startswith(prefix):
+            hit.update(self.postings[self.vocab[i]])
+            i += 1
+        return tuple(sorted(hit))
+
+    def _match_positions(self, search: str, intent: str) -> Tuple[int, ...]:
+        lists: List[Tuple[int, ...]] = []
+        if intent:
+            lists.append(tuple(self.by_intent.get(intent, ())))
+        for w in dict.fromkeys(tokenize(search)):
+            lists.append(self._prefix(w))
+        if not lists:
+            return tuple(range(len(self.items)))
+        lists.sort(key=len)
+        acc = set(lists[0])
+        for other in lists[1:]:
+            if not acc:
+                break
+            acc.intersection_update(other)
+        return tuple(sorted(acc))
+
+    def find(self, search: str = "", intent: str = "", page: int = 1, limit: int = DEFAULT_LIMIT,
+             after: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int, Optional[int]]:
+        """(rows, total matches, position to resume after or None). `after` (a cursor) overrides page."""
+        positions = self._matches(norm(search), intent or "")
+        start = bisect_right(positions, after) if after is not None else (page - 1) * limit
+        chunk = positions[start:start + limit]
+        more = start + limit < len(positions)
+        return [self.items[p] for p in chunk], len(positions), (chunk[-1] if more and chunk else None)
+
+
+def encode_cursor(pos: int) -> str:
+    return base64.urlsafe_b64encode(f"p{pos}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    if not raw.startswith("p"):
+        raise ValueError("bad cursor")
+    return int(raw[1:])
+
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class FaqApi:
+    """Request -> response mapping, independent of the transport (so it can be exercised directly)."""
+
+    def __init__(self, catalog: FaqCatalog, max_age: int = 300, cache_size: int = RESPONSE_CACHE_SIZE):
+        self.catalog = catalog
+        self.cache_control = f"public, max-age={int(max_age)}"
+        self.cache_size = cache_size
+        self._responses: "OrderedDict[str, Tuple[int, Dict[str, str], bytes]]" = OrderedDict()
+        self.stats = {"requests": 0, "not_modified": 0, "cache_hits": 0}
+
+    def swap(self, catalog: FaqCatalog) -> None:
+        """Serve a new catalog from now on; call on the server's event loop (memo is not thread-safe)."""
+        self.catalog = catalog
+        self._responses.clear()   # 新版本号 => 新 ETag，旧的 If-None-Match 不会再命中
+
+    def handle(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        self.stats["requests"] += 1
+        if method not in ("GET", "HEAD"):
+            return 405, {"Allow": "GET, HEAD"}, b'"Method not allowed"'
+        resp = self._responses.get(target)
+        if resp is not None:
+            self._responses.move_to_end(target)
+            self.stats["cache_hits"] += 1
+        else:
+            resp = self._render(target)
+            if resp[0] == 200:
+                self._responses[target] = resp
+                if len(self._responses) > self.cache_size:
+                    self._responses.popitem(last=False)
+        status, hdrs, body = resp
+        if status == 200 and _etag_matches(headers.get("if-none-match"), hdrs["ETag"]):
+            self.stats["not_modified"] += 1
+            return 304, {k: hdrs[k] for k in ("ETag", "Cache-Control")}, b""
+        return status, hdrs, body
+
+    def _render(self, target: str) -> Tuple[int, Dict[str, str], bytes]:
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/")
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        if path == "/health":
+            return self._json(200, {"ok": True, "rows": len(self.catalog.items), "version": self.catalog.version})
+        if path == "/faqs":
+            return self._list(parse_qs(parts.query), parts.path)
+        if path.startswith("/faqs/") and path.count("/") == 2:
+            item = self.catalog.get(path[len("/faqs/"):])
+            return self._json(200, item) if item else self._json(404, "Not found")
+        return self._json(404, "Not found")
+
+    def _list(self, qs: Dict[str, List[str]], base_path: str) -> Tuple[int, Dict[str, str], bytes]:
+        arg = {k: v[-1] for k, v in qs.items()}
+        try:
+            page = max(1, int(arg.get("page") or 1))
+            limit = min(MAX_LIMIT, max(1, int(arg.get("limit") or DEFAULT_LIMIT)))
+            after = decode_cursor(arg["cursor"]) if arg.get("cursor") else None
+        except (ValueError, UnicodeDecodeError):
+            return self._json(400, "Invalid page, limit or cursor")
+        rows, total, next_after = self.catalog.find(arg.get("search", ""), arg.get("intent", ""), page, limit, after)
+        extra = {"X-Total-Count": str(total)}
+        if next_after is not None:
+            cur = encode_cursor(next_after)
+            keep = "&".join(f"{k}={quote(arg[k])}" for k in ("search", "intent") if arg.get(k))
+            extra["X-Next-Cursor"] = cur
+            extra["Link"] = f'<{base_path}?{keep + "&" if keep else ""}limit={limit}&cursor={cur}>; rel="next"'
+        return self._json(200, rows, extra)
+
+    def _json(self, status: int, obj: Any, extra: Optional[Dict[str, str]] = None):
+        body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        hdrs = {"Content-Type": "application/json; charset=utf-8"}
+        if status == 200:
+            # 强 ETag：数据版本 + 响应体摘要；同一版本数据下同一 URL 永远得到同一 ETag
+            hdrs["ETag"] = f'"{self.catalog.version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+            hdrs["Cache-Control"] = self.cache_control
+        hdrs.update(extra or {})
+        return status, hdrs, body
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored."""
+    for t in (if_none_match or "").split(","):
+        t = t.strip()
+        if t == "*" or (t[2:] if t.startswith("W/") else t) == etag:
+            return True
+    return False
+
+
+def _response_bytes(status: int, headers: Dict[str, str], body: bytes, keep_alive: bool, head_only: bool) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+    lines += [f"{k}: {v}" for k, v in headers.items()]
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", "replace")
+    return head if head_only or status == 304 else head + body
+
+
+class FaqApiServer:
+    def __init__(self, api: FaqApi, host: str = "127.0.0.1", port: int = 8080):
+        self.api = api
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._conns: Dict[asyncio.Task, asyncio.StreamWriter] = {}   # 在用的连接，close() 时逐个关掉
+
+    async def start(self) -> "FaqApiServer":
+        self.server = await asyncio.start_server(self._serve_conn, self.host, self.port, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self) -> None:
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting, close every open connection and wait until their handlers have exited."""
+        if self.server is None:
+            return
+        self.server.close()
+        for w in list(self._conns.values()):
+            w.close()     # 等在 readuntil 上的连接协程随即读到 EOF 退出
+        await asyncio.gather(*list(self._conns), return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def _serve_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._conns[task] = writer
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    writer.write(_response_bytes(400, {}, b'"Bad request"', False, False))
+                    break
+                headers = {}
+                for ln in lines[1:]:
+                    k, sep, v = ln.partition(":")
+                    if sep:
+                        headers[k.strip().lower()] = v.strip()
+                cl = headers.get("content-length") or "0"
+                if not (cl.isascii() and cl.isdigit()):   # 负数 / 非数字：读不出请求体的边界，只能断开
+                    writer.write(_response_bytes(400, {}, b'"Bad Content-Length"', False, False))
+                    break
+                n = int(cl)
+                if n:
+                    await reader.readexactly(n)   # 只读接口：请求体读掉丢弃
+                conn = headers.get("connection", "").lower()
+                keep = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+                status, hdrs, body = self.api.handle(method, target, headers)
+                writer.write(_response_bytes(status, hdrs, body, keep, method == "HEAD"))
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._conns.pop(task, None)
+            writer.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Read-only FAQ API (utas-faqs-mockapi-readonly.yaml) from the CSV.")
+    ap.add_argument("--csv", default=DEFAULT_CSV)
+    ap.add_argument("--host", default=os.getenv("FAQ_API_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("FAQ_API_PORT", "8080")))
+    ap.add_argument("--max-age", type=int, default=int(os.getenv("FAQ_API_MAX_AGE", "300")))
+    ap.add_argument("--watch", type=float, default=float(os.getenv("FAQ_API_WATCH", "0")),
+                    help="poll the CSV every N seconds and apply changes incrementally (0 = off)")
+    args = ap.parse_args(argv)
+    api = FaqApi(FaqCatalog.from_csv(args.csv), max_age=args.max_age)
+    print(f"FAQ API: {len(api.catalog.items)} rows, version {api.catalog.version}, "
+          f"http://{args.host}:{args.port}{API_PREFIX}/faqs")
+
+    async def serve():
+        if args.watch > 0:
+            _start_watch(api, args.csv, args.watch, asyncio.get_running_loop())
+        await FaqApiServer(api, args.host, args.port).serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def _start_watch(api: FaqApi, csv_path: str, interval: float, loop: asyncio.AbstractEventLoop) -> None:
+    try:
+        from tools.faq_ingest import Ingestor
+    except ImportError:
+        from faq_ingest import Ingestor
+    if os.path.abspath(csv_path) == os.path.abspath(DEFAULT_CSV):
+        ing = Ingestor(csv_path, update_default_index=False)
+    else:   # 其他 CSV 的 store/artifact 放在它旁边，不覆盖知识库产物
+        ing = Ingestor(csv_path, csv_path + ".store.bin", csv_path + ".artifact.jsonl.gz",
+                       update_default_index=False)
+    ing.ingest()   # 建立基线（store 不新鲜时这一次是全量）
+
+    latest = [api.catalog]   # 轮询线程自己记住最新版本，不依赖事件循环何时完成替换
+
+    def on_delta(delta) -> None:
+        # 在轮询线程里算好新 catalog，再切回事件循环线程替换
+        catalog = latest[0].apply_delta(delta.inserts + delta.updates, delta.deletes, delta.source_sha1[:12])
+        latest[0] = catalog
+        loop.call_soon_threadsafe(api.swap, catalog)
+        print(f"FAQ API: applied {delta.summary()}, version {catalog.version}")
+
+    ing.subscribe(on_delta)
+    ing.start_watcher(interval)
+
+
+if __name__ == "__main__":
+    main()
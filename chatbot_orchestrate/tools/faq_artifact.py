@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Offline build step for the FAQ knowledge-base artifact.
+
+Reads knowledgebase/utas_faq_agent_QA.csv once and writes
+knowledgebase/faq_artifact.jsonl.gz (gzip-compressed JSON lines):
+  line 1 : {"version", "source_sha1", "rows"}
+  line 2+: {"question", "answer" (sentence-deduped), "link", "filename",
+            "q_tokens" (normalised question tokens), "qa_tokens" (question+answer token set)}
+
+FAQ_AskUs_func loads this on its first call (tools/faq_index.default_index) and
+falls back to parsing the CSV when the artifact is missing or stale.
+
+Usage (from chatbot_orchestrate/):
+    python tools/faq_artifact.py [--csv PATH] [--out PATH]
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+
+from typing import Any, Dict, Iterable, List
+
+try:
+    from tools.faq_index import ARTIFACT_VERSION, DEFAULT_ARTIFACT, DEFAULT_CSV, file_sha1
+    from tools.faq_store import records_from_csv
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import ARTIFACT_VERSION, DEFAULT_ARTIFACT, DEFAULT_CSV, file_sha1
+    from faq_store import records_from_csv
+
+
+def build(csv_path: str = DEFAULT_CSV, out_path: str = DEFAULT_ARTIFACT) -> int:
+    """Write the artifact atomically; returns the number of rows."""
+    return write(records_from_csv(csv_path), file_sha1(csv_path), out_path)
+
+
+def write(records: Iterable[Dict[str, Any]], source_sha1: str, out_path: str = DEFAULT_ARTIFACT) -> int:
+    """Write prepared records (tools/faq_store.prepared) as the artifact via a temp file + os.replace."""
+    return _write_lines([_line(r) for r in records], source_sha1, out_path, 9)
+
+
+def splice(items: Iterable[Any], source_sha1: str, old_sha1: str, out_path: str = DEFAULT_ARTIFACT,
+           compresslevel: int = 1) -> bool:
+    """
+    Incremental rewrite for tools/faq_ingest.py: items are row numbers of the current artifact (the line
+    is copied without parsing) or prepared records. The artifact and the store are always written from
+    the same rows, so store row numbers are valid here. Returns False, writing nothing, when the current
+    artifact was not built from old_sha1.
+    """
+    try:
+        with gzip.open(out_path, "rb") as f:
+            head = json.loads(f.readline())
+            old = f.read().split(b"\n")
+    except (OSError, EOFError, ValueError):
+        return False
+    if head.get("version") != ARTIFACT_VERSION or head.get("source_sha1") != old_sha1:
+        return False
+    lines = [old[i].decode("utf-8") if isinstance(i, int) else _line(i) for i in items]
+    _write_lines(lines, source_sha1, out_path, compresslevel)
+    return True
+
+
+def _line(r: Dict[str, Any]) -> str:
+    row = {"question": r["question"], "answer": r["answer_clean"], "link": r["link"],
+           "filename": r["filename"], "q_tokens": r["q_tokens"], "qa_tokens": r["qa_tokens"]}
+    return json.dumps(row, ensure_ascii=False, separators=(",", ":"))
+
+
+def _write_lines(lines: List[str], source_sha1: str, out_path: str, compresslevel: int) -> int:
+    tmp = out_path + ".tmp"
+    # mtime=0：同一 CSV 构建出的产物字节一致，便于比对/提交
+    with io.TextIOWrapper(gzip.GzipFile(tmp, "wb", compresslevel, mtime=0), encoding="utf-8") as f:
+        head = {"version": ARTIFACT_VERSION, "source_sha1": source_sha1, "rows": len(lines)}
+        f.write(json.dumps(head) + "\n")
+        for line in lines:
+            f.write(line + "\n")
+    os.replace(tmp, out_path)
+    return len(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--csv", default=DEFAULT_CSV)
+    ap.add_argument("--out", default=DEFAULT_ARTIFACT)
+    args = ap.parse_args()
+    if not os.path.exists(args.csv):
+        print(f"❌ CSV file not found: {args.csv}")
+        sys.exit(1)
+    n = build(args.csv, args.out)
+    print(f"Wrote {n} rows -> {args.out} ({os.path.getsize(args.out) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+# tools/faq_index.py
+# Prebuilt inverted index for AskUs FAQ ranking (used by FAQ_AskUs_func).
+#
+# 打分与旧版保持同一量纲：0.8 * 问题相似度 + 0.2 * 覆盖率，
+# 只是把 SequenceMatcher 换成 TF-IDF 余弦（倒排表累加），覆盖率也走倒排表，
+# 因此只有与查询共享词项的条目才会被打分。
+
+import csv
+import gzip
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+KB_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledgebase")
+DEFAULT_CSV = os.path.join(KB_DIR, "utas_faq_agent_QA.csv")
+DEFAULT_ARTIFACT = os.path.join(KB_DIR, "faq_artifact.jsonl.gz")
+ARTIFACT_VERSION = 1
+ASKUS_BASE = "https://askus.utas.edu.au"
+
+_WS_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SENT_SPLIT_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
+_INTENT_RE = re.compile(r"^app_answers_detail_a_id_(\d+)(?:_kw_(.+))?$")
+
+
+def norm(s: str) -> str:
+    # 统一空白、去特殊空格/零宽字符、转小写
+    s = (s or "").replace("\u00A0", " ").replace("\u200B", "")
+    return _WS_RE.sub(" ", s).strip().lower()
+
+
+def tokenize(s: str) -> List[str]:
+    return _TOKEN_RE.findall(norm(s))
+
+
+def dedup_sentences(text: str) -> str:
+    # 句级去重，避免 Answer 里重复段落（保持原顺序）
+    seen, out = set(), []
+    for p in _SENT_SPLIT_RE.split(text or ""):
+        t = _WS_RE.sub(" ", p).strip()
+        key = t.lower()
+        if t and key not in seen:
+            seen.add(key)
+            out.append(t)
+    return " ".join(out) if out else (text or "")
+
+
+@lru_cache(maxsize=4096)
+def prepare(question: str, answer: str) -> tuple:
+    """(deduped answer, question tokens, question+answer token set); memoised by content."""
+    answer = dedup_sentences(answer)
+    q_tokens = tokenize(question)
+    return answer, q_tokens, frozenset(q_tokens).union(tokenize(answer))
+
+
+def file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def link_from_intent(intent: str) -> str:
+    """app_answers_detail_a_id_2481_kw_timetable -> AskUs answer URL ('' if unknown)."""
+    m = _INTENT_RE.match(intent or "")
+    if not m:
+        return ""
+    link = f"{ASKUS_BASE}/app/answers/detail/a_id/{m.group(1)}"
+    return link + (f"/kw/{m.group(2)}" if m.group(2) else "")
+
+
+def passages_from_csv(path: str = DEFAULT_CSV) -> List[Dict[str, Any]]:
+    """Read the knowledge-base CSV into the passage structure FAQ_AskUs_func expects."""
+    out: List[Dict[str, Any]] = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            question = (row.get("question") or "").strip()
+            out.append({
+                "filename": (row.get("filename") or "").strip(),
+                "link": (row.get("link") or "").strip() or link_from_intent(row.get("intent", "")),
+                "course_name": question,
+                "sections": {"Question": question, "Answer": (row.get("answer") or "").strip()},
+            })
+    return out
+
+
+class FaqIndex:
+    """TF-IDF inverted index over FAQ questions plus a token-presence index for coverage."""
+
+    def __init__(self):
+        self.docs: List[Dict[str, str]] = []
+        self._q_postings: Dict[str, List[tuple]] = defaultdict(list)   # term -> [(doc, tf)]
+        self._qa_postings: Dict[str, List[int]] = defaultdict(list)    # term -> [doc]
+        self._idf: Dict[str, float] = {}
+        self._q_norms: List[float] = []
+        self._holes = 0     # docs 里被 apply_delta 删除后空出的槽位（None）
+
+    @classmethod
+    def from_passages(cls, passages: Iterable[Any]) -> "FaqIndex":
+        idx = cls()
+        for p in passages:
+            p = p if isinstance(p, dict) else {}
+            sections = p.get("sections") or {}
+            question = (sections.get("Question") or "").strip()
+            answer, q_tokens, qa_tokens = prepare(question, (sections.get("Answer") or "").strip())
+            idx._add(question, answer, p.get("link") or "", p.get("filename") or "", q_tokens, qa_tokens)
+        idx._finalize()
+        return idx
+
+    @classmethod
+    def from_csv(cls, path: str = DEFAULT_CSV) -> "FaqIndex":
+        return cls.from_passages(passages_from_csv(path))
+
+    @classmethod
+    def from_artifact(cls, path: str = DEFAULT_ARTIFACT) -> "FaqIndex":
+        """Load the prebuilt artifact (see tools/faq_artifact.py); no regex work at load time."""
+        idx = cls()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            f.readline()  # header: {version, source_sha1, rows}
+            for line in f:
+                r = json.loads(line)
+                idx._add(r["question"], r["answer"], r["link"], r["filename"], r["q_tokens"], r["qa_tokens"])
+        idx._finalize()
+        return idx
+
+    @classmethod
+    def from_store(cls, store) -> "FaqIndex":
+        """Index over a tools/faq_store.FaqStore: docs are row views into the store, tokens come prebuilt."""
+        try:
+            from tools.faq_store import DOC_FIELDS
+        except ImportError:
+            from faq_store import DOC_FIELDS
+        idx = cls()
+        idx.docs = store.view(DOC_FIELDS)
+        words: Dict[int, str] = {}    # 词在字符串表里只存一份，每个 id 只解码一次
+
+        def decode(ids) -> List[str]:
+            return [words[i] if i in words else words.setdefault(i, store.string(i)) for i in ids]
+
+        for doc in range(len(store)):
+            idx._index(doc, decode(store.token_ids("q_tokens", doc)), decode(store.token_ids("qa_tokens", doc)))
+        idx._finalize()
+        return idx
+
+    def _add(self, question: str, answer: str, link: str, filename: str,
+             q_tokens: Optional[List[str]] = None, qa_tokens: Optional[Iterable[str]] = None) -> None:
+        doc = len(self.docs)
+        self.docs.append({"question": question, "answer": answer, "link": link, "filename": filename})
+        q_tokens = tokenize(question) if q_tokens is None else q_tokens
+        if qa_tokens is None:
+            qa_tokens = set(q_tokens) | set(tokenize(answer))
+        self._index(doc, q_tokens, qa_tokens)
+
+    def _index(self, doc: int, q_tokens: List[str], qa_tokens: Iterable[str]) -> None:
+        tf: Dict[str, int] = defaultdict(int)
+        for t in q_tokens:
+            tf[t] += 1
+        for t, n in tf.items():
+            self._q_postings[t].append((doc, n))
+        for t in qa_tokens:
+            self._qa_postings[t].append(doc)
+
+    def apply_delta(self, remove: Dict[int, tuple], add: Dict[int, tuple]) -> "FaqIndex":
+        """
+        Copy-on-write update for incremental ingest (tools/faq_ingest.py); self is left untouched.
+          remove: {doc: (q_tokens, qa_tokens)} of the rows' old contents (updates and deletes)
+          add   : {doc: (doc dict, q_tokens, qa_tokens)} (updates and inserts; new docs may reuse holes)
+        Only the postings lists of touched terms are copied; idf and norms are then recomputed,
+        so scores equal those of a full rebuild over the same rows.
+        """
+        new = FaqIndex()
+        new.docs = list(self.docs)
+        new._q_postings = defaultdict(list, self._q_postings)
+        new._qa_postings = defaultdict(list, self._qa_postings)
+        gone = set(remove)
+        for postings, terms in ((new._q_postings, {t for q, _ in remove.values() for t in q}),
+                                (new._qa_postings, {t for _, qa in remove.values() for t in qa})):
+            for t in terms:
+                kept = [p for p in postings.get(t, ()) if (p[0] if isinstance(p, tuple) else p) not in gone]
+                if kept:
+                    postings[t] = kept
+                else:
+                    postings.pop(t, None)     # df = 0 的词不能留在词表里，否则会改变查询向量的范数
+        for doc in gone:
+            new.docs[doc] = None
+        copied_q = {t for q, _ in remove.values() for t in q}
+        copied_qa = {t for _, qa in remove.values() for t in qa}
+        for doc, (d, q_tokens, qa_tokens) in add.items():
+            while len(new.docs) <= doc:
+                new.docs.append(None)
+            new.docs[doc] = d
+            # 与旧索引共享的列表先复制再追加
+            for t in set(q_tokens) - copied_q:
+                new._q_postings[t] = list(new._q_postings.get(t, ()))
+                copied_q.add(t)
+            for t in set(qa_tokens) - copied_qa:
+                new._qa_postings[t] = list(new._qa_postings.get(t, ()))
+                copied_qa.add(t)
+            new._index(doc, q_tokens, qa_tokens)
+        new._holes = sum(1 for d in new.docs if d is None)
+        new._finalize()
+        return new
+
+    def _finalize(self) -> None:
+        n = max(1, len(self.docs) - self._holes)
+        self._idf = {t: math.log((1 + n) / (1 + len(post))) + 1.0 for t, post in self._q_postings.items()}
+        sq = [0.0] * len(self.docs)
+        for t, post in self._q_postings.items():
+            w = self._idf[t]
+            for doc, tf in post:
+                sq[doc] += (tf * w) ** 2
+        self._q_norms = [math.sqrt(v) for v in sq]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """Sparse {doc: score} for every doc sharing at least one token with the query."""
+        return self.scores_batch([query])[0]
+
+    def scores_batch(self, queries: List[str]) -> List[Dict[int, float]]:
+        """scores() for many queries in one term-at-a-time pass: each postings list is walked once."""
+        q_tfs: List[Dict[str, int]] = []
+        by_term: Dict[str, List[tuple]] = defaultdict(list)   # term -> [(query, tf)]
+        for qi, q in enumerate(queries):
+            q_tf: Dict[str, int] = defaultdict(int)
+            for t in tokenize(q):
+                q_tf[t] += 1
+            q_tfs.append(q_tf)
+            for t, n in q_tf.items():
+                by_term[t].append((qi, n))
+
+        dots: List[Dict[int, float]] = [defaultdict(float) for _ in queries]
+        hits: List[Dict[int, int]] = [defaultdict(int) for _ in queries]
+        q_sq = [0.0] * len(queries)
+        for t, qs in by_term.items():
+            w = self._idf.get(t)
+            if w is not None:
+                for qi, n in qs:
+                    q_sq[qi] += (n * w) ** 2
+                for doc, tf in self._q_postings[t]:
+                    dw = tf * w * w
+                    for qi, n in qs:
+                        dots[qi][doc] += n * dw
+            # 覆盖率：查询词（去重）出现在 Question+Answer 中的比例
+            for doc in self._qa_postings.get(t, ()):
+                for qi, _ in qs:
+                    hits[qi][doc] += 1
+
+        out: List[Dict[int, float]] = []
+        for qi, q_tf in enumerate(q_tfs):
+            if not q_tf:
+                out.append({})
+                continue
+            q_norm = math.sqrt(q_sq[qi]) or 1.0
+            d_qi, h_qi, n_uniq = dots[qi], hits[qi], len(q_tf)
+            out.append({doc: 0.8 * d_qi.get(doc, 0.0) / (q_norm * (self._q_norms[doc] or 1.0))
+                             + 0.2 * h_qi.get(doc, 0) / n_uniq
+                        for doc in set(d_qi) | set(h_qi)})
+        return out
+
+    def search(self, query: str, top_k: int = 5, threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """Ranked [{question, answer, link, filename, score}], deduped by (link, question)."""
+        return self.search_batch([query], top_k, threshold)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 5, threshold: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """search() for a list of queries; results are in input order."""
+        k = max(1, int(top_k))
+        out = []
+        for scored in self.scores_batch(queries):
+            # 多取一些候选，给 (link, question) 去重留余量
+            best = heapq.nlargest(candidate_count(k), scored.items(), key=lambda kv: (kv[1], -kv[0]))
+            out.append(collect_results(self.docs, best, k, threshold))
+        return out
+
+
+def candidate_count(k: int) -> int:
+    return k * 2 + 8
+
+
+def collect_results(docs: List[Dict[str, str]], ranked: Iterable[tuple], top_k: int,
+                    threshold: float) -> List[Dict[str, Any]]:
+    """Turn score-descending (doc, score) pairs into output rows: threshold, (link, question) dedup, top_k."""
+    seen, out = set(), []
+    for doc, sc in ranked:
+        if sc < float(threshold):
+            break
+        d = docs[doc]
+        if d is None:   # 增量删除留下的空槽
+            continue
+        key = (d["link"], d["question"].lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append({**d, "score": round(float(sc), 4)})
+        if len(out) >= top_k:
+            break
+    return out
+
+
+_DEFAULT_INDEX: Optional[FaqIndex] = None
+_PASSAGE_INDEXES: "OrderedDict[str, FaqIndex]" = OrderedDict()
+_PASSAGE_CACHE_SIZE = 32
+_PASSAGE_LOCK = threading.Lock()
+
+
+def artifact_is_fresh(csv_path: str = DEFAULT_CSV, artifact_path: str = DEFAULT_ARTIFACT) -> bool:
+    """True if the artifact exists and was built from the current CSV contents."""
+    try:
+        with gzip.open(artifact_path, "rt", encoding="utf-8") as f:
+            head = json.loads(f.readline())
+        return head.get("version") == ARTIFACT_VERSION and head.get("source_sha1") == file_sha1(csv_path)
+    except (OSError, EOFError, ValueError):
+        return False
+
+
+def default_index() -> FaqIndex:
+    """Index over the knowledge base: mmapped store, else the prebuilt artifact, else the CSV (first fresh one)."""
+    global _DEFAULT_INDEX
+    if _DEFAULT_INDEX is None:
+        try:
+            from tools.faq_store import FaqStore, store_is_fresh
+        except ImportError:
+            from faq_store import FaqStore, store_is_fresh
+        if store_is_fresh():
+            # 文本留在共享的 mmap 页里，本进程只持有倒排表
+            _DEFAULT_INDEX = FaqIndex.from_store(FaqStore.open())
+        elif artifact_is_fresh():
+            _DEFAULT_INDEX = FaqIndex.from_artifact()
+        else:
+            _DEFAULT_INDEX = FaqIndex.from_csv()
+    return _DEFAULT_INDEX
+
+
+def passages_key(passages: List[Any]) -> str:
+    """Content hash of a runtime-supplied passages list (the key of the per-list index caches)."""
+    return hashlib.sha1(json.dumps(passages, sort_keys=True, ensure_ascii=False,
+                                   default=str).encode("utf-8")).hexdigest()
+
+
+def passages_index(passages: List[Any]) -> FaqIndex:
+    """FaqIndex for runtime-supplied passages, cached by a content hash of the list."""
+    key = passages_key(passages)
+    # 并发的工具调用共用这个 LRU；运行时传入的 passages 很小，在锁内建索引，相同列表只建一次
+    with _PASSAGE_LOCK:
+        idx = _PASSAGE_INDEXES.get(key)
+        if idx is None:
+            idx = FaqIndex.from_passages(passages)
+            _PASSAGE_INDEXES[key] = idx
+            while len(_PASSAGE_INDEXES) > _PASSAGE_CACHE_SIZE:
+                _PASSAGE_INDEXES.popitem(last=False)
+        else:
+            _PASSAGE_INDEXES.move_to_end(key)
+        return idx
+
+
+if __name__ == "__main__":
+    import sys
+    q = " ".join(sys.argv[1:]) or "how do I see my timetable"
+    print(json.dumps(default_index().search(q, top_k=3), ensure_ascii=False, indent=2))
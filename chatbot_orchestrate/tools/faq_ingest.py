@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Incremental ingestion of knowledgebase/utas_faq_agent_QA.csv.
+
+Rows are keyed by intent and fingerprinted by a content hash
+(tools/faq_store.fingerprint). The current knowledgebase/faq_store.bin doubles
+as the manifest of what was last applied: ingest() diffs the CSV against it and
+only re-prepares (sentence dedup + tokenising) inserted and updated rows. The
+delta then goes to
+
+  files      : faq_store.bin is patched (unchanged rows keep their string ids,
+               new strings are appended) and faq_artifact.jsonl.gz is spliced
+               (unchanged lines copied verbatim), each written to a temp file and
+               renamed; the store goes last and is the commit point, so an
+               interrupted run is simply re-applied. Once enough rows have been
+               patched both are rewritten in full to drop orphaned strings
+  FaqIndex   : the in-process default index gets a copy-on-write
+               FaqIndex.apply_delta() and is swapped in with one assignment
+  normaliser : for the built-in CSV, knowledgebase/query_vocab.json.gz is
+               rebuilt and the process-wide query normaliser replaced
+               (tools/query_normalizer.refresh)
+  MockAPI    : optional; seed_mockapi_from_csv.sync_delta PUTs/POSTs/DELETEs
+               only the changed intents instead of reseeding every row
+  subscribers: callbacks such as `faq_api.py --watch`
+
+Readers never see a half-built index: files appear by rename, the in-memory
+index by a single reference swap. watch() polls the CSV mtime/size.
+
+Usage (from chatbot_orchestrate/):
+    python tools/faq_ingest.py [--csv PATH] [--force] [--watch SECONDS]
+                               [--mockapi BASE_URL] [--mockapi-dry-run]
+
+Set FAQ_INGEST_WATCH=<seconds> to have FAQ_AskUs_func start a watcher thread.
+"""
+
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from tools import faq_artifact, faq_index, faq_store
+    from tools.faq_index import DEFAULT_ARTIFACT, DEFAULT_CSV, FaqIndex, file_sha1
+    from tools.faq_store import DEFAULT_STORE, FaqStore, StoreView, first_rows, prepared, source_fields
+except ImportError:  # 以 tools/ 为包根导入时
+    import faq_artifact
+    import faq_index
+    import faq_store
+    from faq_index import DEFAULT_ARTIFACT, DEFAULT_CSV, FaqIndex, file_sha1
+    from faq_store import DEFAULT_STORE, FaqStore, StoreView, first_rows, prepared, source_fields
+
+
+COMPACT_MIN_ROWS = 1000   # 累计 patch 的行数超过 max(此值, rows/2) 时整体重写 store/artifact
+
+
+class Delta:
+    """What changed between the applied store and the CSV, keyed by intent."""
+
+    def __init__(self):
+        self.inserts: List[Dict[str, Any]] = []    # prepared records
+        self.updates: List[Dict[str, Any]] = []
+        self.deletes: List[str] = []               # intents
+        self.unchanged = 0
+        self.skipped = 0                           # rows without intent, or a repeated intent
+        self.source_sha1 = ""
+        self.timings: Dict[str, float] = {}        # stage -> ms
+        self.mockapi: Optional[Dict[str, int]] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.inserts or self.updates or self.deletes)
+
+    def summary(self) -> Dict[str, Any]:
+        out = {"inserts": len(self.inserts), "updates": len(self.updates), "deletes": len(self.deletes),
+               "unchanged": self.unchanged, "skipped": self.skipped,
+               "timings_ms": {k: round(v, 1) for k, v in self.timings.items()}}
+        if self.mockapi is not None:
+            out["mockapi"] = self.mockapi
+        return out
+
+
+def _open_store(path: str) -> Optional[FaqStore]:
+    try:
+        return FaqStore.open(path)
+    except (OSError, ValueError):   # 不存在 / 旧版本 / 损坏：按全量处理
+        return None
+
+
+class Ingestor:
+    def __init__(self, csv_path: str = DEFAULT_CSV, store_path: str = DEFAULT_STORE,
+                 artifact_path: str = DEFAULT_ARTIFACT, mockapi_url: Optional[str] = None,
+                 mockapi_dry_run: bool = False, update_default_index: bool = True):
+        self.csv_path = csv_path
+        self.store_path = store_path
+        self.artifact_path = artifact_path
+        self.mockapi_url = mockapi_url
+        self.mockapi_dry_run = mockapi_dry_run
+        self.update_default_index = update_default_index
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[Delta], None]] = []
+        self._doc_of: Optional[Dict[str, int]] = None   # intent -> 槽位（进程内 FaqIndex）
+        self._free: List[int] = []                      # 删除后空出的槽位，插入时复用
+        self._stat: Optional[Tuple[int, int]] = None
+
+    def subscribe(self, fn: Callable[[Delta], None]) -> None:
+        """fn(delta) runs after each applied, non-empty delta."""
+        self._subscribers.append(fn)
+
+    def ingest(self, force: bool = False) -> Delta:
+        """Diff the CSV against the store and apply the delta everywhere; an empty Delta if nothing changed."""
+        with self._lock:
+            return self._ingest(force)
+
+    def _ingest(self, force: bool) -> Delta:
+        delta = Delta()
+        t0 = time.perf_counter()
+        delta.source_sha1 = file_sha1(self.csv_path)
+        old = _open_store(self.store_path)
+        if old is not None and old.source_sha1 == delta.source_sha1 and not force:
+            delta.timings["diff"] = (time.perf_counter() - t0) * 1000
+            return delta
+
+        old_rows: Dict[str, int] = {}
+        old_fp: Dict[str, str] = {}
+        if old is not None:
+            old_rows = first_rows(old.column("intent"))
+            fps = list(old.column("fingerprint"))
+            old_fp = {intent: fps[row] for intent, row in old_rows.items()}
+
+        sources: List[Dict[str, str]] = []
+        seen = set()
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                src = source_fields(row)
+                if not src["intent"] or src["intent"] in seen:
+                    delta.skipped += 1
+                    continue
+                seen.add(src["intent"])
+                sources.append(src)
+        delta.timings["diff"] = (time.perf_counter() - t0) * 1000
+
+        # 只有新增/修改的行才做去重+分词；未变的行用旧 store 的行号表示，写出时按字符串 id 直接拷贝
+        t0 = time.perf_counter()
+        items: List[Any] = []
+        for src in sources:
+            intent = src["intent"]
+            if old_fp.get(intent) == src["fingerprint"]:
+                items.append(old_rows[intent])
+                delta.unchanged += 1
+                continue
+            rec = prepared(src)
+            items.append(rec)
+            (delta.updates if intent in old_fp else delta.inserts).append(rec)
+        delta.deletes = [i for i in old_fp if i not in seen]
+        delta.timings["prepare"] = (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        self._write(old, items, delta.source_sha1)
+        delta.timings["write"] = (time.perf_counter() - t0) * 1000
+
+        if self.update_default_index:
+            t0 = time.perf_counter()
+            self._swap_index(old, old_rows, delta)
+            delta.timings["index"] = (time.perf_counter() - t0) * 1000
+
+        if os.path.abspath(self.csv_path) == os.path.abspath(DEFAULT_CSV):
+            # 查询归一化的词表取自内置知识库：CSV 变了就重建 query_vocab.json.gz 并换掉进程内的归一化器，
+            # 否则本进程一直用旧词表，新进程每次都发现产物过期、在内存里重建（~300 ms）
+            t0 = time.perf_counter()
+            try:
+                from tools import query_normalizer
+            except ImportError:
+                import query_normalizer
+            query_normalizer.refresh(self.csv_path)
+            delta.timings["vocab"] = (time.perf_counter() - t0) * 1000
+
+        if self.mockapi_url and delta:
+            t0 = time.perf_counter()
+            try:
+                from tools.seed_mockapi_from_csv import sync_delta
+            except ImportError:
+                from seed_mockapi_from_csv import sync_delta
+            delta.mockapi = sync_delta(delta.inserts + delta.updates, delta.deletes, base_url=self.mockapi_url,
+                                       dry_run=self.mockapi_dry_run)
+            delta.timings["mockapi"] = (time.perf_counter() - t0) * 1000
+
+        if delta:
+            for fn in self._subscribers:
+                fn(delta)
+        return delta
+
+    def _write(self, old: Optional[FaqStore], items: List[Any], source_sha1: str) -> None:
+        """Artifact first, store last (the commit point). Patched in place unless a full rewrite is due."""
+        full = old is None or old.meta.get("patched_rows", 0) + len(items) - sum(
+            isinstance(i, int) for i in items) > max(COMPACT_MIN_ROWS, old.rows // 2)
+        if not full:
+            try:
+                data = old.patch(items, source_sha1)
+            except ValueError:
+                full = True
+        if full:
+            # 首次 / 累计修改过多（字符串表里的孤儿串）时整体重写；未变的行从旧 store 解码，仍不做分词
+            records = [old.record(i) if isinstance(i, int) else i for i in items]
+            faq_artifact.write(records, source_sha1, self.artifact_path)
+            faq_store.write(records, source_sha1, self.store_path)
+            return
+        if not faq_artifact.splice(items, source_sha1, old.source_sha1, self.artifact_path):
+            faq_artifact.write([old.record(i) if isinstance(i, int) else i for i in items], source_sha1,
+                               self.artifact_path)
+        faq_store.write_bytes(data, self.store_path)
+
+    def _swap_index(self, old: Optional[FaqStore], old_rows: Dict[str, int], delta: Delta) -> None:
+        idx = faq_index._DEFAULT_INDEX
+        if idx is None:
+            return   # 还没人用过索引：下次 default_index() 直接加载新 store
+        if self._doc_of is None:
+            docs = idx.docs
+            if isinstance(docs, StoreView) and old is not None and docs.store.source_sha1 == old.source_sha1:
+                self._doc_of = first_rows(docs.store.column("intent"))   # 与 old_rows 同一规则
+            else:
+                # 当前索引来自 artifact/CSV（没有 intent -> 槽位映射）：从新 store 重建一次，之后走增量
+                store = FaqStore.open(self.store_path)
+                faq_index._DEFAULT_INDEX = FaqIndex.from_store(store)
+                self._doc_of = first_rows(store.column("intent"))
+                self._free = []
+                return
+        if not delta:
+            return
+
+        remove: Dict[int, tuple] = {}
+        add: Dict[int, tuple] = {}
+        for intent in delta.deletes + [r["intent"] for r in delta.updates]:
+            doc = self._doc_of.get(intent)
+            row = old_rows.get(intent)
+            if doc is not None and row is not None:
+                remove[doc] = (old.tokens("q_tokens", row), old.tokens("qa_tokens", row))
+        for intent in delta.deletes:
+            doc = self._doc_of.pop(intent, None)
+            if doc is not None:
+                self._free.append(doc)
+        next_doc = len(idx.docs)
+        for rec in delta.updates + delta.inserts:
+            doc = self._doc_of.get(rec["intent"])
+            if doc is None:
+                if self._free:
+                    doc = self._free.pop()
+                else:
+                    doc, next_doc = next_doc, next_doc + 1
+                self._doc_of[rec["intent"]] = doc
+            d = {"question": rec["question"], "answer": rec["answer_clean"], "link": rec["link"],
+                 "filename": rec["filename"]}
+            add[doc] = (d, rec["q_tokens"], rec["qa_tokens"])
+        faq_index._DEFAULT_INDEX = idx.apply_delta(remove, add)   # 单次引用赋值 = 原子切换
+        vectors = _loaded_module("faq_vectors")
+        if vectors is not None:
+            vectors._DEFAULT_VINDEX = None   # 向量索引在下次使用时按新 store 的行序重建（不是这里的槽位）
+
+    def poll(self) -> Optional[Delta]:
+        """Ingest if the CSV's mtime or size changed since the last poll; None if it did not."""
+        try:
+            st = os.stat(self.csv_path)
+        except OSError:
+            return None
+        key = (st.st_mtime_ns, st.st_size)
+        if key == self._stat:
+            return None
+        self._stat = key
+        return self.ingest()
+
+    def watch(self, interval: float = 2.0, stop: Optional[threading.Event] = None) -> None:
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                delta = self.poll()
+                if delta:
+                    print(f"[faq_ingest] {json.dumps(delta.summary())}")
+            except Exception as e:   # 写到一半的 CSV 等：下一轮再试
+                self._stat = None
+                print(f"[faq_ingest] ingest failed: {e}")
+            stop.wait(interval)
+
+    def start_watcher(self, interval: float = 2.0) -> threading.Thread:
+        t = threading.Thread(target=self.watch, args=(interval,), name="faq-ingest", daemon=True)
+        t.start()
+        return t
+
+
+def _loaded_module(name: str):
+    return sys.modules.get(f"tools.{name}") or sys.modules.get(name)
+
+
+_WATCHER: Optional[Ingestor] = None
+_WATCHER_LOCK = threading.Lock()
+
+
+def ensure_watcher() -> Optional[Ingestor]:
+    """Start the background watcher once per process when FAQ_INGEST_WATCH (seconds) is set."""
+    global _WATCHER
+    interval = float(os.getenv("FAQ_INGEST_WATCH", "0") or 0)
+    if interval <= 0:
+        return None
+    with _WATCHER_LOCK:
+        if _WATCHER is None:
+            _WATCHER = Ingestor()
+            _WATCHER.start_watcher(interval)
+    return _WATCHER
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Apply knowledge-base CSV changes incrementally.")
+    ap.add_argument("--csv", default=DEFAULT_CSV)
+    ap.add_argument("--store", default=DEFAULT_STORE)
+    ap.add_argument("--artifact", default=DEFAULT_ARTIFACT)
+    ap.add_argument("--force", action="store_true", help="diff even if the CSV hash is unchanged")
+    ap.add_argument("--watch", type=float, default=0.0, help="poll every N seconds (0 = run once)")
+    ap.add_argument("--mockapi", default=None, help="MockAPI BASE_URL to sync the delta to")
+    ap.add_argument("--mockapi-dry-run", action="store_true")
+    args = ap.parse_args(argv)
+    ing = Ingestor(args.csv, args.store, args.artifact, args.mockapi, args.mockapi_dry_run,
+                   update_default_index=False)
+    if args.watch > 0:
+        try:
+            ing.watch(args.watch)
+        except KeyboardInterrupt:
+            pass
+        return
+    print(json.dumps(ing.ingest(args.force).summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
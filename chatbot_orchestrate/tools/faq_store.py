@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Compact, memory-mappable FAQ store (columnar, one interned string table).
+
+Every distinct string in the knowledge base (field values and tokens alike) is
+stored once in a UTF-8 blob; rows are uint32 string ids held column by column,
+and the per-row token lists used by FaqIndex are ragged uint32 arrays over the
+same table. Row access goes through FaqRow, a __slots__ view that decodes a
+field only when it is read, so no per-row dict is ever materialised.
+
+File layout (knowledgebase/faq_store.bin, little-endian):
+  b"FAQSTORE" | uint32 header length | header JSON, padded to 8 bytes
+  offsets   : uint32[strings + 1]          blob offsets of each string
+  columns   : uint32[columns x rows]       column-major string ids
+  lists     : per list, uint32[rows + 1] row offsets then uint32[n] string ids
+  blob      : UTF-8 bytes
+
+FaqStore.open() maps the file read-only (mmap), so every worker process that
+opens it shares the same page-cache copy instead of parsing the CSV itself.
+
+Usage (from chatbot_orchestrate/):
+    python tools/faq_store.py --build [--csv PATH] [--out PATH]
+    python tools/faq_store.py [intent]          # print one row (or a summary)
+"""
+
+import csv
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from tools.faq_index import DEFAULT_CSV, KB_DIR, file_sha1, link_from_intent, prepare
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import DEFAULT_CSV, KB_DIR, file_sha1, link_from_intent, prepare
+
+MAGIC = b"FAQSTORE"
+STORE_VERSION = 2
+DEFAULT_STORE = os.getenv("FAQ_STORE_PATH", os.path.join(KB_DIR, "faq_store.bin"))
+
+# answer = CSV 原文（MockAPI/seeder 用）；answer_clean = 句级去重后的答案（FaqIndex 用），
+# 两者相同时在字符串表里只占一份
+COLUMNS = ("intent", "question", "answer", "answer_clean", "filename", "link", "fingerprint")
+LISTS = ("q_tokens", "qa_tokens")
+FINGERPRINT_FIELDS = ("question", "answer", "filename", "link")
+
+# FaqIndex.docs 的字段 -> 列
+DOC_FIELDS = {"question": "question", "answer": "answer_clean", "link": "link", "filename": "filename"}
+
+
+def _u32(values: Iterable[int]) -> bytes:
+    a = array("I", values)
+    if a.itemsize != 4:   # pragma: no cover - 'I' 在所有主流平台上都是 4 字节
+        raise RuntimeError("array('I') is not 32-bit on this platform")
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+
+def _pack(offsets, cols, lists, blob: bytes, **meta) -> bytes:
+    parts = [_u32(offsets), _u32(v for col in cols for v in col)]
+    names = ["offsets", "columns"]
+    for name in LISTS:
+        parts += [_u32(lists[name][0]), _u32(lists[name][1])]
+        names += [name + ".rows", name]
+    parts.append(blob)
+    names.append("blob")
+    meta = dict({"version": STORE_VERSION, "columns": list(COLUMNS), "lists": list(LISTS)}, **meta,
+                sizes=[len(p) for p in parts], sections=names)
+    head = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    head += b" " * (-(len(MAGIC) + 4 + len(head)) % 8)
+    return b"".join([MAGIC, struct.pack("<I", len(head)), head] + parts)
+
+
+class FaqRow(Mapping):
+    """Read-only view of one row; fields are decoded on access (`row["question"]` or `row.question`)."""
+
+    __slots__ = ("_store", "_row", "_fields")
+
+    def __init__(self, store: "FaqStore", row: int, fields: Dict[str, int]):
+        self._store = store
+        self._row = row
+        self._fields = fields        # key -> column number, shared by every row of a view
+
+    def __getitem__(self, key: str) -> str:
+        return self._store.value(self._row, self._fields[key])
+
+    def __getattr__(self, key: str) -> str:
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __repr__(self) -> str:
+        return f"FaqRow({self._row}, {dict(self)!r})"
+
+    def to_passage(self) -> Dict[str, Any]:
+        """The passage dict FAQ_AskUs_func accepts (see tools/faq_index.passages_from_csv)."""
+        s, r, c = self._store, self._row, self._store.col
+        question = s.value(r, c["question"])
+        return {"filename": s.value(r, c["filename"]), "link": s.value(r, c["link"]),
+                "course_name": question,
+                "sections": {"Question": question, "Answer": s.value(r, c["answer"])}}
+
+
+class StoreView(Sequence):
+    """The store's rows seen through a field projection (e.g. DOC_FIELDS)."""
+
+    __slots__ = ("_store", "_fields")
+
+    def __init__(self, store: "FaqStore", fields: Dict[str, int]):
+        self._store = store
+        self._fields = fields
+
+    @property
+    def store(self) -> "FaqStore":
+        return self._store
+
+    def __len__(self) -> int:
+        return self._store.rows
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [FaqRow(self._store, r, self._fields) for r in range(*i.indices(self._store.rows))]
+        if i < 0:
+            i += self._store.rows
+        if not 0 <= i < self._store.rows:
+            raise IndexError(i)
+        return FaqRow(self._store, i, self._fields)
+
+
+class FaqStore(Sequence):
+    """Columnar FAQ rows over a bytes buffer or an mmap of knowledgebase/faq_store.bin."""
+
+    def __init__(self, buf, meta: Dict[str, Any], sections: Dict[str, Tuple[int, int]], path: str = ""):
+        self.meta = meta
+        self.path = path
+        self.rows: int = meta["rows"]
+        self.columns: Tuple[str, ...] = tuple(meta["columns"])
+        self.col: Dict[str, int] = {c: i for i, c in enumerate(self.columns)}
+        self.source_sha1: str = meta.get("source_sha1", "")
+        self._buf = buf
+        mv = memoryview(buf)
+        if sys.byteorder == "little":
+            u32 = (lambda a, b: mv[a:b].cast("I"))
+        else:   # 大端机器：拷贝并翻转字节序（此时不再共享页）
+            def u32(a, b):
+                arr = array("I", bytes(mv[a:b]))
+                arr.byteswap()
+                return arr
+        self._offsets = u32(*sections["offsets"])
+        self._cols = u32(*sections["columns"])
+        self._lists = {name: (u32(*sections[name + ".rows"]), u32(*sections[name])) for name in meta["lists"]}
+        self._blob = mv[sections["blob"][0]:sections["blob"][1]]
+        self._all = StoreView(self, dict(self.col))
+        self._ids: Optional[Dict[str, int]] = None
+
+    # ---- 构建 / 序列化 ----
+
+    @staticmethod
+    def serialize(records: Iterable[Dict[str, str]], source_sha1: str = "") -> bytes:
+        """Encode records (dicts with COLUMNS and LISTS keys, see records_from_csv) to the file format."""
+        ids: Dict[str, int] = {"": 0}
+        strings: List[str] = [""]
+
+        def intern(s: str) -> int:
+            sid = ids.get(s)
+            if sid is None:
+                sid = ids[s] = len(strings)
+                strings.append(s)
+            return sid
+
+        cols: List[List[int]] = [[] for _ in COLUMNS]
+        lists: Dict[str, Tuple[List[int], List[int]]] = {name: ([0], []) for name in LISTS}
+        n = 0
+        for rec in records:
+            for c, name in enumerate(COLUMNS):
+                cols[c].append(intern(rec.get(name) or ""))
+            for name in LISTS:
+                rows_, items = lists[name]
+                items.extend(intern(t) for t in rec[name])
+                rows_.append(len(items))
+            n += 1
+
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = [0]
+        for b in encoded:
+            offsets.append(offsets[-1] + len(b))
+        return _pack(offsets, cols, lists, b"".join(encoded), rows=n, strings=len(strings),
+                     source_sha1=source_sha1, patched_rows=0)
+
+    def patch(self, rows: Iterable[Any], source_sha1: str = "") -> bytes:
+        """
+        Encode a successor of this store without touching unchanged rows. Each item of `rows` is either
+        a row number of self (its string ids are copied, nothing is decoded) or a prepared record (interned
+        into this store's table, new strings appended). Strings used only by replaced rows stay in the
+        table; meta["patched_rows"] counts rows added this way since the last full serialize().
+        """
+        if self.columns != COLUMNS or tuple(self._lists) != LISTS:
+            raise ValueError("store layout differs from this version; rebuild it with serialize()")
+        ids = self._string_ids()
+        added: Dict[str, int] = {}
+        new: List[bytes] = []
+        base = self.meta["strings"]
+
+        def intern(s: str) -> int:
+            sid = ids.get(s)
+            if sid is None:
+                sid = added.get(s)
+                if sid is None:
+                    sid = added[s] = base + len(new)
+                    new.append(s.encode("utf-8"))
+            return sid
+
+        r_old = self.rows
+        cols = [array("I") for _ in COLUMNS]
+        lists = {name: (array("I", [0]), array("I")) for name in LISTS}
+        n = patched = 0
+        for item in rows:
+            if isinstance(item, int):
+                for c, col in enumerate(cols):
+                    col.append(self._cols[c * r_old + item])
+                for name, (rows_, items) in lists.items():
+                    src_rows, src_items = self._lists[name]
+                    items.frombytes(src_items[src_rows[item]:src_rows[item + 1]].tobytes())
+                    rows_.append(len(items))
+            else:
+                for c, name in enumerate(COLUMNS):
+                    cols[c].append(intern(item.get(name) or ""))
+                for name, (rows_, items) in lists.items():
+                    items.extend(intern(t) for t in item[name])
+                    rows_.append(len(items))
+                patched += 1
+            n += 1
+
+        offsets = array("I")
+        offsets.frombytes(self._offsets.tobytes())
+        end = offsets[-1]
+        for b in new:
+            end += len(b)
+            offsets.append(end)
+        return _pack(offsets, cols, lists, bytes(self._blob) + b"".join(new), rows=n, strings=base + len(new),
+                     source_sha1=source_sha1, patched_rows=self.meta.get("patched_rows", 0) + patched)
+
+    def _string_ids(self) -> Dict[str, int]:
+        if self._ids is None:
+            # 倒序构建，重复字符串（只会出现在 patch 追加之前）取最小 id
+            self._ids = {self.string(i): i for i in range(self.meta["strings"] - 1, -1, -1)}
+        return self._ids
+
+    @classmethod
+    def from_bytes(cls, buf, path: str = "") -> "FaqStore":
+        if bytes(buf[:len(MAGIC)]) != MAGIC:
+            raise ValueError("not a FAQ store file")
+        (hlen,) = struct.unpack_from("<I", buf, len(MAGIC))
+        start = len(MAGIC) + 4
+        meta = json.loads(bytes(buf[start:start + hlen]))
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"unsupported FAQ store version {meta.get('version')}")
+        sections, pos = {}, start + hlen
+        for name, size in zip(meta["sections"], meta["sizes"]):
+            sections[name] = (pos, pos + size)
+            pos += size
+        if pos > len(buf):
+            raise ValueError("truncated FAQ store file")
+        return cls(buf, meta, sections, path)
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_STORE) -> "FaqStore":
+        """Map the file read-only; pages are shared between every process that opens it."""
+        import mmap
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_bytes(mm, path)
+
+    @classmethod
+    def from_csv(cls, csv_path: str = DEFAULT_CSV) -> "FaqStore":
+        """In-memory store built straight from the CSV (what open() falls back to when the file is stale)."""
+        return cls.from_bytes(cls.serialize(records_from_csv(csv_path), file_sha1(csv_path)))
+
+    # ---- 读取 ----
+
+    def string(self, sid: int) -> str:
+        o = self._offsets
+        return str(self._blob[o[sid]:o[sid + 1]], "utf-8")
+
+    def value(self, row: int, col: int) -> str:
+        return self.string(self._cols[col * self.rows + row])
+
+    def token_ids(self, name: str, row: int):
+        rows_, items = self._lists[name]
+        return items[rows_[row]:rows_[row + 1]]
+
+    def tokens(self, name: str, row: int) -> List[str]:
+        return [self.string(t) for t in self.token_ids(name, row)]
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Everything stored for a row, in the shape serialize() takes (reused by incremental ingest)."""
+        rec: Dict[str, Any] = {c: self.value(row, i) for i, c in enumerate(self.columns)}
+        for name in self._lists:
+            rec[name] = self.tokens(name, row)
+        return rec
+
+    def column(self, name: str) -> Iterator[str]:
+        c = self.col[name] * self.rows
+        ids = self._cols
+        for r in range(self.rows):
+            yield self.string(ids[c + r])
+
+    def view(self, fields: Dict[str, str]) -> StoreView:
+        """Rows projected to {key: column}, e.g. view(DOC_FIELDS) for FaqIndex.docs."""
+        return StoreView(self, {k: self.col[c] for k, c in fields.items()})
+
+    def passages(self) -> Iterator[Dict[str, Any]]:
+        """Passage dicts for callers that need the FAQ_AskUs_func input shape (built one at a time)."""
+        for row in self._all:
+            yield row.to_passage()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, i):
+        return self._all[i]
+
+    def nbytes(self) -> int:
+        return len(self._buf)
+
+
+def source_fields(row: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """The stored fields of one CSV row plus its content fingerprint (cheap: no regex/tokenising)."""
+    intent = (row.get("intent") or "").strip()
+    rec = {"intent": intent, "question": (row.get("question") or "").strip(),
+           "answer": (row.get("answer") or "").strip(), "filename": (row.get("filename") or "").strip(),
+           "link": (row.get("link") or "").strip() or link_from_intent(intent)}
+    rec["fingerprint"] = fingerprint(rec)
+    return rec
+
+
+def fingerprint(rec: Dict[str, str]) -> str:
+    """Content hash of a row; the row's key is its intent (see tools/faq_ingest.py)."""
+    h = hashlib.sha1()
+    for k in FINGERPRINT_FIELDS:
+        h.update(rec.get(k, "").encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()[:16]
+
+
+def prepared(rec: Dict[str, str]) -> Dict[str, Any]:
+    """source_fields() + sentence-deduped answer and token lists: the expensive part of a build."""
+    clean, q_tokens, qa_tokens = prepare(rec["question"], rec["answer"])
+    return dict(rec, answer_clean=clean, q_tokens=q_tokens, qa_tokens=sorted(qa_tokens))
+
+
+def records_from_csv(path: str = DEFAULT_CSV) -> Iterator[Dict[str, Any]]:
+    """Stream CSV rows as store records (derived link, sentence-deduped answer, token lists).
+    A row's key is its intent: rows without one are skipped and a repeated intent keeps its first
+    row, the same rule tools/faq_ingest applies, so a build and an ingest of one CSV agree."""
+    seen = set()
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            src = source_fields(row)
+            if not src["intent"] or src["intent"] in seen:
+                continue
+            seen.add(src["intent"])
+            yield prepared(src)
+
+
+def first_rows(intents: Iterable[str]) -> Dict[str, int]:
+    """intent -> index of its first row (blank intents skipped), the row-key rule of records_from_csv."""
+    rows: Dict[str, int] = {}
+    for i, intent in enumerate(intents):
+        if intent:
+            rows.setdefault(intent, i)
+    return rows
+
+
+def build(csv_path: str = DEFAULT_CSV, out_path: str = DEFAULT_STORE) -> int:
+    """Write the store file atomically; returns its size in bytes."""
+    return write(records_from_csv(csv_path), file_sha1(csv_path), out_path)
+
+
+def write(records: Iterable[Dict[str, Any]], source_sha1: str, out_path: str = DEFAULT_STORE) -> int:
+    return write_bytes(FaqStore.serialize(records, source_sha1), out_path)
+
+
+def write_bytes(data: bytes, out_path: str = DEFAULT_STORE) -> int:
+    """Atomic write: temp file + os.replace; returns the size in bytes."""
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out_path)   # 已打开旧文件的进程继续读旧映射
+    return len(data)
+
+
+def store_is_fresh(csv_path: str = DEFAULT_CSV, store_path: str = DEFAULT_STORE) -> bool:
+    try:
+        with open(store_path, "rb") as f:
+            head = f.read(len(MAGIC) + 4)
+            if head[:len(MAGIC)] != MAGIC:
+                return False
+            meta = json.loads(f.read(struct.unpack("<I", head[len(MAGIC):])[0]))
+        return meta.get("version") == STORE_VERSION and meta.get("source_sha1") == file_sha1(csv_path)
+    except (OSError, ValueError, struct.error):
+        return False
+
+
+_DEFAULT_STORE: Optional[FaqStore] = None
+
+
+def default_store() -> FaqStore:
+    """Knowledge-base store: the mmapped file if fresh, else built from the CSV in memory."""
+    global _DEFAULT_STORE
+    if _DEFAULT_STORE is None:
+        _DEFAULT_STORE = FaqStore.open() if store_is_fresh() else FaqStore.from_csv()
+    return _DEFAULT_STORE
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Build or inspect the memory-mapped FAQ store.")
+    ap.add_argument("--build", action="store_true")
+    ap.add_argument("--csv", default=DEFAULT_CSV)
+    ap.add_argument("--out", default=DEFAULT_STORE)
+    ap.add_argument("intent", nargs="?")
+    args = ap.parse_args(argv)
+    if args.build:
+        if not os.path.exists(args.csv):
+            print(f"❌ CSV file not found: {args.csv}")
+            sys.exit(1)
+        size = build(args.csv, args.out)
+        print(f"Wrote {args.out} ({size / 1024:.0f} KiB)")
+        return
+    store = default_store()
+    if args.intent:
+        for row in store:
+            if row["intent"] == args.intent:
+                print(json.dumps({k: v for k, v in row.items()}, ensure_ascii=False, indent=2))
+                return
+        print("not found")
+        return
+    print(json.dumps({"path": store.path or "(built from CSV)", "rows": len(store), "bytes": store.nbytes(),
+                      "strings": store.meta["strings"]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
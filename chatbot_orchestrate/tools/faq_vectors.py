@@ -0,0 +1,195 @@
+# tools/faq_vectors.py
+# Offline "semantic" mode for FAQ_AskUs_func: hashed char-n-gram embeddings + NumPy index.
+#
+# 每个 FAQ 问题嵌入一次，得到 float32 矩阵（行已 L2 归一化），存成 .npy 后以
+# mmap 方式加载；查询 = 一次矩阵-向量乘 + argpartition 取 top-k。无需 GPU/网络。
+#
+# 矩阵的行序 = 磁盘上的行序（新进程里 default_index() 看到的顺序，见 kb_docs()），不是本进程
+# 增量 ingest 之后的槽位（有空洞、槽位复用）。.json 元数据记下行数和问题文本的指纹，
+# 加载时对不上就不用它，避免向量与 docs 错位。
+#
+# .npy 离线生成（python tools/faq_vectors.py build，或 FAQ_VECTORS_PATH 指到可写位置）；请求路径
+# 从不写文件：文件缺失/过期时在内存里嵌入（~500 行约 40 ms），只读部署和多 worker 并发都不受影响。
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from tools.faq_index import (KB_DIR, DEFAULT_CSV, _PASSAGE_CACHE_SIZE, candidate_count, collect_results,
+                                 default_index, file_sha1, norm, passages_index, passages_key)
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import (KB_DIR, DEFAULT_CSV, _PASSAGE_CACHE_SIZE, candidate_count, collect_results,
+                           default_index, file_sha1, norm, passages_index, passages_key)
+
+DIM = 4096
+NGRAMS = (3, 4, 5)
+DEFAULT_VECTORS = os.getenv("FAQ_VECTORS_PATH", os.path.join(KB_DIR, "faq_vectors.npy"))
+
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    """Signed feature hashing of word-bounded char n-grams, L2-normalised (float32)."""
+    v = np.zeros(dim, dtype=np.float32)
+    s = f" {norm(text)} "
+    for n in NGRAMS:
+        for i in range(len(s) - n + 1):
+            h = zlib.crc32(s[i:i + n].encode("utf-8"))
+            v[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    nrm = float(np.linalg.norm(v))
+    return v / nrm if nrm else v
+
+
+def embed_many(texts: List[str], dim: int = DIM) -> np.ndarray:
+    m = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, t in enumerate(texts):
+        m[i] = embed(t, dim)
+    return m
+
+
+class VectorIndex:
+    """Dense row-normalised matrix aligned with a docs list (same order as FaqIndex.docs)."""
+
+    def __init__(self, matrix: np.ndarray, docs: List[Dict[str, str]]):
+        self.matrix = matrix
+        self.docs = docs
+
+    @classmethod
+    def from_docs(cls, docs: List[Dict[str, str]], dim: int = DIM) -> "VectorIndex":
+        return cls(embed_many([d["question"] for d in docs], dim), docs)
+
+    def search(self, query: str, top_k: int = 5, threshold: float = 0.0) -> List[Dict[str, Any]]:
+        return self.search_batch([query], top_k, threshold)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 5, threshold: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """All queries scored with one (queries x dim) @ (dim x docs) product; results in input order."""
+        k = max(1, int(top_k))
+        if not len(self.docs) or not queries:
+            return [[] for _ in queries]
+        sims = embed_many(queries, self.matrix.shape[1]) @ self.matrix.T
+        c = min(candidate_count(k), sims.shape[1])
+        tops = np.argpartition(-sims, c - 1, axis=1)[:, :c]
+        out = []
+        for row, top in zip(sims, tops):
+            top = top[np.lexsort((top, -row[top]))]  # 分数降序，同分按行号，保证与单条查询一致
+            out.append(collect_results(self.docs, ((int(i), float(row[i])) for i in top), k, threshold))
+        return out
+
+
+def kb_docs() -> Sequence:
+    """
+    Knowledge-base docs in on-disk row order, i.e. what default_index() holds in a fresh process:
+    the store when it is fresh (tools/faq_ingest always rewrites it), else default_index().docs.
+    """
+    try:
+        from tools.faq_store import DOC_FIELDS, FaqStore, store_is_fresh
+    except ImportError:
+        from faq_store import DOC_FIELDS, FaqStore, store_is_fresh
+    if store_is_fresh():
+        return FaqStore.open().view(DOC_FIELDS)
+    return default_index().docs
+
+
+def docs_fingerprint(docs: Sequence) -> str:
+    """sha1 over the embedded text (questions) row by row; empty for freed slots."""
+    h = hashlib.sha1()
+    for d in docs:
+        h.update((d["question"] if d is not None else "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _write_meta(path: str, meta: Dict[str, Any]) -> None:
+    tmp = f"{path}.json.tmp.{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path + ".json")
+
+
+def build(out_path: str = DEFAULT_VECTORS, csv_path: str = DEFAULT_CSV, dim: int = DIM,
+          docs: Optional[Sequence] = None) -> str:
+    """Embed every knowledge-base question and save the matrix (+ .json meta) for mmap loading."""
+    docs = kb_docs() if docs is None else docs
+    m = embed_many([d["question"] if d is not None else "" for d in docs], dim)
+    # 先把元数据换成作废的，再换 .npy，最后写新元数据：任何时刻读到的有效元数据都描述磁盘上的 .npy
+    _write_meta(out_path, {})
+    tmp = f"{out_path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        np.save(f, m)
+    os.replace(tmp, out_path)
+    _write_meta(out_path, {"source_sha1": file_sha1(csv_path), "dim": dim, "rows": len(docs),
+                           "docs_sha1": docs_fingerprint(docs), "ngrams": list(NGRAMS)})
+    return out_path
+
+
+def _read_meta(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load(path: str, csv_path: str, dim: int, docs: Sequence) -> Optional[np.ndarray]:
+    """The saved matrix (mmapped) if its meta matches docs, else None."""
+    meta = _read_meta(path)
+    if not (meta and meta.get("source_sha1") == file_sha1(csv_path) and meta.get("dim") == dim
+            and meta.get("ngrams") == list(NGRAMS) and meta.get("rows") == len(docs)
+            and meta.get("docs_sha1") == docs_fingerprint(docs)):
+        return None
+    try:
+        m = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    # 加载期间有人在重建：元数据变了就不用这份
+    if m.shape != (len(docs), dim) or _read_meta(path) != meta:
+        return None
+    return m
+
+
+_DEFAULT_VINDEX: Optional[VectorIndex] = None
+
+
+def default_vector_index(path: str = DEFAULT_VECTORS) -> VectorIndex:
+    """Knowledge-base vector index: the prebuilt .npy mmapped if fresh, else embedded in memory."""
+    global _DEFAULT_VINDEX
+    if _DEFAULT_VINDEX is None:
+        docs = kb_docs()
+        m = load(path, DEFAULT_CSV, DIM, docs)
+        if m is None:
+            m = embed_many([d["question"] if d is not None else "" for d in docs], DIM)
+        _DEFAULT_VINDEX = VectorIndex(m, docs)
+    return _DEFAULT_VINDEX
+
+
+_PASSAGE_VINDEXES: "OrderedDict[str, VectorIndex]" = OrderedDict()
+_PASSAGE_LOCK = threading.Lock()
+
+
+def passages_vector_index(passages: List[Any]) -> VectorIndex:
+    """VectorIndex for runtime-supplied passages, cached by the same content hash as faq_index.passages_index."""
+    key = passages_key(passages)
+    with _PASSAGE_LOCK:
+        vi = _PASSAGE_VINDEXES.get(key)
+        if vi is None:
+            vi = VectorIndex.from_docs(passages_index(passages).docs)
+            _PASSAGE_VINDEXES[key] = vi
+            while len(_PASSAGE_VINDEXES) > _PASSAGE_CACHE_SIZE:
+                _PASSAGE_VINDEXES.popitem(last=False)
+        else:
+            _PASSAGE_VINDEXES.move_to_end(key)
+        return vi
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["build"]:
+        print(f"Wrote {build()}")
+    else:
+        q = " ".join(sys.argv[1:]) or "how do I see my timetable"
+        print(json.dumps(default_vector_index().search(q, top_k=3), ensure_ascii=False, indent=2))
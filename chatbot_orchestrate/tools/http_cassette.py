@@ -0,0 +1,273 @@
+# tools/http_cassette.py
+# Record / replay of HTTP traffic at the requests transport level, for deterministic benchmarks.
+#
+#   HTTP_CASSETTE_MODE=record python benchmarks/...   # 请求照常发出，同时把请求/响应写进 <dir>/<name>.jsonl.gz
+#   HTTP_CASSETTE_MODE=replay python benchmarks/...   # 不联网，从磁带回放；没录到的请求抛 CassetteMiss
+#
+# - 接入点是 requests 的 transport adapter：DiscoveryClient 和 seed_mockapi_from_csv.make_session
+#   用 http_adapter(name, ...) 代替 HTTPAdapter(...)；未设置 HTTP_CASSETTE_MODE（或 =off）时就是原来的 HTTPAdapter
+# - 磁带：每个 name 一个 gzip JSONL 文件（HTTP_CASSETTE_DIR，默认 benchmarks/cassettes）；每行一次交互，
+#   只存匹配键、状态码、响应头（去掉 Date/Server/连接相关）、响应体和录制时的耗时；不存请求头（不落盘凭据）
+# - 匹配键 = 方法 + 路径 + 排序后的查询串 + 规范化请求体（JSON 按键排序）的哈希；不含 host，
+#   所以在随机端口的 stub 上录的磁带可以对任何 URL 回放。同一个键录了多次时按录制顺序回放，放完后重复最后一条
+# - 回放延迟 HTTP_CASSETTE_LATENCY：0（默认）| recorded（按录制耗时）| <ms> | <ms>,<ms>,...（按顺序循环的脚本）；
+#   延迟超过请求的读超时时按超时处理（抛 requests.ReadTimeout），方便配合 tools/deadline.py 测截止时间；
+#   代码里传给 http_adapter(latency=...) 的数字按秒算，字符串按上面的格式（毫秒）解析
+# - requests 在第一次创建 adapter 时才导入
+
+import atexit
+import base64
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(ROOT, "benchmarks", "cassettes")
+MODES = ("off", "record", "replay")
+# 回放时没有意义或会误导的响应头
+DROP_HEADERS = {"date", "server", "connection", "keep-alive", "transfer-encoding", "content-length",
+                "content-encoding", "set-cookie"}
+
+Latency = Union[None, float, str, Callable[[Dict[str, Any]], float]]
+
+
+class CassetteMiss(Exception):
+    """Replay mode got a request that was never recorded."""
+
+
+def mode() -> str:
+    m = (os.getenv("HTTP_CASSETTE_MODE") or "off").strip().lower()
+    if m not in MODES:
+        raise ValueError(f"HTTP_CASSETTE_MODE must be one of {', '.join(MODES)}, got {m!r}")
+    return m
+
+
+def request_key(method: str, url: str, body: Any) -> str:
+    """METHOD /path?sorted-query body-hash; host and port are not part of the key."""
+    parts = urlsplit(url)
+    query = "&".join(sorted(parts.query.split("&"))) if parts.query else ""
+    raw = body.encode("utf-8") if isinstance(body, str) else (body or b"")
+    if raw:
+        try:
+            raw = json.dumps(json.loads(raw), sort_keys=True, separators=(",", ":")).encode("utf-8")
+        except ValueError:
+            pass
+    digest = hashlib.sha1(raw).hexdigest()[:16] if raw else "-"
+    return f"{(method or 'GET').upper()} {parts.path}{'?' + query if query else ''} {digest}"
+
+
+def _latency_fn(latency: Latency) -> Callable[[Dict[str, Any]], float]:
+    if callable(latency):
+        return latency
+    if isinstance(latency, (int, float)):
+        delay = float(latency)   # 数字是秒；环境变量和字符串脚本里的数字才是毫秒
+        return lambda entry: delay
+    spec = str(latency if latency is not None else os.getenv("HTTP_CASSETTE_LATENCY", "0")).strip().lower()
+    if spec in ("", "0"):
+        return lambda entry: 0.0
+    if spec == "recorded":
+        return lambda entry: float(entry.get("e") or 0.0)
+    script = itertools.cycle([float(x) / 1000.0 for x in spec.split(",")])
+    lock = threading.Lock()
+
+    def scripted(entry: Dict[str, Any]) -> float:
+        with lock:
+            return next(script)
+    return scripted
+
+
+class Cassette:
+    """One cassette file. Record mode truncates it on the first write; replay mode loads it whole
+    on the first request."""
+
+    def __init__(self, path: str, mode: str):
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._out = None
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._next: Dict[str, int] = {}
+        self._loaded = False
+        self.recorded = self.played = 0
+
+    def _load(self) -> None:
+        self._loaded = True
+        if not os.path.exists(self.path):
+            raise CassetteMiss(f"no cassette at {self.path} (record one with HTTP_CASSETTE_MODE=record)")
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    e = json.loads(line)
+                    self._entries.setdefault(e["k"], []).append(e)
+
+    def record(self, key: str, response: "requests.Response", elapsed: float) -> None:
+        body = response.content
+        try:
+            text, b64 = body.decode("utf-8"), False
+        except UnicodeDecodeError:
+            text, b64 = base64.b64encode(body).decode("ascii"), True
+        entry = {"k": key, "s": response.status_code, "r": response.reason or "",
+                 "h": {k: v for k, v in response.headers.items() if k.lower() not in DROP_HEADERS},
+                 "d": text, "e": round(elapsed, 6)}
+        if b64:
+            entry["b64"] = True
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._out is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._out = gzip.open(self.path, "wt", encoding="utf-8")
+            self._out.write(line)
+            self._out.flush()
+            self.recorded += 1
+
+    def play(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            seq = self._entries.get(key)
+            if not seq:
+                raise CassetteMiss(f"{key} is not in {self.path}")
+            i = self._next.get(key, 0)
+            self._next[key] = i + 1
+            self.played += 1
+            return seq[min(i, len(seq) - 1)]
+
+    def rewind(self) -> None:
+        with self._lock:
+            self._next.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._out is not None:
+                self._out.close()
+                self._out = None
+
+    def keys(self) -> Dict[str, int]:
+        """Recorded request keys and how many responses each has (replay mode)."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            return {k: len(v) for k, v in self._entries.items()}
+
+
+_CASSETTES: Dict[tuple, Cassette] = {}
+_LOCK = threading.Lock()
+_ADAPTER_CLS: Optional[type] = None
+
+
+def cassette(name: str, mode_: Optional[str] = None, directory: Optional[str] = None) -> Cassette:
+    """Process-wide cassette per (name, mode, directory); directory defaults to HTTP_CASSETTE_DIR."""
+    m = mode_ or mode()
+    d = directory or os.getenv("HTTP_CASSETTE_DIR") or DEFAULT_DIR
+    key = (name, m, os.path.abspath(d))
+    with _LOCK:
+        c = _CASSETTES.get(key)
+        if c is None:
+            c = _CASSETTES[key] = Cassette(os.path.join(d, f"{name}.jsonl.gz"), m)
+        return c
+
+
+def close_all() -> None:
+    """Flush and close every recording cassette and forget the loaded ones."""
+    with _LOCK:
+        items = list(_CASSETTES.values())
+        _CASSETTES.clear()
+    for c in items:
+        c.close()
+
+
+atexit.register(close_all)   # gzip 尾部在 close 时才写，进程退出前要关掉正在录制的磁带
+
+
+def _read_timeout(timeout: Any) -> Optional[float]:
+    if isinstance(timeout, tuple):
+        timeout = timeout[1] if len(timeout) > 1 else timeout[0]
+    return float(timeout) if timeout is not None else None
+
+
+def _adapter_class() -> type:
+    global _ADAPTER_CLS
+    if _ADAPTER_CLS is not None:
+        return _ADAPTER_CLS
+    import datetime
+
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    class CassetteAdapter(HTTPAdapter):
+        """HTTPAdapter that records every exchange, or answers from the cassette without a socket."""
+
+        def __init__(self, cassette_: Cassette, latency: Latency = None, **kwargs: Any):
+            super().__init__(**kwargs)
+            self.cassette = cassette_
+            self.latency = _latency_fn(latency)
+
+        def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+            key = request_key(request.method, request.url, request.body)
+            if self.cassette.mode == "record":
+                t0 = time.perf_counter()
+                r = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+                self.cassette.record(key, r, time.perf_counter() - t0)
+                return r
+            entry = self.cassette.play(key)
+            delay = self.latency(entry)
+            limit = _read_timeout(timeout)
+            if limit is not None and delay > limit:
+                time.sleep(limit)
+                raise requests.ReadTimeout(f"cassette latency {delay:.3f}s exceeds read timeout {limit:.3f}s",
+                                           request=request)
+            if delay > 0:
+                time.sleep(delay)
+            r = requests.Response()
+            r.status_code = entry["s"]
+            r.reason = entry.get("r", "")
+            r.headers = CaseInsensitiveDict(entry.get("h") or {})
+            r._content = base64.b64decode(entry["d"]) if entry.get("b64") else entry["d"].encode("utf-8")
+            r.encoding = get_encoding_from_headers(r.headers)
+            r.url = request.url
+            r.request = request
+            r.connection = self
+            r.elapsed = datetime.timedelta(seconds=delay)
+            return r
+
+    _ADAPTER_CLS = CassetteAdapter
+    return _ADAPTER_CLS
+
+
+def http_adapter(name: str, latency: Latency = None, **kwargs: Any) -> "HTTPAdapter":
+    """HTTPAdapter(**kwargs) for a session, wrapped in the cassette `name` when HTTP_CASSETTE_MODE
+    is record or replay. latency overrides HTTP_CASSETTE_LATENCY: a number of seconds, a spec string
+    in the env format (ms) or a callable(entry) -> seconds."""
+    m = mode()
+    if m == "off":
+        from requests.adapters import HTTPAdapter
+
+        return HTTPAdapter(**kwargs)
+    return _adapter_class()(cassette(name, m), latency, **kwargs)
+
+
+def mount(session: "requests.Session", name: str, latency: Latency = None, **kwargs: Any) -> "requests.Session":
+    """Mount http_adapter(name) on session for http:// and https://; returns the session."""
+    adapter = http_adapter(name, latency, **kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+if __name__ == "__main__":
+    import sys
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(DEFAULT_DIR, "discovery.jsonl.gz")
+    for k, n in sorted(Cassette(path, "replay").keys().items()):
+        print(f"{n:4d}  {k}")
@@ -0,0 +1,413 @@
+# tools/instrumentation.py
+# Per-tool latency / cost metrics for the ADK tools.
+#
+#   from tools.instrumentation import instrumented_tool
+#   @instrumented_tool(name="FAQ_AskUs_func", description=..., permission=...)   # 与 @tool 参数完全相同
+#   def FAQ_AskUs_func(...): ...
+#
+# - 记录：墙钟耗时、上游 HTTP 耗时/次数、发送/接收字节、结果条数、缓存命中/未命中、错误数
+# - 直方图按线程分片（每个线程只写自己的分片，写路径无锁），快照时合并；已退出线程的分片并入一个基础分片
+# - 导出：prometheus_text()（Prometheus 文本格式）或 snapshot()（JSON）
+# - 慢调用采样剖析：按 TOOL_PROFILE_SAMPLE 比例对调用开 cProfile，超过 TOOL_PROFILE_SLOW_MS 的保留前几名热点
+# 上游耗时/字节由 discovery_client 调 record_upstream()，缓存命中由 query_cache 调 record_cache()；
+# 它们通过 contextvar 归到当前工具调用上（线程池里的子任务不继承 context，不计入）。
+# 每次调用还套上截止时间（tools/deadline.py）：工具声明了 deadline_ms 参数且调用方传了值时用它，
+# 否则用 TOOL_DEADLINE_MS；上游请求的超时/重试以它为上限。
+
+import contextvars
+import functools
+import os
+import random
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from tools.deadline import deadline, tool_budget
+except ImportError:  # 以 tools/ 为包根导入时
+    from deadline import deadline, tool_budget
+
+if TYPE_CHECKING:
+    import cProfile
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_HELP = {
+    "tool_calls_total": ("counter", "Tool invocations by outcome."),
+    "tool_duration_seconds": ("histogram", "Wall time per tool call."),
+    "tool_upstream_seconds": ("histogram", "Time spent in upstream HTTP requests per tool call."),
+    "tool_upstream_requests_total": ("counter", "Upstream HTTP requests made inside tool calls."),
+    "tool_bytes_out_total": ("counter", "Request bytes sent upstream."),
+    "tool_bytes_in_total": ("counter", "Response bytes received from upstream."),
+    "tool_response_bytes": ("histogram", "Upstream response bytes per tool call."),
+    "tool_results": ("histogram", "Result items returned per tool call."),
+    "tool_cache_total": ("counter", "Response-cache lookups inside tool calls by result."),
+}
+
+
+# ---------------- per-thread shards ----------------
+class _Shard:
+    """Metrics written by exactly one thread; other threads only read (snapshot)."""
+    __slots__ = ("counters", "hists", "gen", "thread")
+
+    def __init__(self, gen: int = 0, thread: Optional["weakref.ref"] = None):
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.hists: Dict[Tuple[str, Tuple], List[float]] = {}   # key -> [bucket counts..., +Inf, sum]
+        self.gen = gen          # reset() 的代数；过期的分片由所属线程自己清空
+        self.thread = thread    # 所属线程（弱引用）；线程退出后快照时并入 _BASE
+
+
+_SHARDS: List[_Shard] = []
+_SHARDS_LOCK = threading.Lock()   # 注册分片、快照、reset 时用；写路径不加锁
+_BASE = _Shard()                  # 已退出线程的分片合并到这里（只在 _SHARDS_LOCK 下读写）
+_GEN = 0
+_local = threading.local()
+
+
+def _shard() -> _Shard:
+    s = getattr(_local, "shard", None)
+    if s is None:
+        s = _local.shard = _Shard(_GEN, weakref.ref(threading.current_thread()))
+        with _SHARDS_LOCK:
+            _SHARDS.append(s)
+    elif s.gen != _GEN:
+        # reset() 之后第一次写：清空自己的分片（不去改别的线程正在写的字典）
+        s.counters, s.hists, s.gen = {}, {}, _GEN
+    return s
+
+
+def _exited(s: _Shard) -> bool:
+    t = s.thread() if s.thread is not None else None
+    return t is None or not t.is_alive()
+
+
+def _fold(counters: Dict, hists: Dict, s: _Shard) -> None:
+    # list(dict.items()) 在 C 层一次完成，不会与写线程的插入交错
+    for k, v in list(s.counters.items()):
+        counters[k] = counters.get(k, 0.0) + v
+    for k, row in list(s.hists.items()):
+        acc = hists.get(k)
+        if acc is None:
+            hists[k] = list(row)
+        else:
+            for i, v in enumerate(row):
+                acc[i] += v
+
+
+def inc(name: str, labels: Tuple[Tuple[str, str], ...], value: float = 1.0) -> None:
+    c = _shard().counters
+    key = (name, labels)
+    c[key] = c.get(key, 0.0) + value
+
+
+def observe(name: str, labels: Tuple[Tuple[str, str], ...], value: float, buckets: Tuple[float, ...]) -> None:
+    h = _shard().hists
+    key = (name, labels)
+    row = h.get(key)
+    if row is None:
+        row = h[key] = [0.0] * (len(buckets) + 2)
+    row[bisect_left(buckets, value)] += 1     # le 语义：等于上界落在该桶
+    row[-1] += value
+
+
+_BUCKETS_OF = {"tool_duration_seconds": TIME_BUCKETS, "tool_upstream_seconds": TIME_BUCKETS,
+               "tool_response_bytes": BYTE_BUCKETS, "tool_results": COUNT_BUCKETS}
+
+
+def _merged() -> Tuple[Dict, Dict]:
+    counters: Dict[Tuple[str, Tuple], float] = {}
+    hists: Dict[Tuple[str, Tuple], List[float]] = {}
+    with _SHARDS_LOCK:
+        # 已退出线程的分片并入 _BASE 后丢掉：每线程一个请求的宿主不会无限积累分片
+        live = []
+        for s in _SHARDS:
+            if not _exited(s):
+                live.append(s)
+            elif s.gen == _GEN:
+                _fold(_BASE.counters, _BASE.hists, s)
+        _SHARDS[:] = live
+        _fold(counters, hists, _BASE)
+        gen = _GEN
+    for s in live:
+        if s.gen == gen:   # reset() 之后还没写过的分片是旧数据
+            _fold(counters, hists, s)
+    return counters, hists
+
+
+def reset() -> None:
+    """Drop all recorded metrics. Each thread clears its own shard on its next write."""
+    global _GEN, _BASE
+    with _SHARDS_LOCK:
+        _GEN += 1
+        _BASE = _Shard(_GEN)
+
+
+# ---------------- per-call context ----------------
+class CallStats:
+    __slots__ = ("upstream_s", "upstream_n", "bytes_out", "bytes_in", "cache_hits", "cache_misses", "lock")
+
+    def __init__(self):
+        self.upstream_s = 0.0
+        self.upstream_n = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.lock = threading.Lock()   # aquery_many 经 to_thread 复制 context，多个线程可能写同一个调用
+
+
+_CURRENT: contextvars.ContextVar[Optional[CallStats]] = contextvars.ContextVar("tool_call_stats", default=None)
+
+
+def record_upstream(seconds: float, bytes_out: int = 0, bytes_in: int = 0) -> None:
+    """Attribute one upstream HTTP request to the tool call in progress (no-op outside a tool call)."""
+    st = _CURRENT.get()
+    if st is not None:
+        with st.lock:
+            st.upstream_s += seconds
+            st.upstream_n += 1
+            st.bytes_out += bytes_out
+            st.bytes_in += bytes_in
+
+
+def record_cache(hit: bool) -> None:
+    st = _CURRENT.get()
+    if st is not None:
+        with st.lock:
+            if hit:
+                st.cache_hits += 1
+            else:
+                st.cache_misses += 1
+
+
+def result_count(result: Any) -> int:
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    if isinstance(result, dict):
+        for k in ("items", "snippets", "bullets", "results"):
+            v = result.get(k)
+            if isinstance(v, list):
+                return len(v)
+        return 1 if result.get("answer") or result.get("summary") else 0
+    return 0 if result is None else 1
+
+
+# ---------------- slow-call sampling profiler ----------------
+class SlowCallProfiler:
+    """Profiles a random sample of calls; keeps the top functions of those slower than slow_s."""
+
+    def __init__(self, slow_s: float, sample: float = 0.05, keep: int = 20, top: int = 15):
+        self.slow_s = slow_s
+        self.sample = sample
+        self.top = top
+        self.reports: "deque[Dict[str, Any]]" = deque(maxlen=keep)
+        self._busy = threading.Lock()   # 同一时刻只开一个 cProfile（解释器级 profiler 不能叠加）
+
+    def start(self) -> Optional["cProfile.Profile"]:
+        import cProfile   # 只在启用剖析时导入
+
+        if self.sample <= 0 or random.random() >= self.sample or not self._busy.acquire(blocking=False):
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:   # 另一个 profiler 已在运行
+            self._busy.release()
+            return None
+        return prof
+
+    def stop(self, prof: "cProfile.Profile", tool: str, elapsed: float) -> None:
+        import io
+        import pstats
+
+        prof.disable()
+        self._busy.release()
+        if elapsed < self.slow_s:
+            return
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(self.top)
+        self.reports.append({"tool": tool, "seconds": round(elapsed, 4), "at": time.time(),
+                             "profile": buf.getvalue()})
+
+
+_PROFILER: Optional[SlowCallProfiler] = None
+if os.getenv("TOOL_PROFILE_SLOW_MS"):
+    _PROFILER = SlowCallProfiler(float(os.environ["TOOL_PROFILE_SLOW_MS"]) / 1000.0,
+                                 float(os.getenv("TOOL_PROFILE_SAMPLE", "0.05")))
+
+
+def set_slow_call_profiler(slow_ms: Optional[float], sample: float = 0.05) -> None:
+    """Enable (or with None disable) sampling profiles of calls slower than slow_ms."""
+    global _PROFILER
+    _PROFILER = SlowCallProfiler(slow_ms / 1000.0, sample) if slow_ms is not None else None
+
+
+def slow_profiles() -> List[Dict[str, Any]]:
+    return list(_PROFILER.reports) if _PROFILER else []
+
+
+# ---------------- wrappers ----------------
+def instrument(name: Optional[str] = None) -> Callable:
+    """Decorator recording metrics for a plain function; functools.wraps keeps its signature and docstring."""
+    def deco(fn: Callable) -> Callable:
+        tool_name = name or fn.__name__
+        lab = (("tool", tool_name),)
+        # 工具签名里的 deadline_ms 参数（按位置传时的下标）；不用 inspect，保持导入开销
+        code = getattr(fn, "__code__", None)
+        pos = code.co_varnames[:code.co_argcount] if code is not None else ()
+        dl_pos = pos.index("deadline_ms") if "deadline_ms" in pos else None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            deadline_ms = kwargs.get("deadline_ms")
+            if deadline_ms is None and dl_pos is not None and len(args) > dl_pos:
+                deadline_ms = args[dl_pos]
+            st = CallStats()
+            token = _CURRENT.set(st)
+            prof = _PROFILER.start() if _PROFILER else None
+            t0 = time.perf_counter()
+            status = "ok"
+            result = None
+            try:
+                with deadline(tool_budget(deadline_ms)):
+                    result = fn(*args, **kwargs)
+                return result
+            except BaseException:
+                status = "error"
+                raise
+            finally:
+                elapsed = time.perf_counter() - t0
+                if prof is not None:
+                    _PROFILER.stop(prof, tool_name, elapsed)
+                _CURRENT.reset(token)
+                inc("tool_calls_total", lab + (("status", status),))
+                observe("tool_duration_seconds", lab, elapsed, TIME_BUCKETS)
+                if st.upstream_n:
+                    observe("tool_upstream_seconds", lab, st.upstream_s, TIME_BUCKETS)
+                    observe("tool_response_bytes", lab, st.bytes_in, BYTE_BUCKETS)
+                    inc("tool_upstream_requests_total", lab, st.upstream_n)
+                    inc("tool_bytes_out_total", lab, st.bytes_out)
+                    inc("tool_bytes_in_total", lab, st.bytes_in)
+                if st.cache_hits:
+                    inc("tool_cache_total", lab + (("result", "hit"),), st.cache_hits)
+                if st.cache_misses:
+                    inc("tool_cache_total", lab + (("result", "miss"),), st.cache_misses)
+                if status == "ok":
+                    observe("tool_results", lab, result_count(result), COUNT_BUCKETS)
+        return wrapper
+    return deco
+
+
+def instrumented_tool(*args, **kwargs) -> Callable:
+    """Drop-in replacement for ADK's @tool / @tool(...): same arguments, same registered schema,
+    plus metrics. The ADK import is deferred so the metrics side works without the SDK."""
+    from ibm_watsonx_orchestrate.agent_builder.tools import tool
+
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return tool(instrument()(args[0]))
+
+    def deco(fn: Callable) -> Callable:
+        return tool(*args, **kwargs)(instrument(kwargs.get("name"))(fn))
+    return deco
+
+
+# ---------------- export ----------------
+def _fmt_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    esc = (lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def _fmt_num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(v)
+
+
+def prometheus_text() -> str:
+    """Prometheus text exposition format (version 0.0.4) of all tool metrics."""
+    counters, hists = _merged()
+    out: List[str] = []
+    for name, (kind, help_) in _HELP.items():
+        rows = [(k[1], v) for k, v in counters.items() if k[0] == name] if kind == "counter" else \
+               [(k[1], v) for k, v in hists.items() if k[0] == name]
+        if not rows:
+            continue
+        out.append(f"# HELP {name} {help_}")
+        out.append(f"# TYPE {name} {kind}")
+        for labels, v in sorted(rows):
+            if kind == "counter":
+                out.append(f"{name}{_fmt_labels(labels)} {_fmt_num(v)}")
+                continue
+            acc = 0.0
+            for le, c in zip(_BUCKETS_OF[name] + (float("inf"),), v[:-1]):
+                acc += c
+                le_s = "+Inf" if le == float("inf") else _fmt_num(le)
+                out.append(f"{name}_bucket{_fmt_labels(labels, (('le', le_s),))} {_fmt_num(acc)}")
+            out.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_num(round(v[-1], 6))}")
+            out.append(f"{name}_count{_fmt_labels(labels)} {_fmt_num(acc)}")
+    return "\n".join(out) + "\n"
+
+
+def _quantile(row: List[float], buckets: Tuple[float, ...], q: float) -> Optional[float]:
+    """Upper bound of the bucket holding the q-quantile (None if it lies in +Inf)."""
+    total = sum(row[:-1])
+    if not total:
+        return None
+    acc = 0.0
+    for le, c in zip(buckets, row):
+        acc += c
+        if acc >= q * total:
+            return le
+    return None
+
+
+def _hist_summary(row: List[float], buckets: Tuple[float, ...]) -> Dict[str, Any]:
+    n = sum(row[:-1])
+    return {"count": int(n), "sum": round(row[-1], 6), "mean": round(row[-1] / n, 6) if n else None,
+            "p50_le": _quantile(row, buckets, 0.5), "p95_le": _quantile(row, buckets, 0.95),
+            "p99_le": _quantile(row, buckets, 0.99)}
+
+
+def snapshot() -> Dict[str, Any]:
+    """JSON-friendly per-tool view: calls, errors, latency/upstream summaries, bytes, results, cache."""
+    counters, hists = _merged()
+    tools: Dict[str, Dict[str, Any]] = {}
+
+    def entry(labels) -> Dict[str, Any]:
+        t = dict(labels)["tool"]
+        return tools.setdefault(t, {"calls": 0, "errors": 0, "upstream_requests": 0, "bytes_out": 0,
+                                    "bytes_in": 0, "cache_hits": 0, "cache_misses": 0})
+
+    for (name, labels), v in counters.items():
+        e = entry(labels)
+        lab = dict(labels)
+        if name == "tool_calls_total":
+            e["calls"] += int(v)
+            if lab.get("status") == "error":
+                e["errors"] += int(v)
+        elif name == "tool_upstream_requests_total":
+            e["upstream_requests"] += int(v)
+        elif name == "tool_bytes_out_total":
+            e["bytes_out"] += int(v)
+        elif name == "tool_bytes_in_total":
+            e["bytes_in"] += int(v)
+        elif name == "tool_cache_total":
+            e["cache_hits" if lab.get("result") == "hit" else "cache_misses"] += int(v)
+    short = {"tool_duration_seconds": "wall", "tool_upstream_seconds": "upstream",
+             "tool_response_bytes": "response_bytes", "tool_results": "results"}
+    for (name, labels), row in hists.items():
+        entry(labels)[short[name]] = _hist_summary(row, _BUCKETS_OF[name])
+    return {"tools": tools, "slow_profiles": [{k: v for k, v in r.items() if k != "profile"}
+                                              for r in slow_profiles()]}
+
+
+if __name__ == "__main__":
+    import json
+    print(json.dumps(snapshot(), indent=2))
+    print(prometheus_text())
@@ -0,0 +1,293 @@
+# tools/intent_fastpath.py
+# Local fast path for intent classification, consulted before the LLM classifier.
+#
+# 高精度正则规则 + 小型线性模型（softmax 回归，纯 Python，无第三方依赖）。
+# 训练数据：prompts/fewshot_intent.jsonl + prompts/intent_train.jsonl + FAQ CSV 中的问题（均为 PUBLIC_QA）。
+# 输出与 classifiers/intent_classifier.llm.yaml 同一结构 {scores, top_intent, explanation}，
+# 另加 confidence / needs_llm：置信度低于阈值的消息才交给 LLM 分类器。
+# 训练好的权重存为 knowledgebase/intent_model.json.gz（python tools/intent_fastpath.py --build），
+# 训练数据有变化时产物失效，退回进程内训练。
+
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from tools.faq_index import DEFAULT_CSV, KB_DIR, file_sha1, norm
+    from tools.unit_patterns import SEM_RE, UNIT_RE
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import DEFAULT_CSV, KB_DIR, file_sha1, norm
+    from unit_patterns import SEM_RE, UNIT_RE
+
+INTENTS = ("PUBLIC_QA", "COURSE_OUTLINE", "MY_PROFILE", "MY_ENROLMENTS", "MY_TIMETABLE", "LOGIN")
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+FEWSHOT_PATH = os.path.join(PROMPTS_DIR, "fewshot_intent.jsonl")
+TRAIN_PATH = os.path.join(PROMPTS_DIR, "intent_train.jsonl")
+EVAL_PATH = os.path.join(PROMPTS_DIR, "intent_eval.jsonl")
+MODEL_PATH = os.path.join(KB_DIR, "intent_model.json.gz")
+MODEL_VERSION = 1
+
+DEFAULT_THRESHOLD = float(os.getenv("INTENT_FASTPATH_THRESHOLD", "0.85"))
+RULE_BOOST = 4.0      # 规则命中时加到对应意图 logit 上（不直接拍板，模型仍参与）
+CSV_HOLDOUT_MOD = 5   # crc32(question) % 5 == 0 的 CSV 问题不参与训练，留给评测
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_HOWTO_RE = re.compile(r"^\W*(?:how (?:do|can|should|would|will) (?:i|we|you)|how to|where can i|what happens)\b")
+_ACCOUNT_HELP_RE = re.compile(r"\b(?:password|username|mfa|multi-?factor|reset|forgot|trouble|problem|"
+                              r"can'?t|cannot|unable|locked)\b")
+
+# (name, intent, pattern, skip_if_howto)
+_RULES = [
+    ("login", "LOGIN",
+     re.compile(r"\b(?:log\s?(?:me\s+)?(?:in|out|into)|login|logout|sign\s?(?:me\s+)?(?:in|out)|signin|signout)\b"),
+     False),
+    ("whoami", "MY_PROFILE", re.compile(r"\b(?:who\s?am\s?i|whoami)\b"), False),
+    ("my_profile", "MY_PROFILE",
+     re.compile(r"\bmy (?:profile|student (?:id|number)|personal details|details|student record|record)\b"), True),
+    ("my_enrolments", "MY_ENROLMENTS",
+     re.compile(r"\b(?:(?:units?|subjects?|courses?|classes)\b[^?.!]{0,15}\b(?:am i|i'?m|i am)\s+"
+                r"(?:enrol+ed|taking|doing|studying|registered)|am i (?:still )?enrol+ed|"
+                r"my (?:enrol+ments?|units|subjects|enrol+ed units|current units))\b"), True),
+    ("my_timetable", "MY_TIMETABLE",
+     re.compile(r"\bmy\b[^?.!]{0,30}?\b(?:timetable|schedule|tutorials?|lectures?|labs?|workshops?|"
+                r"practicals?|class(?:es)?)\b"), True),
+    ("unit_outline", "COURSE_OUTLINE",
+     re.compile(r"\b(?:assess\w*|weight\w*|worth|prereq\w*|pre-?requisites?|outcomes?|topics?|learn|taught|"
+                r"teach\w*|coordinator|exams?|quiz\w*|assignments?|portfolio|project|report|textbooks?|"
+                r"readings?|credit points?|describe|about|outline|pass|due)\b"), False),
+]
+
+
+def features(text: str) -> List[str]:
+    """Unigrams + boundary-padded bigrams; unit codes / semesters collapse to placeholder tokens."""
+    t = norm(text).replace("\u2019", "'")
+    t = SEM_RE.sub(" semcode ", UNIT_RE.sub(" unitcode ", t))
+    toks = _TOKEN_RE.findall(t)
+    grams = toks + [f"{a}_{b}" for a, b in zip(["^"] + toks, toks + ["$"])]
+    return list(dict.fromkeys(grams))
+
+
+def match_rules(text: str) -> List[Tuple[str, str]]:
+    """[(rule name, intent)] of the high-precision rules that fire on text."""
+    t = norm(text).replace("\u2019", "'")
+    howto = bool(_HOWTO_RE.search(t))
+    fired = []
+    for name, intent, pat, skip_howto in _RULES:
+        if skip_howto and howto:
+            continue
+        if name == "login" and _ACCOUNT_HELP_RE.search(t):
+            continue   # “忘记密码/重置 MFA” 是 AskUs 问题，不是登录动作
+        if name == "unit_outline" and (not UNIT_RE.search(t) or re.search(r"\b(?:my|am i)\b", t)):
+            continue   # 只有提到具体课程代码、且不是问“我的”安排时才算大纲问题
+        if pat.search(t):
+            fired.append((name, intent))
+    return fired
+
+
+def _softmax(z: Sequence[float]) -> List[float]:
+    m = max(z)
+    e = [math.exp(v - m) for v in z]
+    s = sum(e)
+    return [v / s for v in e]
+
+
+class LinearIntentModel:
+    """Multinomial logistic regression over sparse binary features (weights: feature -> per-intent list)."""
+
+    def __init__(self, weights: Dict[str, List[float]], bias: List[float]):
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def train(cls, examples: Iterable[Tuple[str, str]], epochs: int = 25, lr: float = 0.5,
+              l2: float = 1e-4, seed: int = 0) -> "LinearIntentModel":
+        data = [(features(t), INTENTS.index(y)) for t, y in examples]
+        k = len(INTENTS)
+        counts = [0] * k
+        for _, y in data:
+            counts[y] += 1
+        # 类别权重：PUBLIC_QA 样本远多于其余类，按 sqrt 反频率加权
+        cw = [math.sqrt(len(data) / (k * c)) if c else 0.0 for c in counts]
+        weights: Dict[str, List[float]] = {}
+        bias = [0.0] * k
+        rnd = random.Random(seed)
+        for ep in range(epochs):
+            rnd.shuffle(data)
+            step = lr / (1.0 + 0.2 * ep)
+            for feats, y in data:
+                rows = [weights.setdefault(f, [0.0] * k) for f in feats]
+                z = list(bias)
+                for w in rows:
+                    for j in range(k):
+                        z[j] += w[j]
+                p = _softmax(z)
+                p[y] -= 1.0
+                g = [step * cw[y] * v for v in p]
+                for j in range(k):
+                    bias[j] -= g[j]
+                for w in rows:
+                    for j in range(k):
+                        w[j] -= g[j] + step * l2 * w[j]
+        return cls(weights, bias)
+
+    def logits(self, feats: Iterable[str]) -> List[float]:
+        z = list(self.bias)
+        get = self.weights.get
+        for f in feats:
+            w = get(f)
+            if w is not None:
+                for j in range(len(z)):
+                    z[j] += w[j]
+        return z
+
+    def save(self, path: str, source_sha1: str, min_weight: float = 0.01) -> int:
+        """Write the weights atomically (near-zero features dropped); returns the feature count."""
+        kept = {f: [round(v, 4) for v in w] for f, w in sorted(self.weights.items())
+                if max(abs(v) for v in w) > min_weight}
+        doc = {"version": MODEL_VERSION, "source_sha1": source_sha1, "intents": list(INTENTS),
+               "bias": [round(v, 4) for v in self.bias], "weights": kept}
+        tmp = path + ".tmp"
+        with io.TextIOWrapper(gzip.GzipFile(tmp, "wb", mtime=0), encoding="utf-8") as f:
+            f.write(json.dumps(doc, ensure_ascii=False, separators=(",", ":")))
+        os.replace(tmp, path)
+        return len(kept)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH, source_sha1: Optional[str] = None) -> Optional["LinearIntentModel"]:
+        """Model from a saved artifact; None if missing, unreadable or built from other training data."""
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+        if doc.get("version") != MODEL_VERSION or tuple(doc.get("intents", ())) != INTENTS:
+            return None
+        if source_sha1 is not None and doc.get("source_sha1") != source_sha1:
+            return None
+        return cls(doc["weights"], doc["bias"])
+
+    def top_features(self, feats: Iterable[str], intent: int, n: int = 3) -> List[str]:
+        scored = [(self.weights[f][intent], f) for f in feats if f in self.weights]
+        return [f for w, f in sorted(scored, reverse=True)[:n] if w > 0]
+
+
+class IntentFastPath:
+    def __init__(self, model: LinearIntentModel, threshold: float = DEFAULT_THRESHOLD):
+        self.model = model
+        self.threshold = threshold
+
+    def classify(self, text: str, threshold: Optional[float] = None) -> Dict[str, Any]:
+        """{scores, top_intent, explanation, confidence, needs_llm}; needs_llm=True means fall through."""
+        threshold = self.threshold if threshold is None else threshold
+        feats = features(text)
+        z = self.model.logits(feats)
+        fired = match_rules(text)
+        for _, intent in fired:
+            z[INTENTS.index(intent)] += RULE_BOOST
+        p = _softmax(z)
+        top = max(range(len(p)), key=p.__getitem__)
+        why = []
+        if fired:
+            why.append("rules: " + ", ".join(name for name, _ in fired))
+        cues = self.model.top_features(feats, top)
+        if cues:
+            why.append("cues: " + ", ".join(cues))
+        return {
+            "scores": {name: round(v, 4) for name, v in zip(INTENTS, p)},
+            "top_intent": INTENTS[top],
+            "explanation": "; ".join(why) or "no strong cues",
+            "confidence": round(p[top], 4),
+            "needs_llm": p[top] < threshold,
+        }
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def is_holdout(question: str) -> bool:
+    return zlib.crc32(norm(question).encode("utf-8")) % CSV_HOLDOUT_MOD == 0
+
+
+def csv_questions(path: str = DEFAULT_CSV, holdout: bool = False) -> List[str]:
+    """Distinct FAQ questions (normalised); holdout=True returns the evaluation split instead."""
+    seen = {}
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                q = (row.get("question") or "").strip()
+                if q and norm(q) not in seen and is_holdout(q) == holdout:
+                    seen[norm(q)] = q
+    except OSError:
+        pass
+    return list(seen.values())
+
+
+def training_examples() -> List[Tuple[str, str]]:
+    ex = []
+    for r in _read_jsonl(FEWSHOT_PATH):
+        ex.append((r["user"], json.loads(r["assistant"])["top_intent"]))
+    ex += [(r["user"], r["intent"]) for r in _read_jsonl(TRAIN_PATH)]
+    ex += [(q, "PUBLIC_QA") for q in csv_questions()]
+    return ex
+
+
+def eval_examples() -> List[Tuple[str, str]]:
+    """Held-out set: prompts/intent_eval.jsonl + the CSV holdout split (PUBLIC_QA)."""
+    ex = [(r["user"], r["intent"]) for r in _read_jsonl(EVAL_PATH)]
+    ex += [(q, "PUBLIC_QA") for q in csv_questions(holdout=True)]
+    return ex
+
+
+def training_sha1() -> str:
+    """Fingerprint of every training input; a saved model is only used if it matches."""
+    h = hashlib.sha1()
+    for path in (FEWSHOT_PATH, TRAIN_PATH, DEFAULT_CSV):
+        try:
+            h.update(file_sha1(path).encode())
+        except OSError:
+            h.update(b"-")
+    return h.hexdigest()
+
+
+def build(path: str = MODEL_PATH) -> int:
+    return LinearIntentModel.train(training_examples()).save(path, training_sha1())
+
+
+_DEFAULT: Optional[IntentFastPath] = None
+
+
+def default_classifier() -> IntentFastPath:
+    """Process-wide classifier: saved model if fresh (~20 ms), else trained in-process (~400 ms)."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        model = LinearIntentModel.load(MODEL_PATH, training_sha1())
+        _DEFAULT = IntentFastPath(model or LinearIntentModel.train(training_examples()))
+    return _DEFAULT
+
+
+def classify(text: str, threshold: Optional[float] = None) -> Dict[str, Any]:
+    return default_classifier().classify(text, threshold)
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["--build"]:
+        n = build()
+        print(f"Wrote {n} features -> {MODEL_PATH} ({os.path.getsize(MODEL_PATH) / 1024:.0f} KiB)")
+        sys.exit(0)
+    for q in sys.argv[1:] or ["login", "What is the assessment breakdown for KIT700?",
+                              "How do I reset my password?", "Where is my tutorial on Wednesday?"]:
+        print(q, "->", json.dumps(classify(q), ensure_ascii=False))
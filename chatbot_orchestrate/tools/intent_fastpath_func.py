@@ -0,0 +1,27 @@
+from ibm_watsonx_orchestrate.agent_builder.tools import tool, ToolPermission
+
+try:
+    from tools.intent_fastpath import default_classifier
+except ImportError:  # 以 tools/ 为包根导入时
+    from intent_fastpath import default_classifier
+
+# 模型在首次调用时加载（knowledgebase/intent_model.json.gz，约 20 ms），之后每条消息几十微秒
+
+@tool(
+  name="classify_intent_fast",
+  description=(
+    "Local rule + linear-model intent classifier; call it BEFORE the intent_test agent. "
+    "Input: {message: string}. "
+    "Output: {scores:{PUBLIC_QA,COURSE_OUTLINE,MY_PROFILE,MY_ENROLMENTS,MY_TIMETABLE,LOGIN}, "
+    "top_intent, explanation, confidence, needs_llm}. "
+    "If needs_llm is false, route by top_intent directly; otherwise ask intent_test."
+  ),
+  permission=ToolPermission.ADMIN
+)
+
+def classify_intent_fast(message: str, threshold: float = None) -> dict:
+    """
+    同 classifiers/intent_classifier.llm.yaml 的输出结构 {scores, top_intent, explanation}，
+    另带 confidence 和 needs_llm（置信度低于阈值，默认 0.85 / INTENT_FASTPATH_THRESHOLD）。
+    """
+    return default_classifier().classify(message or "", threshold)
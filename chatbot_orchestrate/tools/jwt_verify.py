@@ -0,0 +1,176 @@
+# tools/jwt_verify.py
+# Local verification of auth-service access tokens (HS256 JWT, see auth-service/server.js).
+#
+#   claims = verify(token)              # 签名 / iss / aud / exp 全部在本地校验，失败抛 TokenError
+#   whoami(token)                       # 与 GET /me 的 200 响应同结构：{"user": {id, username, roles}}
+#
+# - 密钥与 server.js 相同：JWT_SECRET（默认 dev-secret）；issuer / audience 与 signAccess() 一致
+# - 只接受 alg=HS256（拒绝 none 和其他算法），签名用 hmac.compare_digest 比较
+# - 校验通过的结果放进一个小 LRU：键是 (密钥摘要, token) 的 sha256（不在内存里留原文；
+#   换了密钥的查询不会命中用旧密钥校验过的条目），
+#   条目在 token 的 exp 到期后失效，所以重复的 whoami / profile 检查不再走网络也不再算 HMAC
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+ISSUER = "auth-service"
+AUDIENCE = "utas-coursemate"
+DEFAULT_SECRET = "dev-secret"
+CACHE_SIZE = 256
+LEEWAY = 0.0     # 秒；jsonwebtoken 默认 clockTolerance 也是 0
+
+
+class TokenError(Exception):
+    """The token is malformed, badly signed, expired, or for another issuer/audience."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _b64url_decode(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def _secret(secret: Optional[str]) -> bytes:
+    return (secret if secret is not None else os.getenv("JWT_SECRET") or DEFAULT_SECRET).encode("utf-8")
+
+
+def verify(token: str, secret: Optional[str] = None, now: Optional[float] = None,
+           issuer: str = ISSUER, audience: str = AUDIENCE, leeway: float = LEEWAY) -> Dict[str, Any]:
+    """
+    Claims of a valid token, checked like jwt.verify() in server.js: HS256 signature,
+    iss, aud (string or list), exp (required) and nbf when present. Raises TokenError.
+    """
+    try:
+        head_b64, body_b64, sig_b64 = (token or "").split(".")
+        header = json.loads(_b64url_decode(head_b64))
+        sig = _b64url_decode(sig_b64)
+    except (ValueError, TypeError) as e:    # binascii.Error / JSONDecodeError 都是 ValueError
+        raise TokenError("malformed token") from e
+    if not isinstance(header, dict) or header.get("alg") != "HS256":
+        raise TokenError("unsupported alg")
+    want = hmac.new(_secret(secret), f"{head_b64}.{body_b64}".encode("ascii"), hashlib.sha256).digest()
+    if not hmac.compare_digest(sig, want):
+        raise TokenError("invalid signature")
+    try:
+        claims = json.loads(_b64url_decode(body_b64))
+    except ValueError as e:
+        raise TokenError("malformed token") from e
+    if not isinstance(claims, dict):
+        raise TokenError("malformed token")
+    now = time.time() if now is None else now
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)):
+        raise TokenError("missing exp")
+    if now >= exp + leeway:
+        raise TokenError("token expired")
+    nbf = claims.get("nbf")
+    if isinstance(nbf, (int, float)) and now < nbf - leeway:
+        raise TokenError("token not active yet")
+    if claims.get("iss") != issuer:
+        raise TokenError("invalid issuer")
+    aud = claims.get("aud")
+    if not (aud == audience or (isinstance(aud, list) and audience in aud)):
+        raise TokenError("invalid audience")
+    return claims
+
+
+class TokenCache:
+    """Thread-safe LRU of verified claims keyed by sha256(sha256(secret) + token); an entry lives
+    until the token's exp."""
+
+    def __init__(self, max_items: int = CACHE_SIZE):
+        self.max_items = max(1, int(max_items))
+        self._items: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.expired = 0
+
+    @staticmethod
+    def key(token: str, secret: Optional[str] = None) -> str:
+        # 密钥先取定长摘要再拼接，(密钥, token) 的不同切分不会撞到同一个键
+        h = hashlib.sha256(hashlib.sha256(_secret(secret)).digest())
+        h.update((token or "").encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, token: str, now: Optional[float] = None, secret: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        k = self.key(token, secret)
+        now = time.time() if now is None else now
+        with self._lock:
+            hit = self._items.get(k)
+            if hit is not None:
+                if now < hit[0]:
+                    self._items.move_to_end(k)
+                    self.hits += 1
+                    return hit[1]
+                del self._items[k]
+                self.expired += 1
+            self.misses += 1
+        return None
+
+    def put(self, token: str, claims: Dict[str, Any], secret: Optional[str] = None) -> None:
+        k = self.key(token, secret)
+        with self._lock:
+            self._items[k] = (float(claims["exp"]) + LEEWAY, claims)
+            self._items.move_to_end(k)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def verify(self, token: str, secret: Optional[str] = None, now: Optional[float] = None) -> Dict[str, Any]:
+        """verify() with the cache in front; only valid tokens are cached, per secret."""
+        claims = self.get(token, now, secret)
+        if claims is None:
+            claims = verify(token, secret, now)
+            self.put(token, claims, secret)
+        return claims
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"items": len(self._items), "hits": self.hits, "misses": self.misses, "expired": self.expired}
+
+
+_CACHE: Optional[TokenCache] = None
+_LOCK = threading.Lock()
+
+
+def token_cache() -> TokenCache:
+    """Process-wide cache; size from JWT_CACHE_SIZE (default 256)."""
+    global _CACHE
+    if _CACHE is None:
+        with _LOCK:
+            if _CACHE is None:
+                _CACHE = TokenCache(int(os.getenv("JWT_CACHE_SIZE", str(CACHE_SIZE))))
+    return _CACHE
+
+
+def whoami(access_token: str) -> Dict[str, Any]:
+    """
+    The body GET /me would return, computed locally: {"user": {id, username, roles}},
+    or {"error": "missing token" | "invalid token", "reason": ...} where /me answers 401.
+    """
+    token = (access_token or "").strip()
+    if token.lower().startswith("bearer "):
+        token = token[7:].strip()
+    if not token:
+        return {"error": "missing token"}
+    try:
+        claims = token_cache().verify(token)
+    except TokenError as e:
+        return {"error": "invalid token", "reason": e.reason}
+    return {"user": {"id": claims.get("sub"), "username": claims.get("username"), "roles": claims.get("roles")}}
+
+
+if __name__ == "__main__":
+    import sys
+    print(json.dumps(whoami(sys.argv[1] if len(sys.argv) > 1 else ""), indent=2))
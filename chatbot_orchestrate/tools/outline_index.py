@@ -0,0 +1,379 @@
+# tools/outline_index.py
+# Local unit-outline passage index, sharded by unit code (used by djv3 before it calls Discovery).
+#
+#   shards[unit] -> 该单元的全部段落，内部再按 学期 / section / subsection 分组
+#   - 每个分片单独做 BM25（idf 只在分片内统计），查询只遍历命中分片的倒排表
+#   - 学期只在分片里有该学期的段落时才作为过滤条件（与 Discovery 把学期放进 NL 查询的效果接近）
+#   - 查询里出现的 section 标题词给对应段落加分
+#
+# 数据来源：Discovery 导出的 JSONL（每行一个文档：unit/semester/section/subsection/text 或
+# document_passages），或原始 outline 文本（按 outlinetool 的标题切分）。构建产物是
+# knowledgebase/outline_index.jsonl.gz：
+#   line 1 : {"version", "rows", "units"}
+#   line 2+: {"document_id", "unit", "semester", "section", "subsection", "text"}
+#
+# Usage (from chatbot_orchestrate/):
+#     python tools/outline_index.py --export discovery_export.jsonl [--out PATH]
+#     python tools/outline_index.py --outlines DIR_OR_FILES... [--semester 1]
+#     python tools/outline_index.py --query "KIT700 assessment semester 1"
+
+import gzip
+import json
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from tools.faq_index import KB_DIR, tokenize
+    from tools.unit_patterns import SEM_RE, UNIT_RE, find_unit_semester
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import KB_DIR, tokenize
+    from unit_patterns import SEM_RE, UNIT_RE, find_unit_semester
+
+DEFAULT_ARTIFACT = os.path.join(KB_DIR, "outline_index.jsonl.gz")
+INDEX_VERSION = 1
+FIELDS = ("document_id", "unit", "semester", "section", "subsection", "text")
+
+K1, B = 1.2, 0.75
+TITLE_WEIGHT = 2        # section/subsection 标题词按正文词频的 2 倍计
+SECTION_BOOST = 0.5     # 查询包含整段标题时，加到归一化分数上
+
+_SENT_SPLIT_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
+_SUBSECTION_RE = re.compile(r"(?mi)^[ \t]*((?:Assessment\s*)?Task\s*\d+\s*:[^\n]{0,80})$")
+# 只用来定位单元/学期的词，不参与相关度（否则 "kit700" 会命中分片里的每一段）
+_QUERY_NOISE = frozenset(("semester", "sem", "s", "1", "2", "unit", "outline"))
+
+
+def semester_key(semester: Any) -> str:
+    """"Semester 1" / "sem 2" / "1" -> "1" / "2"; anything else lower-cased ("" if empty)."""
+    s = str(semester or "").strip()
+    if s in ("1", "2"):
+        return s
+    m = SEM_RE.search(s)
+    return m.group(1) if m else s.lower()
+
+
+def passage_from_result(res: Dict[str, Any]) -> Dict[str, str]:
+    """Normalise one Discovery result / export line into the index row shape."""
+    text = res.get("text")
+    if isinstance(text, list):     # Discovery 的 text 字段常是列表
+        text = "\n".join(str(t) for t in text)
+    if not text:
+        text = "\n".join(p.get("passage_text", "") for p in res.get("document_passages") or []
+                         if p.get("passage_text"))
+    row = {k: str(res.get(k) or "").strip() for k in FIELDS if k != "text"}
+    row["unit"] = row["unit"].upper()
+    row["text"] = (text or "").strip()
+    return row
+
+
+def passages_from_outline(text: str, unit: str = "", semester: str = "",
+                          document_id: str = "") -> List[Dict[str, str]]:
+    """
+    Split one raw outline text into section passages (headings as in tools/outlinetool);
+    "Assessment Task n: ..." lines inside a section open subsections. The unit code and
+    semester default to the first ones mentioned in the text.
+    """
+    try:
+        from tools.outlinetool import OutlineDocument, SECTION_TITLES
+    except ImportError:
+        from outlinetool import OutlineDocument, SECTION_TITLES
+    doc = OutlineDocument.get(text)
+    u, s = find_unit_semester(text[:2000])
+    unit = (unit or u or "").upper()
+    semester = semester or (f"Semester {s}" if s else "")
+    titles = {t.lower(): t for t in SECTION_TITLES}
+    out: List[Dict[str, str]] = []
+    for key, (start, end) in sorted(doc.sections.items(), key=lambda kv: kv[1][0]):
+        chunk = doc.text[start:end]
+        subs = list(_SUBSECTION_RE.finditer(chunk))
+        parts = [("", chunk[:subs[0].start()] if subs else chunk)]
+        for i, m in enumerate(subs):
+            parts.append((m.group(1).strip(), chunk[m.start():subs[i + 1].start() if i + 1 < len(subs) else len(chunk)]))
+        for sub, body in parts:
+            body = body.strip()
+            if body:
+                out.append({"document_id": f"{document_id or unit}#{len(out)}", "unit": unit,
+                            "semester": semester, "section": titles.get(key, key), "subsection": sub,
+                            "text": body})
+    return out
+
+
+class _Shard:
+    """BM25 postings over one unit's passages, grouped by semester and section."""
+
+    __slots__ = ("rows", "postings", "lengths", "avgdl", "idf", "by_semester", "titles")
+
+    def __init__(self):
+        self.rows: List[int] = []                               # 分片内下标 -> 全局段落号
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)   # term -> [(local, tf)]
+        self.lengths: List[int] = []
+        self.avgdl = 1.0
+        self.idf: Dict[str, float] = {}
+        self.by_semester: Dict[str, List[int]] = defaultdict(list)
+        self.titles: List[frozenset] = []                       # 每段 section+subsection 的词集
+
+    def add(self, pid: int, row: Dict[str, str]) -> None:
+        local = len(self.rows)
+        self.rows.append(pid)
+        title = tokenize(f'{row["section"]} {row["subsection"]}')
+        tf: Dict[str, int] = defaultdict(int)
+        for t in tokenize(row["text"]):
+            tf[t] += 1
+        for t in title:
+            tf[t] += TITLE_WEIGHT
+        for t, n in tf.items():
+            self.postings[t].append((local, n))
+        self.lengths.append(sum(tf.values()))
+        self.by_semester[semester_key(row["semester"])].append(local)
+        self.titles.append(frozenset(title))
+
+    def finalize(self) -> None:
+        n = len(self.rows)
+        self.avgdl = (sum(self.lengths) / n) if n else 1.0
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def score(self, terms: List[str], allowed: Optional[set]) -> Dict[int, float]:
+        out: Dict[int, float] = defaultdict(float)
+        for t in set(terms):
+            w = self.idf.get(t)
+            if w is None:
+                continue
+            for local, tf in self.postings[t]:
+                if allowed is not None and local not in allowed:
+                    continue
+                norm = K1 * (1 - B + B * self.lengths[local] / self.avgdl)
+                out[local] += w * tf * (K1 + 1) / (tf + norm)
+        return out
+
+
+class OutlineIndex:
+    """Outline passages sharded by unit code; search() only touches the shard of the requested unit."""
+
+    def __init__(self):
+        self.passages: List[Dict[str, str]] = []
+        self.shards: Dict[str, _Shard] = {}
+
+    @classmethod
+    def from_passages(cls, passages: Iterable[Dict[str, Any]]) -> "OutlineIndex":
+        idx = cls()
+        for p in passages:
+            row = passage_from_result(p)
+            if not row["unit"] or not row["text"]:
+                continue
+            pid = len(idx.passages)
+            idx.passages.append(row)
+            shard = idx.shards.get(row["unit"])
+            if shard is None:
+                shard = idx.shards[row["unit"]] = _Shard()
+            shard.add(pid, row)
+        for shard in idx.shards.values():
+            shard.finalize()
+        return idx
+
+    @classmethod
+    def from_export(cls, path: str) -> "OutlineIndex":
+        """Discovery export: JSON lines of query results / documents (plain or .gz)."""
+        return cls.from_passages(_read_jsonl(path))
+
+    @classmethod
+    def from_artifact(cls, path: str = DEFAULT_ARTIFACT) -> "OutlineIndex":
+        lines = _read_jsonl(path)
+        head = next(lines, {})
+        if head.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path}: unsupported outline index version {head.get('version')!r}")
+        return cls.from_passages(lines)
+
+    @classmethod
+    def from_outline_texts(cls, paths: Iterable[str], semester: str = "") -> "OutlineIndex":
+        """Raw outline .txt files (or directories of them); the unit code may also come from the file name."""
+        rows: List[Dict[str, str]] = []
+        for path in _expand(paths):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                text = f.read()
+            name = os.path.basename(path)
+            m = UNIT_RE.search(name)
+            rows.extend(passages_from_outline(text, m.group(1) if m else "",
+                                              semester or semester_from_name(name), name))
+        return cls.from_passages(rows)
+
+    def write(self, path: str = DEFAULT_ARTIFACT) -> int:
+        """Write the passages as the artifact (temp file + os.replace); returns the row count."""
+        tmp = f"{path}.tmp.{os.getpid()}"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(json.dumps({"version": INDEX_VERSION, "rows": len(self.passages),
+                                "units": len(self.shards)}) + "\n")
+            for row in self.passages:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+        return len(self.passages)
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def __contains__(self, unit: str) -> bool:
+        return (unit or "").upper() in self.shards
+
+    def units(self) -> List[str]:
+        return sorted(self.shards)
+
+    def semesters(self, unit: str) -> List[str]:
+        shard = self.shards.get((unit or "").upper())
+        return sorted(shard.by_semester) if shard else []
+
+    def search(self, query: str, unit: str, semester: str = "", top_k: int = 2) -> List[Dict[str, Any]]:
+        """
+        Ranked passages of one unit: [{document_id, unit, semester, section, subsection, text, score}].
+        The semester narrows the shard when the shard has passages for it. A query with no
+        matching terms (e.g. just "KIT700 semester 1") returns the passages in outline order.
+        [] when the unit has no shard.
+        """
+        shard = self.shards.get((unit or "").upper())
+        if shard is None:
+            return []
+        allowed = None
+        sem = semester_key(semester)
+        if sem and shard.by_semester.get(sem):
+            allowed = set(shard.by_semester[sem])
+        unit_tok = (unit or "").lower()
+        terms = [t for t in tokenize(query) if t != unit_tok and t not in _QUERY_NOISE]
+        scored = shard.score(terms, allowed)
+        if scored:
+            top = max(scored.values())
+            qset = set(terms)
+            for local in scored:
+                scored[local] /= top
+                title = shard.titles[local]
+                if title and title <= qset:
+                    scored[local] += SECTION_BOOST
+            ranked = sorted(scored.items(), key=lambda kv: (-kv[1], kv[0]))
+        else:
+            locals_ = sorted(allowed) if allowed is not None else range(len(shard.rows))
+            ranked = [(local, 0.0) for local in locals_]
+        k = max(1, int(top_k or 2))
+        return [{**self.passages[shard.rows[local]], "score": round(sc, 4)} for local, sc in ranked[:k]]
+
+
+def best_window(text: str, query: str, limit: int = 400) -> str:
+    """The limit-character stretch of text starting at the sentence with the most query terms."""
+    text = (text or "").strip()
+    if len(text) <= limit:
+        return text
+    terms = set(tokenize(query))
+    best, best_hits, pos = 0, 0, 0
+    for part in _SENT_SPLIT_RE.split(text):
+        start = text.find(part, pos)
+        if start < 0:
+            continue
+        pos = start + len(part)
+        hits = len(terms.intersection(tokenize(part)))
+        if hits > best_hits:
+            best, best_hits = start, hits
+    return text[best:]
+
+
+def _read_jsonl(path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _expand(paths: Iterable[str]) -> List[str]:
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(os.path.join(p, n) for n in sorted(os.listdir(p)) if n.lower().endswith(".txt"))
+        else:
+            out.append(p)
+    return out
+
+
+def semester_from_name(name: str) -> str:
+    m = SEM_RE.search(name.replace("_", " ").replace("-", " "))
+    return f"Semester {m.group(1)}" if m else ""
+
+
+_DEFAULT: Optional[OutlineIndex] = None
+_DEFAULT_KEY: Optional[tuple] = None
+_LOCK = threading.Lock()
+
+
+def default_index() -> Optional[OutlineIndex]:
+    """
+    Index from OUTLINE_INDEX (default knowledgebase/outline_index.jsonl.gz), reloaded when the file
+    changes; None when there is no artifact or OUTLINE_LOCAL=0, so callers go to Discovery as before.
+    """
+    global _DEFAULT, _DEFAULT_KEY
+    if os.getenv("OUTLINE_LOCAL", "1") == "0":
+        return None
+    path = os.getenv("OUTLINE_INDEX") or DEFAULT_ARTIFACT
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key != _DEFAULT_KEY:
+        with _LOCK:
+            if key != _DEFAULT_KEY:
+                try:
+                    _DEFAULT = OutlineIndex.from_artifact(path)
+                except (OSError, EOFError, ValueError):
+                    _DEFAULT = None
+                _DEFAULT_KEY = key
+    return _DEFAULT
+
+
+def lookup(query: str, unit: str = "", semester: str = "",
+           top_k: int = 2) -> Tuple[Optional[str], Optional[str], Optional[List[Dict[str, Any]]]]:
+    """
+    (unit, semester, passages) for a djv3-style request: unit/semester fall back to the ones found
+    in the query. passages is None when the query does not resolve to a unit that the local index
+    covers, or names a semester the unit's shard has no outline for — the caller should ask
+    Discovery then. The query is normalised first (typos, fused
+    words, "kit 700" / "sem one" -> KIT700 / semester 1; see tools/query_normalizer.py).
+    """
+    # 归一化器会拉上整条 faq_index 依赖链，首次查询时才导入（与 passages_from_outline 同理）
+    try:
+        from tools.query_normalizer import normalize
+    except ImportError:
+        from query_normalizer import normalize
+    query = normalize(query)
+    if not unit or not semester:
+        u2, s2 = find_unit_semester(query)
+        unit = unit or u2 or ""
+        semester = semester or s2 or ""
+    unit = unit.upper()
+    idx = default_index()
+    if not unit or idx is None or unit not in idx:
+        return unit or None, semester or None, None
+    if semester and semester_key(semester) not in idx.semesters(unit):
+        return unit, semester, None   # 不能拿另一个学期的大纲来答
+    return unit, semester or None, idx.search(query, unit, semester, top_k)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--export", help="Discovery export JSONL (.gz ok)")
+    src.add_argument("--outlines", nargs="+", help="raw outline .txt files or directories")
+    ap.add_argument("--semester", default="", help="semester for --outlines files that do not name one")
+    ap.add_argument("--out", default=DEFAULT_ARTIFACT)
+    ap.add_argument("--query", help="search the built (or existing) index")
+    args = ap.parse_args()
+
+    if args.export or args.outlines:
+        idx = (OutlineIndex.from_export(args.export) if args.export
+               else OutlineIndex.from_outline_texts(args.outlines, args.semester))
+        n = idx.write(args.out)
+        print(f"wrote {n} passages in {len(idx.shards)} unit shards -> {args.out}")
+    if args.query:
+        os.environ["OUTLINE_INDEX"] = args.out
+        print(json.dumps(lookup(args.query, top_k=3), ensure_ascii=False, indent=2))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion of unit-outline text files into pre-extracted, queryable outlines.
+
+Every *.txt under the input directory (one outline per file, hundreds of units
+across semesters) is parsed once with outlinetool's OutlineDocument: all
+sections it finds (summary + bullets, the extract_section shape) and the
+assessment items (the extract_assessment_items shape). Files are spread over a
+ProcessPoolExecutor in chunks of --chunk paths, so each task amortises the
+pickling/IPC overhead over several files; --workers 1 parses in-process.
+
+Output, chosen by the --out extension:
+  .jsonl / .jsonl.gz : one record per file
+                       {file, sha1, bytes, unit, semester, sections: [...], assessment_items: [...]}
+  .sqlite / .db      : tables outlines, sections, assessment_items (indexed by unit, semester)
+--index also writes the unit-sharded passage index djv3 reads (tools/outline_index.py).
+
+The outline agent can then read OutlineStore(path).section(unit, semester, target)
+instead of regex-parsing outline text at request time.
+
+Usage (from chatbot_orchestrate/):
+    python tools/outline_ingest.py DIR --out knowledgebase/outlines.sqlite [--workers N] [--chunk N]
+                                       [--index knowledgebase/outline_index.jsonl.gz]
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from tools.faq_index import KB_DIR
+    from tools.outline_index import (OutlineIndex, passages_from_outline, semester_from_name,
+                                     semester_key)
+    from tools.unit_patterns import UNIT_RE, find_unit_semester
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import KB_DIR
+    from outline_index import OutlineIndex, passages_from_outline, semester_from_name, semester_key
+    from unit_patterns import UNIT_RE, find_unit_semester
+
+DEFAULT_OUT = os.path.join(KB_DIR, "outlines.sqlite")
+TASKS_PER_WORKER = 4      # 自动分块：每个进程约分到 4 块，兼顾负载均衡与 IPC 次数
+
+_SCHEMA = """
+CREATE TABLE outlines (id INTEGER PRIMARY KEY, file TEXT UNIQUE, sha1 TEXT, bytes INTEGER,
+                       unit TEXT, semester TEXT, sem_key TEXT);
+CREATE TABLE sections (outline_id INTEGER, section TEXT, summary TEXT, bullets TEXT);
+CREATE TABLE assessment_items (outline_id INTEGER, name TEXT, weight TEXT);
+CREATE INDEX outlines_unit ON outlines (unit, sem_key);
+CREATE INDEX sections_outline ON sections (outline_id);
+CREATE INDEX items_outline ON assessment_items (outline_id);
+"""
+
+
+def parse_text(text: str, name: str = "", with_passages: bool = False) -> Dict[str, Any]:
+    """One outline text -> record; unit/semester come from the file name, else the top of the text."""
+    try:
+        from tools.outlinetool import OutlineDocument
+    except ImportError:
+        from outlinetool import OutlineDocument
+    doc = OutlineDocument.get(text)
+    m = UNIT_RE.search(name)
+    u, s = find_unit_semester(text[:2000])
+    unit = (m.group(1) if m else u or "").upper()
+    semester = semester_from_name(name) or (f"Semester {s}" if s else "")
+    # 按在文中出现的顺序；与 extract_section(text, title) 的返回结构一致
+    sections = [doc.extract_section(key) for key, _ in sorted(doc.sections.items(), key=lambda kv: kv[1][0])]
+    rec = {"file": name, "sha1": hashlib.sha1(text.encode("utf-8")).hexdigest(), "bytes": len(text.encode("utf-8")),
+           "unit": unit, "semester": semester, "sections": sections,
+           "assessment_items": doc.assessment_items()["items"]}
+    if with_passages:
+        rec["passages"] = passages_from_outline(text, unit, semester, name)
+    return rec
+
+
+def parse_file(path: str, root: str = "", with_passages: bool = False) -> Dict[str, Any]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    return parse_text(text, os.path.relpath(path, root) if root else os.path.basename(path), with_passages)
+
+
+def _parse_chunk(args: Tuple[List[str], str, bool]) -> List[Dict[str, Any]]:
+    """Worker task: parse a chunk of files; a file that fails yields {file, error} instead of killing the chunk."""
+    paths, root, with_passages = args
+    out = []
+    for p in paths:
+        try:
+            out.append(parse_file(p, root, with_passages))
+        except (OSError, ValueError) as e:
+            out.append({"file": os.path.relpath(p, root) if root else p, "error": str(e)})
+    return out
+
+
+def find_outlines(root: str) -> List[str]:
+    """All *.txt files under root (recursive), sorted so output order is stable."""
+    out = []
+    for d, _, files in os.walk(root):
+        out.extend(os.path.join(d, f) for f in files if f.lower().endswith(".txt"))
+    return sorted(out)
+
+
+def parse_all(paths: List[str], root: str = "", workers: int = 0, chunk: int = 0,
+              with_passages: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Records for paths in input order. workers=0 -> os.cpu_count(); chunk=0 -> about
+    TASKS_PER_WORKER chunks per worker. With one worker (or one chunk) no pool is started.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk = chunk or max(1, -(-len(paths) // (workers * TASKS_PER_WORKER)))
+    chunks = [(paths[i:i + chunk], root, with_passages) for i in range(0, len(paths), chunk)]
+    if workers == 1 or len(chunks) <= 1:
+        for c in chunks:
+            yield from _parse_chunk(c)
+        return
+    from concurrent.futures import ProcessPoolExecutor   # 只有批量入库用到，不在导入时加载
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as ex:
+        for recs in ex.map(_parse_chunk, chunks):
+            yield from recs
+
+
+def write_jsonl(records: Iterable[Dict[str, Any]], path: str) -> int:
+    tmp = f"{path}.tmp.{os.getpid()}"
+    opener = gzip.open if path.endswith(".gz") else open
+    n = 0
+    with opener(tmp, "wt", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            n += 1
+    os.replace(tmp, path)
+    return n
+
+
+def write_sqlite(records: Iterable[Dict[str, Any]], path: str) -> int:
+    import sqlite3   # 只有写 SQLite 时才需要
+
+    tmp = f"{path}.tmp.{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    n = 0
+    try:
+        db.executescript(_SCHEMA)
+        with db:
+            for rec in records:
+                cur = db.execute("INSERT INTO outlines (file, sha1, bytes, unit, semester, sem_key) VALUES (?,?,?,?,?,?)",
+                                 (rec["file"], rec["sha1"], rec["bytes"], rec["unit"], rec["semester"],
+                                  semester_key(rec["semester"])))
+                oid = cur.lastrowid
+                db.executemany("INSERT INTO sections VALUES (?,?,?,?)",
+                               [(oid, s["section"], s["summary"], json.dumps(s["bullets"], ensure_ascii=False))
+                                for s in rec["sections"]])
+                db.executemany("INSERT INTO assessment_items VALUES (?,?,?)",
+                               [(oid, it["name"], it["weight"]) for it in rec["assessment_items"]])
+                n += 1
+    finally:
+        db.close()
+    os.replace(tmp, path)
+    return n
+
+
+def ingest(root: str, out_path: str = DEFAULT_OUT, workers: int = 0, chunk: int = 0,
+           index_path: str = "") -> Dict[str, Any]:
+    """Parse every outline under root and write out_path (and the passage index); returns a report."""
+    paths = find_outlines(root)
+    t0 = time.perf_counter()
+    errors: List[Dict[str, Any]] = []
+    passages: List[Dict[str, str]] = []
+    stats = {"files": 0, "bytes": 0}
+
+    def records():
+        for rec in parse_all(paths, root, workers, chunk, with_passages=bool(index_path)):
+            if "error" in rec or not rec["unit"]:
+                errors.append({"file": rec["file"], "error": rec.get("error") or "no unit code in file name or text"})
+                continue
+            passages.extend(rec.pop("passages", ()))
+            stats["files"] += 1
+            stats["bytes"] += rec["bytes"]
+            yield rec
+
+    writer = write_sqlite if out_path.endswith((".sqlite", ".db")) else write_jsonl
+    writer(records(), out_path)
+    if index_path:
+        OutlineIndex.from_passages(passages).write(index_path)
+    secs = time.perf_counter() - t0
+    return {"files": stats["files"], "errors": errors, "mb": round(stats["bytes"] / 1e6, 2),
+            "seconds": round(secs, 3), "files_per_s": round(stats["files"] / secs, 1) if secs else None,
+            "workers": workers or os.cpu_count() or 1, "out": out_path}
+
+
+class OutlineStore:
+    """Read side of the ingest output (SQLite or JSONL), keyed by (unit, semester)."""
+
+    def __init__(self, path: str = DEFAULT_OUT):
+        self.path = path
+        self._db = None
+        self._records: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        if path.endswith((".sqlite", ".db")):
+            import sqlite3
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    rec = json.loads(line)
+                    self._records.setdefault((rec["unit"], semester_key(rec["semester"])), rec)
+
+    def units(self) -> List[str]:
+        if self._db is not None:
+            return [r[0] for r in self._db.execute("SELECT DISTINCT unit FROM outlines ORDER BY unit")]
+        return sorted({u for u, _ in self._records})
+
+    def _find(self, unit: str, semester: str = "") -> Optional[Any]:
+        """Outline id (SQLite) or record (JSONL); any semester of the unit when semester is empty."""
+        unit, sem = (unit or "").upper(), semester_key(semester)
+        if self._db is not None:
+            sql, args = "SELECT id FROM outlines WHERE unit = ?", [unit]
+            if sem:
+                sql, args = sql + " AND sem_key = ?", args + [sem]
+            row = self._db.execute(sql + " ORDER BY sem_key, id LIMIT 1", args).fetchone()
+            return row[0] if row else None
+        if sem:
+            return self._records.get((unit, sem))
+        return next((r for (u, _), r in sorted(self._records.items()) if u == unit), None)
+
+    def section(self, unit: str, semester: str, target: str) -> Optional[Dict[str, Any]]:
+        """{section, summary, bullets} like outlinetool.extract_section; None if the unit/section is unknown."""
+        found = self._find(unit, semester)
+        if found is None:
+            return None
+        if self._db is not None:
+            secs = [{"section": s, "summary": m, "bullets": json.loads(b)} for s, m, b in
+                    self._db.execute("SELECT section, summary, bullets FROM sections WHERE outline_id = ?", (found,))]
+        else:
+            secs = found["sections"]
+        t = (target or "").lower().strip()
+        # 与 outlinetool._resolve_title 相同：先精确匹配，再子串匹配
+        hit = next((s for s in secs if s["section"].lower() == t), None) or \
+            next((s for s in secs if t and t in s["section"].lower()), None)
+        return {"section": hit["section"], "summary": hit["summary"], "bullets": list(hit["bullets"])} if hit else None
+
+    def assessment_items(self, unit: str, semester: str = "") -> Optional[Dict[str, Any]]:
+        """{items, note} like outlinetool.extract_assessment_items; None if the unit is unknown."""
+        try:
+            from tools.outlinetool import _ITEMS_NOTE
+        except ImportError:
+            from outlinetool import _ITEMS_NOTE
+        found = self._find(unit, semester)
+        if found is None:
+            return None
+        if self._db is not None:
+            items = [{"name": n, "weight": w} for n, w in self._db.execute(
+                "SELECT name, weight FROM assessment_items WHERE outline_id = ? ORDER BY rowid", (found,))]
+        else:
+            items = [dict(it) for it in found["assessment_items"]]
+        return {"items": items, "note": _ITEMS_NOTE}
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("root", help="directory of unit-outline .txt files")
+    ap.add_argument("--out", default=DEFAULT_OUT, help=".sqlite/.db or .jsonl[.gz]")
+    ap.add_argument("--workers", type=int, default=0, help="processes (default: all cores)")
+    ap.add_argument("--chunk", type=int, default=0, help="files per task (default: auto)")
+    ap.add_argument("--index", default="", help="also write the outline passage index here")
+    args = ap.parse_args()
+    print(json.dumps(ingest(args.root, args.out, args.workers, args.chunk, args.index), indent=2))
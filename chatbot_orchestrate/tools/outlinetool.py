@@ -1,37 +1,118 @@
 # outlinetool.py
 # Minimal ADK tool so Orchestrate can import and register these functions.
 
+import hashlib
 import re
-from typing import Dict, List
-from ibm_watsonx_orchestrate.agent_builder.tools import tool  # correct path for ADK 1.9
-
-SECTION_TITLES = [
-    "Contact Details",
-    "Unit Description",
-    "Intended Learning Outcomes",
-    "Requisites",
-    "Alterations as a Result of Student Feedback",
-    "Teaching Arrangements",
-    "Assessment Schedule",
-    "Assessment Details",
-    "How your final result is determined",
-    "Academic Progress Review",
-    "Submission of assignments",
-    "Academic integrity",
-    "Requests for extensions",
-    "Late penalties",
-    "Review of results and appeals",
-    "Required Resources",
-    "Recommended Reading Materials",
-    "Required reading materials",
-    "Recommended reading materials",
-    "Other required resources",
-]
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+try:
+    from tools.instrumentation import instrumented_tool   # @tool + 耗时/结果数指标，注册的 schema 不变
+    from tools.unit_patterns import SECTION_TITLES
+except ImportError:  # 以 tools/ 为包根导入时
+    from instrumentation import instrumented_tool
+    from unit_patterns import SECTION_TITLES
+
+_WS_RE = re.compile(r"\s+")
+_HEADING_RE = re.compile(r"(?mi)^(%s)\s*$" % "|".join([re.escape(t) for t in SECTION_TITLES]))
+_BULLET_SPLIT_RE = re.compile(r"(?<=[\.;])\s+|\n+")
+_CHOICES = {t.lower(): t for t in SECTION_TITLES}
+_ITEM_KEYWORDS = (
+    r"e[- ]?portfolio", r"literature review", r"qualitative methods",
+    r"quantitative methods", r"online test", r"quiz", r"project\s*\d+",
+    r"weekly tutorial tasks?"
+)
+# 一次扫描：每个位置用前瞻尝试 单元代码行首 / "Assessment Task n: Name" / 关键词 / 百分比
+_SCAN_RE = re.compile(
+    r"(?=(?P<unit>^[ \t]*(?-i:(?P<ucode>[A-Z]{3}\d{3}))\b)"
+    r"|(?P<task>\b(?:Assessment\s*Task|Task)\s*\d+\s*:\s*(?P<tname>[^\n%]{3,80}))"
+    + "".join(r"|(?P<kw%d>%s)" % (i, kw) for i, kw in enumerate(_ITEM_KEYWORDS)) +
+    r"|(?P<pct>(?<!\d)(?P<pval>\d{1,3})\s*%))",
+    re.I | re.M,
+)
+_ITEMS_NOTE = "If items or weights are missing, context may be incomplete."
+_DOC_CACHE_SIZE = 32
 
 def _normalize(s: str) -> str:
-    return re.sub(r"\s+", " ", s or "").strip()
+    return _WS_RE.sub(" ", s or "").strip()
+
+def _resolve_title(target: str) -> str:
+    tnorm = (target or "").lower().strip()
+    if tnorm not in _CHOICES:
+        for k in _CHOICES:
+            if tnorm in k:
+                tnorm = k
+                break
+    return _CHOICES.get(tnorm, target)
+
+class OutlineDocument:
+    """
+    One parsed outline text: heading offsets found in a single scan, then any
+    number of section lookups in O(section length). Per-section results are
+    memoised on the object; use OutlineDocument.get(text) to share parses.
+    """
+
+    _cache: "OrderedDict[str, OutlineDocument]" = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, text: str):
+        self.text = text or ""
+        # 小写标题 -> (start, end)；同名标题以第一次出现为准（与旧逻辑一致）
+        self.sections: Dict[str, Tuple[int, int]] = {}
+        bounds = list(_HEADING_RE.finditer(self.text))
+        for i, m in enumerate(bounds):
+            key = m.group(1).lower()
+            if key not in self.sections:
+                end = bounds[i + 1].start() if i + 1 < len(bounds) else len(self.text)
+                self.sections[key] = (m.end(), end)
+        self._results: Dict[str, Dict] = {}
+
+    @classmethod
+    def get(cls, text: str) -> "OutlineDocument":
+        """Parsed document for text, memoised by content hash (small LRU)."""
+        key = hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+        with cls._lock:
+            doc = cls._cache.get(key)
+            if doc is not None:
+                cls._cache.move_to_end(key)
+                return doc
+        doc = cls(text)
+        with cls._lock:
+            cls._cache[key] = doc
+            while len(cls._cache) > _DOC_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return doc
+
+    def chunk(self, sec_name: str) -> str:
+        """Text under the heading, or the whole text if the heading is absent."""
+        span = self.sections.get(sec_name.lower())
+        return self.text[span[0]:span[1]] if span else self.text
+
+    def extract_section(self, target: str) -> Dict:
+        sec_name = _resolve_title(target)
+        res = self._results.get(sec_name.lower())
+        if res is None:
+            chunk = self.chunk(sec_name)
+            body = _normalize(chunk)[:800]
+            bullets: List[str] = []
+            for p in _BULLET_SPLIT_RE.split(chunk):
+                p = _normalize(p)
+                if 6 <= len(p) <= 200:
+                    bullets.append(p)
+                if len(bullets) >= 6:
+                    break
+            res = self._results[sec_name.lower()] = {"section": sec_name, "summary": body, "bullets": bullets}
+        return {"section": res["section"], "summary": res["summary"], "bullets": list(res["bullets"])}
 
-@tool(name="extract_section", description="Extract a target section summary and bullets from a UTAS unit outline text.")
+    def assessment_items(self) -> Dict:
+        items = self._results.get("\0assessment")
+        if items is None:
+            items = self._results["\0assessment"] = _scan_assessment_items(self.text)
+        return {"items": [dict(it) for it in items], "note": _ITEMS_NOTE}
+
+@instrumented_tool(name="extract_section", description="Extract a target section summary and bullets from a UTAS unit outline text.")
 def extract_section(text: str, target: str) -> Dict:
     """
     Args:
@@ -40,38 +121,9 @@ def extract_section(text: str, target: str) -> Dict:
     Returns:
       dict with section, summary, bullets (JSON-serializable)
     """
-    tnorm = target.lower().strip()
-    choices = {t.lower(): t for t in SECTION_TITLES}
-    if tnorm not in choices:
-        for k in choices:
-            if tnorm in k:
-                tnorm = k
-                break
-    sec_name = choices.get(tnorm, target)
-
-    # slice text between headings
-    pat = r"(?mi)^(%s)\s*$" % "|".join([re.escape(t) for t in SECTION_TITLES])
-    boundaries = [m for m in re.finditer(pat, text)]
-    chunk = text
-    for i, m in enumerate(boundaries):
-        if m.group(1).lower() == sec_name.lower():
-            start = m.end()
-            end = boundaries[i + 1].start() if i + 1 < len(boundaries) else len(text)
-            chunk = text[start:end]
-            break
-
-    body = _normalize(chunk)[:800]
-    bullets: List[str] = []
-    for p in re.split(r"(?<=[\.;])\s+|\n+", chunk):
-        p = _normalize(p)
-        if 6 <= len(p) <= 200:
-            bullets.append(p)
-        if len(bullets) >= 6:
-            break
-
-    return {"section": sec_name, "summary": body, "bullets": bullets}
-
-@tool(name="extract_assessment_items", description="Extract assessment items and weight percentages from outline text.")
+    return OutlineDocument.get(text).extract_section(target)
+
+@instrumented_tool(name="extract_assessment_items", description="Extract assessment items and weight percentages from outline text.")
 def extract_assessment_items(text: str) -> Dict:
     """
     Args:
@@ -79,39 +131,82 @@ def extract_assessment_items(text: str) -> Dict:
     Returns:
       dict with items [{name, weight}], and a note (JSON-serializable)
     """
-    items: Dict[str, Dict] = {}
-    # "Assessment Task n: Name"
-    for m in re.finditer(r"(?mi)\b(?:Assessment\s*Task|Task)\s*\d+\s*:\s*([^\n%]{3,80})", text):
-        name = _normalize(m.group(1))
-        if name:
-            items.setdefault(name, {"name": name, "weight": None})
-
-    # common keywords
-    name_keywords = [
-        r"e[- ]?portfolio", r"literature review", r"qualitative methods",
-        r"quantitative methods", r"online test", r"quiz", r"project\s*\d+",
-        r"weekly tutorial tasks?"
-    ]
-    for kw in name_keywords:
-        for m in re.finditer(kw, text, flags=re.I):
-            pretty = re.sub(r"\s+", " ", m.group(0)).strip().title()
-            items.setdefault(pretty, {"name": pretty, "weight": None})
-
-    # attach nearest percentages
-    percents = [(m.group(1), m.start()) for m in re.finditer(r"(?i)(\d{1,3})\s*%", text)]
-    for name in list(items):
-        pos = text.lower().find(name.lower())
-        if pos >= 0 and percents:
-            near = min(percents, key=lambda x: abs(x[1] - pos))
-            items[name]["weight"] = f"{near[0]}%"
-
-    # dedup by name
-    seen, dedup = set(), []
-    for it in items.values():
-        key = it["name"].lower()
+    return OutlineDocument.get(text).assessment_items()
+
+def extract_assessment_items_by_unit(text: str) -> Dict:
+    """
+    Multi-unit variant for long outline dumps / tables: a unit code at the start
+    of a line (e.g. "KIT700 ...") opens a new block, and weights are paired only
+    with items of the same block. Text before the first unit code goes under "".
+    Returns {"units": {unit_code: [{name, weight}]}, "note"}.
+    """
+    units: Dict[str, List[Dict]] = {}
+    seen: Dict[str, set] = {}  # unit -> 已收录的小写 name，避免每个候选都重建集合
+    for unit, items in _scan_assessment_items(text, split_units=True):
+        kept, names = units.setdefault(unit, []), seen.setdefault(unit, set())
+        for it in items:
+            name = it["name"].lower()
+            if name not in names:
+                names.add(name)
+                kept.append(it)
+    return {"units": units, "note": _ITEMS_NOTE}
+
+def _scan_assessment_items(text: str, split_units: bool = False):
+    """
+    Single left-to-right pass over text: task headers, keyword items and
+    percentages (and unit headers when split_units) are all found by one
+    zero-width scanner regex, so overlapping hits such as a keyword inside a
+    task name are still seen. Each item is paired with the nearest percentage
+    of its block via bisect over the (already sorted) percentage offsets.
+    Returns [{name, weight}] or, with split_units, [(unit, [{name, weight}])].
+    """
+    blocks = []
+    unit = ""
+    # 输出顺序与旧实现一致：先任务标题，再按关键词列表顺序；每类内按首次出现
+    found: List[Dict[str, int]] = [{} for _ in range(len(_ITEM_KEYWORDS) + 1)]   # name -> first offset
+    pct_pos: List[int] = []
+    pct_val: List[str] = []
+    for m in _SCAN_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "pct":
+            pct_pos.append(m.start())
+            pct_val.append(m.group("pval"))
+        elif kind == "task":
+            name = _normalize(m.group("tname"))
+            if name:
+                found[0].setdefault(name, m.start("tname"))
+        elif kind == "unit":
+            if split_units:
+                blocks.append((unit, _pair_weights(found, pct_pos, pct_val)))
+                unit = m.group("ucode").upper()
+                found = [{} for _ in found]
+                pct_pos, pct_val = [], []
+        else:  # kw<i>
+            pretty = _WS_RE.sub(" ", m.group(kind)).strip().title()
+            found[int(kind[2:]) + 1].setdefault(pretty, m.start())
+    blocks.append((unit, _pair_weights(found, pct_pos, pct_val)))
+    if not split_units:
+        return blocks[0][1]
+    return [(u, items) for u, items in blocks if items]
+
+def _pair_weights(found: List[Dict[str, int]], pct_pos: List[int], pct_val: List[str]) -> List[Dict]:
+    items: Dict[str, int] = {}
+    for group in found:
+        for name, pos in group.items():
+            items.setdefault(name, pos)
+    seen, out = set(), []
+    for name, pos in items.items():
+        # dedup by name
+        key = name.lower()
         if key in seen:
             continue
         seen.add(key)
-        dedup.append(it)
-
-    return {"items": dedup, "note": "If items or weights are missing, context may be incomplete."}
+        weight = None
+        if pct_pos:
+            i = bisect_left(pct_pos, pos)
+            # 距离相同取前一个（与旧实现 min() 的结果一致）
+            if i == len(pct_pos) or (i > 0 and pos - pct_pos[i - 1] <= pct_pos[i] - pos):
+                i -= 1
+            weight = f"{pct_val[i]}%"
+        out.append({"name": name, "weight": weight})
+    return out
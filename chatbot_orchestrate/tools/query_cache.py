@@ -0,0 +1,207 @@
+# tools/query_cache.py
+# TTL + LRU response cache with an optional SQLite tier and single-flight de-duplication.
+#
+# 用法：
+#   cache = QueryCache(max_items=1024, ttl=300, db_path="discovery_cache.sqlite")
+#   value = cache.get_or_compute(key, lambda: expensive_call())
+# 并发的相同 key 未命中只会触发一次 compute，其余调用等待同一结果。
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    from tools.deadline import DeadlineExceeded, expired, remaining
+    from tools.instrumentation import record_cache
+except ImportError:  # 以 tools/ 为包根导入时
+    from deadline import DeadlineExceeded, expired, remaining
+    from instrumentation import record_cache
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_query(q: str) -> str:
+    return _WS_RE.sub(" ", (q or "").replace("\u00A0", " ")).strip().lower()
+
+
+def make_key(query: str, collections: Optional[Iterable[str]] = None, filter: str = "",
+             count: Any = None, **extra: Any) -> str:
+    """Canonical cache key: normalised query + sorted collection ids + filter + count (+ extra fields)."""
+    return json.dumps({"q": normalize_query(query), "c": sorted(collections or []), "f": filter or "",
+                       "n": count, **extra}, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SqliteTier:
+    """On-disk tier that survives restarts; values are JSON, rows expire by wall-clock time."""
+
+    def __init__(self, path: str, max_rows: int = 50000):
+        self.path = path
+        self.max_rows = max_rows
+        import sqlite3   # 只有配置了磁盘层才需要
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, v TEXT NOT NULL, exp REAL NOT NULL)")
+        self._writes = 0
+
+    def get(self, key: str) -> Tuple[bool, Any, float]:
+        with self._lock:
+            row = self._db.execute("SELECT v, exp FROM cache WHERE k = ?", (key,)).fetchone()
+            if row is None:
+                return False, None, 0.0
+            if row[1] <= time.time():
+                self._db.execute("DELETE FROM cache WHERE k = ?", (key,))
+                return False, None, 0.0
+        return True, json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        v = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cache (k, v, exp) VALUES (?, ?, ?)", (key, v, expires_at))
+            self._writes += 1
+            if self._writes % 500 == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        self._db.execute("DELETE FROM cache WHERE exp <= ?", (time.time(),))
+        n = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if n > self.max_rows:
+            self._db.execute("DELETE FROM cache WHERE k IN (SELECT k FROM cache ORDER BY exp LIMIT ?)",
+                             (n - self.max_rows,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class QueryCache:
+    def __init__(self, max_items: int = 1024, ttl: float = 300.0, db_path: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_items = max(1, int(max_items))
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()   # key -> (expires_at, value)
+        self._flights: Dict[str, _Flight] = {}
+        self.disk = SqliteTier(db_path) if db_path else None
+        self.counters = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0,
+                         "expirations": 0, "coalesced": 0, "errors": 0}
+
+    def _count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            hit = self._get_mem(key)
+        if hit is not None:
+            return True, hit[0]
+        if self.disk is not None:
+            ok, value, exp_wall = self.disk.get(key)
+            if ok:
+                self._put_mem(key, value, exp_wall - time.time())
+                with self._lock:
+                    self._count("disk_hits")
+                return True, value
+        return False, None
+
+    def _get_mem(self, key: str) -> Optional[Tuple[Any]]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] <= self._clock():
+            del self._data[key]
+            self._count("expirations")
+            return None
+        self._data.move_to_end(key)
+        self._count("hits")
+        return (item[1],)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._put_mem(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, time.time() + ttl)
+
+    def _put_mem(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self._count("evictions")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Cached value for key, else compute() once even under concurrent identical misses.
+        Exceptions are propagated to every waiter and never cached, except a DeadlineExceeded of the
+        leader's own deadline: a waiter with time left then retries (and may become the leader)."""
+        while True:
+            ok, value = self.get(key)
+            if ok:
+                record_cache(True)
+                return value
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                    self._count("misses")
+                else:
+                    self._count("coalesced")
+            record_cache(not leader)   # 合并到在途请求的调用不打上游，算命中
+            if leader:
+                break
+            # 等在途请求也受调用方截止时间约束（tools/deadline.py；没设置时一直等）
+            if not flight.event.wait(remaining()):
+                raise DeadlineExceeded("deadline reached waiting for an identical in-flight request")
+            if flight.error is None:
+                return flight.value
+            # 领头者的截止时间比本调用方紧：它超时不代表上游出错，本调用方还有时间就自己再来一次
+            if not isinstance(flight.error, DeadlineExceeded) or expired():
+                raise flight.error
+        try:
+            flight.value = compute()
+            self.set(key, flight.value, ttl)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._count("errors")
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+        if key is None and self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self.counters, size=len(self._data), max_items=self.max_items, ttl=self.ttl,
+                       disk=bool(self.disk))
+        lookups = out["hits"] + out["disk_hits"] + out["misses"] + out["coalesced"]
+        out["hit_ratio"] = round((out["hits"] + out["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return out
@@ -0,0 +1,394 @@
+# tools/query_normalizer.py
+# Typo-tolerant query normalisation for the FAQ and outline lookups (precomputed SymSpell-style dictionary).
+#
+#   normalize("how do i enroll in kit 700 sem one, asignment extention")
+#   # -> "how do i enrol in KIT700 semester 1 assignment extension"
+#
+# - 词表：知识库 CSV 问题+答案的词频，加上大纲章节标题（unit_patterns.SECTION_TITLES）。
+#   CSV 本身也有粘连词（"anenrolmentconfirmation", "myfeesdue"），构建时把低频、以虚词开头、能拆成常见词的
+#   拆开计数，低频的相邻字母颠倒并进高频写法（clean_counts），免得查询被“纠正”成粘连词
+# - 拼写纠错：SymSpell 删除字典（每个词前 PREFIX_LEN 个字符最多删 MAX_EDIT 个字符的所有变体 -> 词）预先算好；
+#   查询词只生成自己的删除变体去查表，候选再用 Damerau（OSA）距离复核，取 (距离, -词频) 最小者。
+#   候选必须与查询词首字母相同：词表只是校园领域的几千个词，词表外的正常英文词
+#   （"rubric", "presentation"）不该被“纠正”成首字母不同的近邻（"public", "representation"）。
+#   每个词的结果缓存，重复出现的词是一次字典查找
+# - 每个词的处理顺序：词表里有 / 含数字 / 不超过 3 个字符 -> 原样；距离 1 的纠错；
+#   拆词（"ienrolas" -> "i enrol as"）；距离 2 的纠错（MIN_LEN_EDIT2 个字符以上）；都不行 -> 原样
+# - 单元代码："kit700" / "Kit-700" / "kit 700" -> "KIT700"（UNIT_RE 校验；带分隔符的写法只认已知前缀，
+#   免得 "pdf 229" 变成单元代码）；"sem one" / "s2" / "semester two" -> "semester 1/2"（SEM_RE）
+# - 预建产物 knowledgebase/query_vocab.json.gz（python tools/query_normalizer.py --build）；
+#   与 CSV / 章节标题的指纹不符时在进程内重建（约 0.2 s）
+# - QUERY_NORMALIZE=0 关闭：FAQ_AskUs_func / outline_index.lookup 直接用原查询
+
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from tools.faq_index import DEFAULT_CSV, KB_DIR, file_sha1
+    from tools.unit_patterns import SECTION_TITLES, SEM_RE, UNIT_RE
+except ImportError:  # 以 tools/ 为包根导入时
+    from faq_index import DEFAULT_CSV, KB_DIR, file_sha1
+    from unit_patterns import SECTION_TITLES, SEM_RE, UNIT_RE
+
+VOCAB_PATH = os.path.join(KB_DIR, "query_vocab.json.gz")
+VOCAB_VERSION = 1
+MAX_EDIT = 2
+PREFIX_LEN = 7
+MAX_WORD_LEN = 24       # 拆词时单个词的最大长度
+MAX_PARTS = 4
+MIN_LEN_EDIT2 = 8       # 距离 2 的纠错只给这么长的词；短词差两个字符往往是另一个词（"moodle" / "mobile"）
+MIN_PART_FREQ = 5       # 查询里拆词时每段在语料里至少出现这么多次
+MIN_TARGET_FREQ = 2     # 只出现过一次的词不作纠错目标（多是语料里的错字/粘连词，如 "tenrol"）
+DEFAULT_UNIT_PREFIXES = ("KIT",)
+TITLE_WEIGHT = 10       # 章节标题里的词按这个次数计入词表
+# CSV 里的粘连词几乎都以一个虚词开头（"ienrolas", "myfeesdue", "anenrolmentconfirmation"）；
+# 真正的单词拆出来的开头多是前缀（"in|eligibility", "re|in|statement", "a|long|side"），这些不算
+FUSED_LEADS = frozenset("i my to of an or the and about there your".split())
+FUNCTION_WORDS = FUSED_LEADS | frozenset("a in on is as at be by it for are can from how what when do with".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_UNIT_LOOSE_RE = re.compile(r"\b([a-z]{3})[\s\-_/]?(\d{3})\b", re.I)
+_SEM_WORD_RE = re.compile(r"\b(?:semester|sem)\s*(one|two)\b", re.I)
+
+
+def _deletes(word: str, max_edit: int) -> Set[str]:
+    """word and every string obtained by deleting up to max_edit characters from it."""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_edit):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+def osa_distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment (Damerau) distance, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        lo = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            lo = min(lo, v)
+        if lo > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class Normalizer:
+    """Vocabulary + precomputed deletion dictionary; corrections, segmentations and unit codes."""
+
+    def __init__(self, words: Dict[str, int], deletes: Optional[Dict[str, List[int]]] = None,
+                 unit_prefixes: Iterable[str] = DEFAULT_UNIT_PREFIXES, max_edit: int = MAX_EDIT,
+                 prefix_len: int = PREFIX_LEN):
+        self.words = words
+        self.word_list = list(words)
+        self.max_edit = max_edit
+        self.prefix_len = prefix_len
+        self.unit_prefixes = frozenset(p.upper() for p in unit_prefixes)
+        self.deletes = deletes if deletes is not None else build_deletes(self.word_list, max_edit, prefix_len)
+        self._log_total = math.log(max(1, sum(words.values())))
+        self._resolved: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    # ---------- per-token ----------
+    def correct(self, token: str, max_edit: int) -> Optional[Tuple[str, int]]:
+        """(closest vocabulary word with the same first letter, seen at least MIN_TARGET_FREQ times,
+        distance) within max_edit; ties go to the more frequent word."""
+        best: Optional[Tuple[int, int, str]] = None
+        seen: Set[int] = set()
+        for key in _deletes(token[:self.prefix_len], max_edit):
+            for i in self.deletes.get(key, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                w = self.word_list[i]
+                if w[0] != token[0] or self.words[w] < MIN_TARGET_FREQ:
+                    continue
+                d = osa_distance(token, w, max_edit)
+                if d <= max_edit:
+                    cand = (d, -self.words[w], w)
+                    if best is None or cand < best:
+                        best = cand
+        return (best[2], best[0]) if best else None
+
+    def segment(self, token: str, min_freq: int = 1) -> Optional[List[str]]:
+        """Most probable split of token into 2..MAX_PARTS vocabulary words (unigram model), if any."""
+        n = len(token)
+        best: List[Optional[Tuple[float, List[str]]]] = [(0.0, [])] + [None] * n
+        for i in range(1, n + 1):
+            for j in range(max(0, i - MAX_WORD_LEN), i):
+                if best[j] is None:
+                    continue
+                w = token[j:i]
+                f = self.words.get(w, 0)
+                if f < min_freq or (len(w) < 2 and w not in ("a", "i")):
+                    continue
+                cost = best[j][0] + self._log_total - math.log(f)
+                if best[i] is None or cost < best[i][0]:
+                    best[i] = (cost, best[j][1] + [w])
+        hit = best[n]
+        return hit[1] if hit and 2 <= len(hit[1]) <= MAX_PARTS else None
+
+    def resolve(self, token: str) -> Tuple[str, ...]:
+        """Replacement tokens for one lower-case token (memoised)."""
+        hit = self._resolved.get(token)
+        if hit is not None:
+            return hit
+        out: Tuple[str, ...] = (token,)
+        if token not in self.words and len(token) > 3 and not any(ch.isdigit() for ch in token):
+            c1 = self.correct(token, 1)
+            if c1:
+                out = (c1[0],)
+            else:
+                parts = self.segment(token, MIN_PART_FREQ) if len(token) >= 6 else None
+                if parts:
+                    out = tuple(parts)
+                elif len(token) >= MIN_LEN_EDIT2 and self.max_edit >= 2:
+                    c2 = self.correct(token, 2)
+                    if c2:
+                        out = (c2[0],)
+        with self._lock:
+            if len(self._resolved) > 50000:
+                self._resolved.clear()
+            self._resolved[token] = out
+        return out
+
+    # ---------- whole query ----------
+    def canonical_units(self, text: str) -> str:
+        """Unit codes to the UNIT_RE form (upper case, no separator); semester words to 'semester N'."""
+        def unit(m: "re.Match") -> str:
+            code = (m.group(1) + m.group(2)).upper()
+            loose = m.group(0) != m.group(1) + m.group(2)
+            if UNIT_RE.fullmatch(code) and (not loose or code[:3] in self.unit_prefixes):
+                return code
+            return m.group(0)
+
+        text = _UNIT_LOOSE_RE.sub(unit, text or "")
+        text = _SEM_WORD_RE.sub(lambda m: "semester " + ("1" if m.group(1).lower() == "one" else "2"), text)
+        return SEM_RE.sub(lambda m: f"semester {m.group(1)}", text)
+
+    def tokens(self, query: str) -> List[str]:
+        """Normalised tokens: unit codes upper-case (KIT700), everything else lower-case vocabulary words."""
+        text = self.canonical_units(query)
+        units = {m.group(1).upper() for m in UNIT_RE.finditer(text)}
+        out: List[str] = []
+        for t in _TOKEN_RE.findall(text.lower()):
+            if t.upper() in units:
+                out.append(t.upper())
+            else:
+                out.extend(self.resolve(t))
+        return out
+
+    def normalize(self, query: str) -> str:
+        return " ".join(self.tokens(query))
+
+    def explain(self, query: str) -> List[Tuple[str, str]]:
+        """(token, replacement) for every token the normaliser changed (for debugging / benchmarks)."""
+        changes = []
+        for rx in (_UNIT_LOOSE_RE, _SEM_WORD_RE, SEM_RE):
+            for m in rx.finditer(query or ""):
+                c = self.canonical_units(m.group(0))
+                if c != m.group(0) and (m.group(0), c) not in changes:
+                    changes.append((m.group(0), c))
+        text = self.canonical_units(query)
+        for t in _TOKEN_RE.findall(text.lower()):
+            r = self.resolve(t)
+            if r != (t,) and not UNIT_RE.fullmatch(t):
+                changes.append((t, " ".join(r)))
+        return changes
+
+    # ---------- artifact ----------
+    def save(self, path: str, source_sha1: str) -> int:
+        """Write vocabulary + deletes atomically (byte-stable gzip); returns the vocabulary size."""
+        doc = {"version": VOCAB_VERSION, "source_sha1": source_sha1, "max_edit": self.max_edit,
+               "prefix_len": self.prefix_len, "unit_prefixes": sorted(self.unit_prefixes),
+               "words": [[w, f] for w, f in self.words.items()],
+               "deletes": {k: v for k, v in sorted(self.deletes.items())}}
+        tmp = f"{path}.tmp.{os.getpid()}"   # ingest 可能在多个 worker 里同时重建
+        with io.TextIOWrapper(gzip.GzipFile(tmp, "wb", mtime=0), encoding="utf-8") as f:
+            f.write(json.dumps(doc, ensure_ascii=False, separators=(",", ":")))
+        os.replace(tmp, path)
+        return len(self.words)
+
+    @classmethod
+    def load(cls, path: str = VOCAB_PATH, source_sha1: Optional[str] = None) -> Optional["Normalizer"]:
+        """Normalizer from a saved artifact; None if missing, unreadable or built from other sources."""
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+        if doc.get("version") != VOCAB_VERSION or doc.get("max_edit") != MAX_EDIT \
+                or doc.get("prefix_len") != PREFIX_LEN:
+            return None
+        if source_sha1 is not None and doc.get("source_sha1") != source_sha1:
+            return None
+        return cls({w: f for w, f in doc["words"]}, doc["deletes"], doc.get("unit_prefixes", DEFAULT_UNIT_PREFIXES))
+
+
+def build_deletes(words: List[str], max_edit: int = MAX_EDIT, prefix_len: int = PREFIX_LEN) -> Dict[str, List[int]]:
+    deletes: Dict[str, List[int]] = {}
+    for i, w in enumerate(words):
+        for d in _deletes(w[:prefix_len], max_edit):
+            deletes.setdefault(d, []).append(i)
+    return deletes
+
+
+# ---------------- vocabulary ----------------
+def _corpus_texts(csv_path: str) -> Iterable[str]:
+    import csv
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row.get("question") or ""
+            yield row.get("answer") or ""
+
+
+def clean_counts(counts: Counter, rare: int = 2, common: int = 10, ratio: int = 20) -> Dict[str, int]:
+    """
+    Vocabulary from raw corpus counts, with the corpus' own fused words and typos folded away:
+      - a rare word (<= rare) that splits into common words (each >= common) starting with one of
+        FUSED_LEADS, every other part a function word or 3+ characters, is counted as those words;
+      - a rare word of 6+ characters that is an adjacent transposition of a word at least `ratio`
+        times (and `common`) more frequent is counted as that word. Other one-edit neighbours are
+        left alone: they are mostly real inflections ("emails", "applies", "listen").
+    Words with digits and words of <= 3 characters are kept as they are.
+    """
+    words = dict(counts)
+    probe = Normalizer(words, unit_prefixes=())
+    out: Counter = Counter()
+    for w, f in counts.items():
+        if f <= rare and len(w) > 3 and not any(ch.isdigit() for ch in w):
+            parts = probe.segment(w, min_freq=common) if len(w) >= 7 else None
+            if parts and _fused(parts):
+                for p in parts:
+                    out[p] += f
+                continue
+            near = _near_frequent(probe, w, f * ratio, common) if len(w) >= 6 else None
+            if near:
+                out[near] += f
+                continue
+        out[w] += f
+    return dict(out)
+
+
+def _fused(parts: List[str]) -> bool:
+    return parts[0] in FUSED_LEADS and all(len(p) >= 3 or p in FUNCTION_WORDS for p in parts[1:])
+
+
+def _near_frequent(probe: Normalizer, w: str, min_freq: int, common: int) -> Optional[str]:
+    best = None
+    for key in _deletes(w[:probe.prefix_len], 1):
+        for i in probe.deletes.get(key, ()):
+            cand = probe.word_list[i]
+            f = probe.words[cand]
+            if cand != w and sorted(cand) == sorted(w) and f >= max(min_freq, common) \
+                    and osa_distance(w, cand, 1) <= 1:
+                if best is None or f > probe.words[best]:
+                    best = cand
+    return best
+
+
+def build_vocabulary(csv_path: str = DEFAULT_CSV) -> Tuple[Dict[str, int], List[str]]:
+    """(cleaned word counts, unit-code prefixes) from the knowledge base and the outline section titles."""
+    counts: Counter = Counter()
+    prefixes = set(DEFAULT_UNIT_PREFIXES)
+    for text in _corpus_texts(csv_path):
+        counts.update(_TOKEN_RE.findall(text.lower()))
+        prefixes.update(m.group(1)[:3].upper() for m in UNIT_RE.finditer(text))
+    for title in SECTION_TITLES:
+        for t in _TOKEN_RE.findall(title.lower()):
+            counts[t] += TITLE_WEIGHT
+    words = clean_counts(counts)
+    # 高频词在前：候选按 (距离, -词频) 比较，与顺序无关；只是让产物更易读
+    return dict(sorted(words.items(), key=lambda kv: (-kv[1], kv[0]))), sorted(prefixes)
+
+
+def source_sha1(csv_path: str = DEFAULT_CSV) -> str:
+    """Fingerprint of every vocabulary input and the dictionary parameters."""
+    h = hashlib.sha1(f"{VOCAB_VERSION}:{MAX_EDIT}:{PREFIX_LEN}".encode())
+    h.update(file_sha1(csv_path).encode())
+    h.update("\n".join(SECTION_TITLES).encode("utf-8"))
+    return h.hexdigest()
+
+
+def build(path: str = VOCAB_PATH, csv_path: str = DEFAULT_CSV) -> int:
+    words, prefixes = build_vocabulary(csv_path)
+    return Normalizer(words, unit_prefixes=prefixes).save(path, source_sha1(csv_path))
+
+
+_DEFAULT: Optional[Normalizer] = None
+_LOCK = threading.Lock()
+
+
+def default_normalizer() -> Normalizer:
+    """Process-wide normaliser: the saved artifact if fresh (~30 ms), else built in-process.
+    tools/faq_ingest rebuilds the artifact and replaces this (see refresh()) when the CSV changes."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _LOCK:
+            if _DEFAULT is None:
+                sha = source_sha1()
+                n = Normalizer.load(VOCAB_PATH, sha)
+                if n is None:
+                    words, prefixes = build_vocabulary()
+                    n = Normalizer(words, unit_prefixes=prefixes)
+                _DEFAULT = n
+    return _DEFAULT
+
+
+def refresh(csv_path: str = DEFAULT_CSV, path: str = VOCAB_PATH) -> Normalizer:
+    """Rebuild the vocabulary from csv_path, save the artifact (skipped if it cannot be written) and make
+    the new normaliser the process-wide one, dropping normalisations cached with the old vocabulary."""
+    global _DEFAULT
+    words, prefixes = build_vocabulary(csv_path)
+    n = Normalizer(words, unit_prefixes=prefixes)
+    try:
+        n.save(path, source_sha1(csv_path))
+    except OSError:
+        pass   # 只读部署：新进程照旧在内存里建词表
+    with _LOCK:
+        _DEFAULT = n
+        _normalize_cached.cache_clear()
+    return n
+
+
+@lru_cache(maxsize=4096)
+def _normalize_cached(query: str) -> str:
+    return default_normalizer().normalize(query)
+
+
+def normalize(query: str) -> str:
+    """The query in canonical form for exact-token ranking; unchanged when QUERY_NORMALIZE=0."""
+    if not query or os.getenv("QUERY_NORMALIZE", "1") == "0":
+        return query
+    return _normalize_cached(query)
+
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["--build"]:
+        n = build()
+        print(f"Wrote {n} words -> {VOCAB_PATH} ({os.path.getsize(VOCAB_PATH) / 1024:.0f} KiB)")
+        sys.exit(0)
+    for q in sys.argv[1:] or ["how do i enroll in kit 700 sem one", "mytimetable clashes", "acess my estudnet",
+                              "anenrolmentconfirmation letter", "PDF 229 form"]:
+        print(f"{q!r} -> {normalize(q)!r}  {default_normalizer().explain(q)}")
@@ -2,98 +2,333 @@
 """
 Spyder-friendly script to seed MockAPI.io with FAQ data from a CSV.
 
-Fixes NaN -> None so JSON encoding works.
-Adds basic validation & logging.
+Streams rows with the csv module (no pandas, constant memory) and POSTs them
+through a pooled requests.Session on WORKERS threads. An adaptive token bucket
+paces requests and halves its rate on 429s. Finished rows are appended to a
+checkpoint file so an interrupted run resumes where it stopped. UPSERT mode
+skips rows whose intent the server already holds.
+
+Missing/empty fields are sent as None so JSON encoding works.
+Edit the CONFIG block, or override it on the command line (see --help).
 """
 
-import time
+import argparse
+import csv
+import os
 import sys
-import pandas as pd
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
 import requests
 
+try:
+    from tools.http_cassette import http_adapter
+except ImportError:  # 以 tools/ 为包根导入时（或直接运行本脚本）
+    from http_cassette import http_adapter
+
 # ===== CONFIG (edit as needed) =====
 CSV_FILE = "utas_faq_agent_QA.csv"   # put the CSV in the same folder as this script
 BASE_URL = "https://68b84cdbb71540504327cbc4.mockapi.io/api/v1"
 RESOURCE = "faqs"
-SLEEP = 0.35   # seconds between POSTs (avoid rate limit)
-DRY_RUN = False  # True = print payloads but don't POST
+RATE = 3.0         # starting requests/second (adapts: halves on 429, creeps back up on success)
+MAX_RATE = 10.0    # never exceed this many requests/second
+WORKERS = 4        # concurrent POSTs
+CHECKPOINT = "seed_mockapi.checkpoint"  # finished row numbers, one per line; delete to start over
+UPSERT = False     # True = skip rows whose intent already exists on the server
+DRY_RUN = False    # True = print payloads but don't POST
 # ===================================
 
-def to_none_if_nan(x):
-    """Convert pandas NaN to None, leave others as-is."""
-    if pd.isna(x):
-        return None
-    return x
+FIELDS = ("intent", "question", "answer", "filename", "link", "topic", "course_code", "course_name")
+MAX_ATTEMPTS = 5
+
 
 def to_str_or_none(x):
-    """Prefer string for text fields; None if NaN/empty after strip."""
-    if pd.isna(x):
+    """Prefer string for text fields; None if missing/empty after strip."""
+    if x is None:
         return None
     s = str(x).strip()
     return s if s != "" else None
 
-def main():
-    # Load CSV
-    try:
-        df = pd.read_csv(CSV_FILE)
-    except FileNotFoundError:
-        print(f"❌ CSV file not found: {CSV_FILE}")
-        sys.exit(1)
 
-    required = {"intent", "question", "answer"}
-    if not required.issubset(df.columns):
-        missing = required - set(df.columns)
-        print(f"❌ CSV missing required columns: {missing}")
-        sys.exit(1)
+def iter_rows(csv_file: str) -> Iterator[Tuple[int, Dict[str, Optional[str]]]]:
+    """Yield (row number, payload) one row at a time; row numbers start at 0 like df.iterrows()."""
+    with open(csv_file, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        required = {"intent", "question", "answer"}
+        missing = required - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"CSV missing required columns: {missing}")
+        for i, row in enumerate(reader):
+            yield i, {k: to_str_or_none(row.get(k)) for k in FIELDS}
 
-    # Normalize: replace NaN with None across the DataFrame
-    df = df.where(pd.notnull(df), None)
-
-    url = f"{BASE_URL.rstrip('/')}/{RESOURCE}"
-    ok, fail = 0, 0
-
-    for i, row in df.iterrows():
-        # Build clean payload (strings for text fields; None for missing)
-        payload = {
-            "intent": to_str_or_none(row.get("intent")),
-            "question": to_str_or_none(row.get("question")),
-            "answer": to_str_or_none(row.get("answer")),
-            "filename": to_str_or_none(row.get("filename")),
-            "link": to_str_or_none(row.get("link")),
-            "topic": to_str_or_none(row.get("topic")),
-            "course_code": to_str_or_none(row.get("course_code")),
-            "course_name": to_str_or_none(row.get("course_name")),
-        }
-
-        # Validate required fields
-        if not payload["intent"] or not payload["question"] or not payload["answer"]:
-            fail += 1
-            print(f"[SKIP row {i}] Missing required fields → {payload}")
-            continue
 
-        # Optional: show what we'll send
-        print(f"[{i}] POST → {url} | intent={payload['intent']}")
+class TokenBucket:
+    """Thread-safe token bucket with AIMD rate control (x0.5 on 429, +step on success)."""
+
+    def __init__(self, rate: float, max_rate: float, min_rate: float = 0.2, step: Optional[float] = None):
+        self.rate = rate
+        self.max_rate = max(max_rate, rate)
+        self.min_rate = min_rate
+        self.step = step if step is not None else self.max_rate / 50   # 约 50 次成功恢复到上限
+        self.tokens = 1.0
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+    def on_throttle(self) -> None:
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            self.tokens = 0.0
+
+
+class Checkpoint:
+    """Append-only file of finished row numbers (created or skipped-as-existing)."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.done: Set[int] = set()
+        self.lock = threading.Lock()
+        self._f = None
+        if path:
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    self.done = {int(x) for x in f.read().split() if x.isdigit()}
+            self._f = open(path, "a", encoding="utf-8")
+
+    def mark(self, i: int) -> None:
+        with self.lock:
+            self.done.add(i)
+            if self._f:
+                self._f.write(f"{i}\n")
+                self._f.flush()
+
+    def close(self) -> None:
+        if self._f:
+            self._f.close()
+
+
+def make_session(workers: int) -> requests.Session:
+    s = requests.Session()
+    # HTTP_CASSETTE_MODE=record/replay 时录制/回放 MockAPI 流量（tools/http_cassette.py）
+    adapter = http_adapter("mockapi", pool_connections=1, pool_maxsize=max(1, workers))
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def fetch_existing_ids(session: requests.Session, url: str, limit: int = 100) -> Dict[str, str]:
+    """Page through GET /faqs and map each intent the server holds to its record id."""
+    ids: Dict[str, str] = {}
+    page = 1
+    while True:
+        r = session.get(url, params={"page": page, "limit": limit}, timeout=20)
+        if r.status_code == 404:   # mockapi.io 对空资源返回 404
+            break
+        r.raise_for_status()
+        items = r.json() or []
+        ids.update((it["intent"], str(it.get("id"))) for it in items if it.get("intent"))
+        if len(items) < limit:
+            break
+        page += 1
+    return ids
+
 
-        if DRY_RUN:
-            ok += 1
+def fetch_existing_intents(session: requests.Session, url: str, limit: int = 100) -> Set[str]:
+    return set(fetch_existing_ids(session, url, limit))
+
+
+def send_row(session: requests.Session, method: str, url: str, label: str, payload: Optional[Dict],
+             bucket: TokenBucket) -> Optional[requests.Response]:
+    """One write with pacing and retries (429/5xx/network errors); the final 2xx response or None."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        bucket.acquire()
+        try:
+            r = session.request(method, url, json=payload, timeout=20)
+        except requests.RequestException as e:
+            print(f"   [EXC {label}] {e} (attempt {attempt})")
+            time.sleep(min(8.0, 0.5 * 2 ** attempt))
             continue
+        if 200 <= r.status_code < 300:
+            bucket.on_success()
+            return r
+        if r.status_code == 429 or r.status_code >= 500:
+            bucket.on_throttle()
+            try:
+                time.sleep(min(30.0, float(r.headers.get("Retry-After", 0))))
+            except ValueError:
+                pass
+            print(f"   [RETRY {label}] {r.status_code}, rate -> {bucket.rate:.2f}/s")
+            continue
+        print(f"   [ERR {label}] {r.status_code} {r.text}")
+        return None
+    print(f"   [FAIL {label}] giving up after {MAX_ATTEMPTS} attempts")
+    return None
+
+
+def post_row(session: requests.Session, url: str, i: int, payload: Dict, bucket: TokenBucket) -> bool:
+    r = send_row(session, "POST", url, f"row {i}", payload, bucket)
+    if r is None:
+        return False
+    print(f"[{i}] ✅ Created id={r.json().get('id')} intent={payload['intent']}")
+    return True
+
+
+def sync_delta(upserts: Iterable[Dict], deletes: Iterable[str], base_url: str = BASE_URL,
+               resource: str = RESOURCE, rate: float = RATE, max_rate: float = MAX_RATE,
+               workers: int = WORKERS, dry_run: bool = DRY_RUN,
+               session: Optional[requests.Session] = None) -> Dict[str, int]:
+    """
+    Apply an ingest delta (tools/faq_ingest.py) instead of reseeding everything:
+    PUT rows whose intent the server holds, POST the others, DELETE removed intents.
+    Ids are resolved from the server on each run, so re-applying a delta is harmless.
+    """
+    url = f"{base_url.rstrip('/')}/{resource}"
+    upserts, deletes = list(upserts), list(deletes)
+    counts = {"created": 0, "updated": 0, "deleted": 0, "failed": 0}
+    if dry_run:
+        for p in upserts:
+            print(f"UPSERT → {url} | intent={p.get('intent')}")
+        for intent in deletes:
+            print(f"DELETE → {url} | intent={intent}")
+        return dict(counts, created=len(upserts), deleted=len(deletes))
+    if not upserts and not deletes:
+        return counts
+    session = session or make_session(workers)
+    bucket = TokenBucket(rate, max_rate)
+    ids = fetch_existing_ids(session, url)
+    lock = threading.Lock()
+
+    def work(method: str, target: str, intent: str, payload: Optional[Dict], key: str) -> None:
+        ok = send_row(session, method, target, f"{method} {intent}", payload, bucket) is not None
+        with lock:
+            counts[key if ok else "failed"] += 1
+
+    jobs = []
+    for p in upserts:
+        payload = {k: to_str_or_none(p.get(k)) for k in FIELDS}
+        rid = ids.get(payload["intent"])
+        if rid is None:
+            jobs.append(("POST", url, payload["intent"], payload, "created"))
+        else:
+            jobs.append(("PUT", f"{url}/{rid}", payload["intent"], payload, "updated"))
+    for intent in deletes:
+        rid = ids.get(intent)
+        if rid is not None:   # 服务端本来就没有的，视为已删除
+            jobs.append(("DELETE", f"{url}/{rid}", intent, None, "deleted"))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for job in jobs:
+            ex.submit(work, *job)
+    return counts
+
 
+def seed(csv_file: str = CSV_FILE, base_url: str = BASE_URL, resource: str = RESOURCE,
+         rate: float = RATE, max_rate: float = MAX_RATE, workers: int = WORKERS,
+         checkpoint: Optional[str] = CHECKPOINT, upsert: bool = UPSERT, dry_run: bool = DRY_RUN,
+         session: Optional[requests.Session] = None) -> Dict[str, int]:
+    url = f"{base_url.rstrip('/')}/{resource}"
+    session = session or make_session(workers)
+    bucket = TokenBucket(rate, max_rate)
+    ckpt = Checkpoint(None if dry_run else checkpoint)
+    counts = {"created": 0, "failed": 0, "skipped": 0, "resumed": 0, "existing": 0}
+    lock = threading.Lock()
+
+    existing: Set[str] = set()
+    if upsert and not dry_run:
+        existing = fetch_existing_intents(session, url)
+        print(f"UPSERT: server already holds {len(existing)} intents")
+
+    def bump(key: str) -> None:
+        with lock:
+            counts[key] += 1
+
+    def work(i: int, payload: Dict) -> None:
         try:
-            r = requests.post(url, json=payload, timeout=20)
-            if r.status_code in (200, 201):
-                ok += 1
-                rid = r.json().get("id")
-                print(f"   ✅ Created id={rid}")
+            if post_row(session, url, i, payload, bucket):
+                bump("created")
+                ckpt.mark(i)
             else:
-                fail += 1
-                print(f"   [ERR] {r.status_code} {r.text}")
+                bump("failed")
         except Exception as e:
-            fail += 1
-            print(f"   [EXC] {e}")
+            bump("failed")
+            print(f"   [EXC row {i}] {e}")
+
+    # 在途任务数有上限：边读边发，内存不随 CSV 大小增长
+    slots = threading.BoundedSemaphore(max(1, workers) * 2)
+
+    def release(_fut) -> None:
+        slots.release()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for i, payload in iter_rows(csv_file):
+            if i in ckpt.done:
+                counts["resumed"] += 1
+                continue
+            # Validate required fields
+            if not payload["intent"] or not payload["question"] or not payload["answer"]:
+                counts["skipped"] += 1
+                print(f"[SKIP row {i}] Missing required fields → {payload}")
+                continue
+            if payload["intent"] in existing:
+                counts["existing"] += 1
+                ckpt.mark(i)
+                continue
+            if dry_run:
+                counts["created"] += 1
+                print(f"[{i}] POST → {url} | intent={payload['intent']}")
+                continue
+            if upsert:
+                existing.add(payload["intent"])   # CSV 内重复的 intent 也只写一次
+            slots.acquire()
+            ex.submit(work, i, payload).add_done_callback(release)
 
-        time.sleep(SLEEP)
+    ckpt.close()
+    return counts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Seed MockAPI.io FAQs from a CSV (streaming, concurrent, resumable).")
+    ap.add_argument("--csv", default=CSV_FILE)
+    ap.add_argument("--base-url", default=BASE_URL)
+    ap.add_argument("--resource", default=RESOURCE)
+    ap.add_argument("--rate", type=float, default=RATE, help="starting requests/second")
+    ap.add_argument("--max-rate", type=float, default=MAX_RATE)
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--checkpoint", default=CHECKPOINT, help="'' disables checkpointing")
+    ap.add_argument("--upsert", action="store_true", default=UPSERT, help="skip intents already on the server")
+    ap.add_argument("--dry-run", action="store_true", default=DRY_RUN)
+    args = ap.parse_args(argv)
+
+    if not os.path.exists(args.csv):
+        print(f"❌ CSV file not found: {args.csv}")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    try:
+        c = seed(args.csv, args.base_url, args.resource, args.rate, args.max_rate, args.workers,
+                 args.checkpoint or None, args.upsert, args.dry_run)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"\n🎉 Done in {time.perf_counter() - t0:.1f}s. Created={c['created']}, "
+          f"Failed={c['failed']}, Skipped={c['skipped']}, AlreadyOnServer={c['existing']}, "
+          f"Resumed(past runs)={c['resumed']}")
 
-    print(f"\n🎉 Done. Created={ok}, Failed/Skipped={fail}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,191 @@
+# tools/snippet_pack.py
+# Shared post-processing for retrieved snippets: near-duplicate collapsing + budget packing.
+#
+#   snippets = pack(snippets, key="answer")          # 按 score（或原顺序）去近重复，再按预算装箱
+#
+# - 近重复：64 位 SimHash（单词 + 相邻词对特征，blake2b 哈希，跨进程稳定），汉明距离 <= MAX_DISTANCE
+#   视为同一段。64 位切成 MAX_DISTANCE + 1 段，距离不超过阈值的两个签名至少有一段完全相同
+#   （抽屉原理），所以按段分桶只比较同桶候选，整体是线性的，而不是两两比较的 O(n^2)
+# - 每组近重复只保留分数最高（同分取排名靠前）的那条
+# - 预算：字符数和/或估算 token 数（约 4 字符 1 token，不依赖 tokenizer），按分数从高到低贪心装入，
+#   放不下的跳过、继续尝试后面更短的；第一条就超预算时截断它，保证至少返回一条
+# - 默认值来自环境变量：SNIPPET_DEDUP（默认 1）、SNIPPET_MAX_DISTANCE（默认 5；FAQ 语料里不同答案的最小距离约为 9）、
+#   SNIPPET_BUDGET_CHARS / SNIPPET_BUDGET_TOKENS（默认不限）
+
+import hashlib
+import os
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+BITS = 64
+CHARS_PER_TOKEN = 4
+
+Key = Union[str, Sequence[str], Callable[[Any], str]]
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    v = os.getenv(name, "").strip()
+    return int(v) if v else default
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature_bits(feat: str) -> str:
+    """A feature's 64-bit blake2b hash as a 0/1 string; words and word pairs repeat a lot across snippets."""
+    return format(int.from_bytes(hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+
+
+@lru_cache(maxsize=8192)
+def simhash(text: str) -> int:
+    """64-bit SimHash over word unigrams and bigrams; memoised (0 for text without words)."""
+    words = _TOKEN_RE.findall((text or "").lower())
+    if not words:
+        return 0
+    # 只用 3-gram 时短句改一个词距离就到 10 左右；加上单词特征后短句也稳定
+    feats = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    # 每个特征的哈希写成 64 位 0/1 串，按位置转置后数 1，比逐位移位累加快一个数量级
+    rows = [_feature_bits(f) for f in feats]
+    half = len(rows) / 2
+    return int("".join("1" if col.count("1") > half else "0" for col in zip(*rows)), 2)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _text_of(item: Any, key: Key) -> str:
+    if callable(key):
+        return key(item) or ""
+    if isinstance(item, str):
+        return item
+    if isinstance(key, str):
+        return str(item.get(key) or "")
+    return " ".join(str(item.get(k) or "") for k in key)
+
+
+def _bands(max_distance: int) -> List[tuple]:
+    n = max_distance + 1
+    size = -(-BITS // n)
+    return [(i * size, min(BITS, (i + 1) * size)) for i in range(n) if i * size < BITS]
+
+
+def collapse(items: List[Any], key: Key = "text", max_distance: Optional[int] = None,
+             score_key: Optional[str] = "score", distinct: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+    """
+    items without near-duplicates (SimHash Hamming distance <= max_distance), in score order
+    (items without score_key keep their input order). Exact duplicates after whitespace and
+    case folding are always collapsed, even if they have no word tokens. Items for which
+    distinct(item) is true (e.g. a shared placeholder text) are always kept and never compared.
+    """
+    if max_distance is None:
+        max_distance = _env_int("SNIPPET_MAX_DISTANCE", 5)
+    order = list(range(len(items)))
+    if score_key and items and all(isinstance(it, dict) and score_key in it for it in items):
+        order.sort(key=lambda i: -float(items[i][score_key]))      # sort 稳定：同分保持原排名
+    bands = _bands(max_distance)
+    buckets: List[Dict[int, List[int]]] = [{} for _ in bands]
+    exact: set = set()
+    kept: List[int] = []
+    sigs: Dict[int, int] = {}
+    for i in order:
+        if distinct is not None and distinct(items[i]):
+            kept.append(i)
+            continue
+        text = _text_of(items[i], key)
+        norm = " ".join(text.split()).lower()
+        if norm in exact:
+            continue
+        sig = simhash(text)
+        dup = False
+        if sig:
+            for bi, (lo, hi) in enumerate(bands):
+                part = (sig >> lo) & ((1 << (hi - lo)) - 1)
+                for j in buckets[bi].get(part, ()):
+                    if hamming(sig, sigs[j]) <= max_distance:
+                        dup = True
+                        break
+                if dup:
+                    break
+        if dup:
+            continue
+        exact.add(norm)
+        kept.append(i)
+        if sig:
+            sigs[i] = sig
+            for bi, (lo, hi) in enumerate(bands):
+                buckets[bi].setdefault((sig >> lo) & ((1 << (hi - lo)) - 1), []).append(i)
+    return [items[i] for i in kept]
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text or "") // CHARS_PER_TOKEN)
+
+
+def _trim(s: str, n: int) -> str:
+    s = (s or "").strip()
+    if len(s) <= n:
+        return s
+    cut = s[:max(0, n - 2)].rsplit(" ", 1)[0].rstrip()
+    return cut + " …"
+
+
+def fit_budget(items: List[Any], key: Key = "text", budget_chars: Optional[int] = None,
+               budget_tokens: Optional[int] = None) -> List[Any]:
+    """
+    Greedy packing in the given order: items that would overflow the budget are skipped and
+    shorter later ones still tried. If not even the first fits, it is returned trimmed (dict
+    items get a copy with the trimmed text under key, which must then be a field name).
+    """
+    limit = None
+    if budget_chars:
+        limit = int(budget_chars)
+    if budget_tokens:
+        limit = min(limit or 1 << 62, int(budget_tokens) * CHARS_PER_TOKEN)
+    if limit is None:
+        return list(items)
+    out, used = [], 0
+    for it in items:
+        n = len(_text_of(it, key))
+        if used + n <= limit:
+            out.append(it)
+            used += n
+    if not out and items:
+        first = items[0]
+        if isinstance(first, str):
+            out = [_trim(first, limit)]
+        elif isinstance(key, str):
+            out = [{**first, key: _trim(first.get(key) or "", limit)}]
+        else:
+            out = [first]
+    return out
+
+
+def pack(items: List[Any], key: Key = "text", *, dedup: Optional[bool] = None,
+         max_distance: Optional[int] = None, budget_chars: Optional[int] = None,
+         budget_tokens: Optional[int] = None, limit: Optional[int] = None,
+         score_key: Optional[str] = "score", distinct: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+    """collapse() then the first `limit` items, then fit_budget(); None arguments fall back to the env defaults."""
+    if dedup is None:
+        dedup = os.getenv("SNIPPET_DEDUP", "1") != "0"
+    out = collapse(items, key, max_distance, score_key, distinct) if dedup else list(items)
+    if limit is not None:
+        out = out[:max(0, int(limit))]
+    return fit_budget(out, key,
+                      budget_chars if budget_chars is not None else _env_int("SNIPPET_BUDGET_CHARS", None),
+                      budget_tokens if budget_tokens is not None else _env_int("SNIPPET_BUDGET_TOKENS", None))
+
+
+def payload_size(items: List[Any], key: Key = "text") -> int:
+    """Characters of text the items would put in front of the LLM."""
+    return sum(len(_text_of(it, key)) for it in items)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    demo = [{"text": t, "score": s} for t, s in (
+        ("Census date is the last day to withdraw without financial penalty.", 0.9),
+        ("The census date is the last day to withdraw without financial penalty!", 0.8),
+        ("Results are released through eStudent.", 0.7))]
+    print(json.dumps(pack(demo, budget_chars=int(sys.argv[1]) if len(sys.argv) > 1 else None), indent=2))
@@ -1,40 +1,58 @@
 # djv3.py 
 # sentinel: djv3 2025-09-04 12:35
 
-import re, requests
-from typing import Dict, Any, List
-from requests.auth import HTTPBasicAuth
-from ibm_watsonx_orchestrate.agent_builder.tools import tool
+from typing import Dict, Any, List, Optional
 from ibm_watsonx_orchestrate.run import connections
 from ibm_watsonx_orchestrate.agent_builder.connections import ExpectedCredentials, ConnectionType
 
-UNIT_RE = re.compile(r"\b([A-Z]{3}\d{3})\b", re.I)
-SEM_RE = re.compile(r"\b(?:semester|sem|s)\s*([12])\b", re.I)
+try:
+    from tools.deadline import DeadlineExceeded, propagate
+    from tools.discovery_client import get_client
+    from tools.instrumentation import instrumented_tool
+    from tools.outline_index import best_window, lookup as _local_lookup
+    from tools.snippet_pack import pack
+    from tools.unit_patterns import SEM_RE, UNIT_RE  # noqa: F401  (旧名字保留导出)
+    from tools.unit_patterns import find_unit_semester as _find_unit_semester
+except ImportError:  # 以 tools/ 为包根导入时
+    from deadline import DeadlineExceeded, propagate
+    from discovery_client import get_client
+    from instrumentation import instrumented_tool
+    from outline_index import best_window, lookup as _local_lookup
+    from snippet_pack import pack
+    from unit_patterns import SEM_RE, UNIT_RE  # noqa: F401
+    from unit_patterns import find_unit_semester as _find_unit_semester
 
-def _find_unit_semester(text: str):
-    unit = sem = None
-    if text:
-        m = UNIT_RE.search(text); unit = m.group(1).upper() if m else None
-        s = SEM_RE.search(text); sem = s.group(1) if s else None
-    return unit, sem
+HDR = "tool=discovery_json_v3_clean; sentinel=djv3 2025-09-04 12:35"
+NO_PASSAGE = "(No passage excerpt returned.)"
 
 def _trim(s: str, n: int = 400) -> str:
     if not s: return ""
     s = s.strip()
     return s if len(s) <= n else s[:n].rstrip() + " …"
 
-@tool(
+@instrumented_tool(
     name="discovery_json_v3_clean",
-    description="Query Discovery JSON project (clean v3) using secure connection credentials.",
+    description="Query Discovery JSON project (clean v3) using secure connection credentials. "
+                "Optional deadline_ms: the time left for this turn in ms; the Discovery call never runs past it.",
     expected_credentials=[ExpectedCredentials(
         app_id="discovery_cfg", 
         type=ConnectionType.KEY_VALUE
     )]
 )
 def discovery_json_v3_clean(userQuery: str = "", unit: str = "", semester: str = "",
-                           top_k: int = 2, passage_len: int = 400) -> Dict[str, Any]:
-    hdr = "tool=discovery_json_v3_clean; sentinel=djv3 2025-09-04 12:35"
-    
+                           top_k: int = 2, passage_len: int = 400,
+                           deadline_ms: Optional[int] = None) -> Dict[str, Any]:
+    # deadline_ms 由 instrumented_tool 接管（套上 deadline()），这里不用再处理
+    local = _query_local(userQuery, unit, semester, top_k, passage_len)
+    if local is not None:
+        return local
+    cfg, err = _load_cfg()
+    if err:
+        return {"answer": err}
+    return _query_one(cfg, userQuery, unit, semester, top_k, passage_len)
+
+def _load_cfg():
+    """Returns (cfg, None) or (None, error answer text)."""
     #尝试从连接读取配置，如果失败则使用环境变量
     cfg = {}
     connection_error = None
@@ -61,14 +79,43 @@ def discovery_json_v3_clean(userQuery: str = "", unit: str = "", semester: str =
             "DISCOVERY_PROJECT_ID_JSON","DISCOVERY_COLLECTION_ID_JSON"]
     miss = [k for k in need if not cfg.get(k)]
     if miss:
-        return {"answer": f"{hdr}\nConfiguration error: Missing env: {', '.join(miss)}\nDebug: {debug_info}"}
+        return None, f"{HDR}\nConfiguration error: Missing env: {', '.join(miss)}\nDebug: {debug_info}"
+    return cfg, None
+
+def _format_items(results: List[Dict[str, Any]], passages: List[str], passage_len: int) -> Dict[str, Any]:
+    n = int(passage_len) if passage_len else 400
+    items = []
+    for res, passage in zip(results, passages):
+        head = " / ".join([v for v in [res.get("unit"),res.get("semester"),
+                          res.get("section"),res.get("subsection")] if v])
+        items.append({"head": head, "text": _trim(passage, n)})
+    # 近重复段落只留排名最前的一条，再按 SNIPPET_BUDGET_* 预算装箱（tools/snippet_pack.py）；
+    # 没有段落的结果占位文字都一样，但 head（unit/section）不同，不参与去重
+    items = pack(items, key="text", distinct=lambda it: it["text"] == NO_PASSAGE)
+    return {"answer": f"{HDR}\n" + "\n\n---\n\n".join(f"{it['head']}\n{it['text']}" for it in items)}
+
+def _query_local(userQuery: str = "", unit: str = "", semester: str = "",
+                 top_k: int = 2, passage_len: int = 400):
+    """Answer from the unit's shard of the local outline index (tools/outline_index.py);
+    None when the query does not resolve to a unit the index covers (then ask Discovery)."""
+    unit, semester, hits = _local_lookup(userQuery, unit, semester, int(top_k) if top_k else 2)
+    if hits is None:
+        return None
+    if not hits:
+        cond = ", ".join([f"unit={unit}", f"semester={semester}" if semester else ""]).strip(", ")
+        return {"answer": f"{HDR}\nNo results found for {cond}."}
+    n = int(passage_len) if passage_len else 400
+    return _format_items(hits, [best_window(h["text"], userQuery, n) for h in hits], passage_len)
+
+def _query_one(cfg: Dict[str, Any], userQuery: str = "", unit: str = "", semester: str = "",
+               top_k: int = 2, passage_len: int = 400) -> Dict[str, Any]:
+    hdr = HDR
     
     if not unit or not semester:
         u2, s2 = _find_unit_semester(userQuery)
         unit = (unit or u2 or "").upper()
         semester = (semester or s2 or "")
     
-    url = f"{cfg['DISCOVERY_URL']}/v2/projects/{cfg['DISCOVERY_PROJECT_ID_JSON']}/query?version={cfg['DISCOVERY_VERSION']}"
     body: Dict[str, Any] = {
         "collection_ids": [cfg["DISCOVERY_COLLECTION_ID_JSON"]],
         "count": int(top_k) if top_k else 2,
@@ -87,11 +134,12 @@ def discovery_json_v3_clean(userQuery: str = "", unit: str = "", semester: str =
     body["natural_language_query"] = " ".join(nlq) or "unit outline"
     
     try:
-        r = requests.post(url, json=body,
-                         auth=HTTPBasicAuth("apikey", cfg["DISCOVERY_APIKEY"]),
-                         headers={"Content-Type":"application/json"}, timeout=30)
-        r.raise_for_status()
-        data = r.json()
+        # 共享客户端：keep-alive 连接池 + 重试退避 + 响应缓存；超时 30s，但不超过本次调用的剩余时间
+        # （deadline_ms / TOOL_DEADLINE_MS / 外层 deadline()）。时间快用完时只查缓存，不再打 Discovery
+        cli = get_client(cfg["DISCOVERY_URL"], cfg["DISCOVERY_APIKEY"], cfg["DISCOVERY_VERSION"])
+        data = cli.query(cfg["DISCOVERY_PROJECT_ID_JSON"], body, timeout=30, cached=True)
+    except DeadlineExceeded as e:
+        return {"answer": f"{hdr}\nDiscovery skipped: out of time for this request ({e})."}
     except Exception as e:
         return {"answer": f"{hdr}\nDiscovery request failed: {e}"}
     
@@ -100,12 +148,33 @@ def discovery_json_v3_clean(userQuery: str = "", unit: str = "", semester: str =
         cond = ", ".join([f"unit={unit}" if unit else "", f"semester={semester}" if semester else ""]).strip(", ")
         return {"answer": f"{hdr}\nNo results found for {cond or 'your query'}."}
     
-    items = []
-    for res in results:
-        head = " / ".join([v for v in [res.get("unit"),res.get("semester"),
-                          res.get("section"),res.get("subsection")] if v])
-        passage = next((p.get("passage_text") for p in res.get("document_passages", [])
-                       if p.get("passage_text")), "(No passage excerpt returned.)")
-        items.append(f"{head}\n{_trim(passage, int(passage_len) if passage_len else 400)}")
-    
-    return {"answer": f"{hdr}\n" + "\n\n---\n\n".join(items)}
\ No newline at end of file
+    passages = [next((p.get("passage_text") for p in res.get("document_passages", [])
+                      if p.get("passage_text")), NO_PASSAGE) for res in results]
+    return _format_items(results, passages, passage_len)
+
+def discovery_json_v3_clean_batch(queries: List[Any], top_k: int = 2, passage_len: int = 400,
+                                  max_workers: int = 8) -> List[Dict[str, Any]]:
+    """
+    批量版（评测/回放用，不注册为 tool）。queries 的每项可以是字符串，
+    或 {"userQuery", "unit", "semester"} 字典；配置只读取一次，
+    最多 max_workers 个请求并发，返回与输入同序、结构同 discovery_json_v3_clean。
+    """
+    queries = list(queries or [])
+    cfg, err = _load_cfg()
+
+    def _one(q: Any) -> Dict[str, Any]:
+        args = ((q.get("userQuery", ""), q.get("unit", ""), q.get("semester", "")) if isinstance(q, dict)
+                else (q or "", "", ""))
+        local = _query_local(*args, top_k, passage_len)
+        if local is not None:
+            return local
+        if err:
+            return {"answer": err}
+        return _query_one(cfg, *args, top_k, passage_len)
+
+    if not queries:
+        return []
+    from concurrent.futures import ThreadPoolExecutor   # 只有批量接口用到，不在导入时加载
+
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(queries)))) as ex:
+        return list(ex.map(propagate(_one), queries))   # 工作线程沿用调用方的截止时间
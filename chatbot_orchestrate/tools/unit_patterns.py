@@ -0,0 +1,42 @@
+# tools/unit_patterns.py
+# Unit code / semester patterns and outline section titles shared by djv3, the intent fast path,
+# outline lookups and the query normaliser.
+
+import re
+from typing import Optional, Tuple
+
+UNIT_RE = re.compile(r"\b([A-Z]{3}\d{3})\b", re.I)
+SEM_RE = re.compile(r"\b(?:semester|sem|s)\s*([12])\b", re.I)
+
+# 单元大纲的章节标题（outlinetool 按它切分章节；query_normalizer 把它们放进词表）
+SECTION_TITLES = [
+    "Contact Details",
+    "Unit Description",
+    "Intended Learning Outcomes",
+    "Requisites",
+    "Alterations as a Result of Student Feedback",
+    "Teaching Arrangements",
+    "Assessment Schedule",
+    "Assessment Details",
+    "How your final result is determined",
+    "Academic Progress Review",
+    "Submission of assignments",
+    "Academic integrity",
+    "Requests for extensions",
+    "Late penalties",
+    "Review of results and appeals",
+    "Required Resources",
+    "Recommended Reading Materials",
+    "Required reading materials",
+    "Recommended reading materials",
+    "Other required resources",
+]
+
+
+def find_unit_semester(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """(unit code upper-cased, "1"/"2") found in free text; None for whichever is absent."""
+    unit = sem = None
+    if text:
+        m = UNIT_RE.search(text); unit = m.group(1).upper() if m else None
+        s = SEM_RE.search(text); sem = s.group(1) if s else None
+    return unit, sem
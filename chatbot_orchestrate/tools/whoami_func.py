@@ -0,0 +1,26 @@
+from ibm_watsonx_orchestrate.agent_builder.tools import ToolPermission
+
+try:
+    from tools.instrumentation import instrumented_tool
+    from tools.jwt_verify import whoami
+except ImportError:  # 以 tools/ 为包根导入时
+    from instrumentation import instrumented_tool
+    from jwt_verify import whoami
+
+# 本地校验 auth-service 签发的 JWT（需与 server.js 相同的 JWT_SECRET），不请求 /me；
+# 校验结果按 token 哈希缓存到 exp，重复的 whoami 只是一次字典查找
+
+@instrumented_tool(
+  name="whoami_local",
+  description=(
+    "Return the signed-in user from the session access token, verified locally (no call to auth-service /me). "
+    "Input: {access_token: string} (the JWT from login_tool; a 'Bearer ' prefix is accepted). "
+    "Output: {user:{id, username, roles}} like GET /me, or {error:'missing token'|'invalid token', reason} "
+    "when the token is absent, expired or not issued by auth-service for utas-coursemate."
+  ),
+  permission=ToolPermission.ADMIN
+)
+
+def whoami_local(access_token: str = "") -> dict:
+    """同 GET /me 的返回结构；token 无效时返回 error（对应 /me 的 401）。"""
+    return whoami(access_token)
@@ -1,8 +1,10 @@
 # app.py — Minimal Discovery V2 query script
 import os, sys, json
 from dotenv import load_dotenv
-from ibm_watson import DiscoveryV2
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+
+# Reuse the shared Discovery client from chatbot_orchestrate/tools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chatbot_orchestrate"))
+from tools.discovery_client import get_client, compact_result
 
 load_dotenv()  # Load .env if present
 
@@ -13,44 +15,22 @@ PROJECT  = os.getenv("DISCOVERY_PROJECT_ID")
 COLS_RAW = os.getenv("DISCOVERY_COLLECTION_IDS", "")  # Comma-separated list; empty = search the whole project
 COL_IDS  = [s.strip() for s in COLS_RAW.split(",") if s.strip()]
 
-# Initialize Discovery client
-auth = IAMAuthenticator(API_KEY)
-discovery = DiscoveryV2(version="2023-03-31", authenticator=auth)
-discovery.set_service_url(URL)
+# Shared client (tools/discovery_client): created on first query, connection pool reused across calls
+def _client():
+    return get_client(URL, API_KEY)
 
 def run_wd_query(query: str, count: int = 5, passages_count: int = 5) -> dict:
     """Query Discovery V2 and return a compact JSON-friendly result."""
-    kwargs = dict(
-        project_id=PROJECT,
-        natural_language_query=query,
-        count=count,
-        passages={"enabled": True, "count": passages_count},
-    )
+    body = {
+        "natural_language_query": query,
+        "count": count,
+        "passages": {"enabled": True, "count": passages_count},
+    }
     if COL_IDS:
-        kwargs["collection_ids"] = COL_IDS
-
-    res = discovery.query(**kwargs).get_result()
-
-    # Prefer top-level 'passages' (official structure); fall back to result text/title if missing
-    snippets = []
-    for p in res.get("passages", []):
-        if p.get("passage_text"):
-            snippets.append({"text": p["passage_text"], "document_id": p.get("document_id")})
-
-    if not snippets:
-        for r in res.get("results", []):
-            txt = ""
-            # Some responses include per-result 'document_passages'; use the first passage if available
-            dp = r.get("document_passages") or []
-            if dp and isinstance(dp, list):
-                txt = dp[0].get("passage_text", "") or ""
-            if not txt:
-                # Otherwise fall back to the fulltext or extracted title
-                txt = r.get("text") or r.get("extracted_metadata", {}).get("title", "")
-            if txt:
-                snippets.append({"text": txt, "collection_id": r.get("collection_id")})
+        body["collection_ids"] = COL_IDS
 
-    return {"snippets": snippets, "total": res.get("matching_results", 0)}
+    res = _client().query(PROJECT, body, cached=True)
+    return compact_result(res)
 
 if __name__ == "__main__":
     q = " ".join(sys.argv[1:]) or "timetable exam dates"